@@ -0,0 +1,245 @@
+"""
+Benchmark: the agent path over a question corpus, offline.
+
+Runs every question in the corpus (benchmarks/corpus.jsonl) through the sequential chain
+with the recorded model responses replayed (src/llm/replay.py, with optional simulated
+latency) against a fixture database: by default a DuckDB store built from synthetic
+statements (benchmarks/synthetic.py), so neither models, a database server nor the network
+are needed. The corpus is run --passes times with a fresh SQL cache, so later passes show
+the caches at work.
+
+Reports, from the tracing spans of each question (src/utils/tracing.py):
+  - p50 / p95 latency per stage (question, sql_prompt, sql_llm, sql_candidates, query, ...)
+  - hit rates of the SQL cache (sql_generation) and the result cache (query)
+  - correctness: whether the chain's SQL returns the same rows as the corpus's expected_sql
+
+With --record, the live models answer instead and their responses are written to a new
+corpus file for later replay.
+
+Run from project root: uv run python benchmarks/bench_agent.py [--passes 2] [--latency 0.5 --token-delay 0.01]
+"""
+
+import argparse
+import asyncio
+import datetime as dt
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from decimal import Decimal
+from pathlib import Path
+
+_root = Path(__file__).resolve().parent.parent
+if str(_root) not in sys.path:
+    sys.path.insert(0, str(_root))
+
+CORPUS_PATH = _root / "benchmarks" / "corpus.jsonl"
+FIXTURE_PATH = _root / ".cache" / "fixture-columnar"
+
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(q * (len(ordered) - 1)))]
+
+
+def _canonical(rows: list[dict]) -> list[tuple]:
+    """Rows as sorted value tuples: column names and order ignored, numbers to the cent."""
+    def value(v):
+        if isinstance(v, (int, float, Decimal)) and not isinstance(v, bool):
+            return round(float(v), 2)
+        if isinstance(v, (dt.date, dt.datetime)):
+            return v.isoformat()[:10]
+        return v
+
+    return sorted((tuple(value(v) for v in row.values()) for row in rows), key=repr)
+
+
+def build_fixture(path: Path, rows: int, seed: int = 0) -> int:
+    """Write a columnar store of synthetic statements in every bank layout."""
+    from benchmarks.synthetic import BANKS, synthetic_statement
+    from src.database.columnar import write_store
+    from src.etl.trasform import transform_frame
+
+    return write_store(
+        (transform_frame(synthetic_statement(bank, rows, seed), f"{bank}-fixture.csv").assign(source=bank) for bank in BANKS),
+        path,
+    )
+
+
+def run_corpus(corpus: list[dict], passes: int, concurrency: int) -> list[dict]:
+    """Answer every question, passes times; returns one outcome per question and pass."""
+    from src.database.connection import close_async_pool
+    from src.llm import sequential_chain as chain
+    from src.utils.tracing import span
+
+    def answer(question: str) -> dict:
+        with span("question") as s:
+            x = chain.get_sql_content({"question": question})
+            analysis = chain.run_analyzer(x)
+        return {"sql": x["sql_query"], "analysis": analysis, "trace_id": s.trace_id}
+
+    async def aanswer(question: str, limit: asyncio.Semaphore) -> dict:
+        async with limit:
+            with span("question") as s:
+                x = await chain.aget_sql_content({"question": question})
+                analysis = await chain.arun_analyzer(x)
+        return {"sql": x["sql_query"], "analysis": analysis, "trace_id": s.trace_id}
+
+    async def abatch(questions: list[str]) -> list:
+        limit = asyncio.Semaphore(concurrency)
+        try:
+            return await asyncio.gather(*(aanswer(q, limit) for q in questions), return_exceptions=True)
+        finally:
+            await close_async_pool()
+
+    outcomes = []
+    for pass_ in range(1, passes + 1):
+        questions = [entry["question"] for entry in corpus]
+        start = time.perf_counter()
+        if concurrency > 1:
+            answers = asyncio.run(abatch(questions))
+        else:
+            answers = []
+            for question in questions:
+                try:
+                    answers.append(answer(question))
+                except Exception as exc:
+                    answers.append(exc)
+        wall_s = time.perf_counter() - start
+        for entry, result in zip(corpus, answers):
+            outcome = {"pass": pass_, "question": entry["question"], "wall_s": wall_s}
+            if isinstance(result, Exception):
+                outcome["error"] = repr(result)
+            else:
+                outcome.update(result)
+            outcomes.append(outcome)
+    return outcomes
+
+
+def check(corpus: list[dict], outcomes: list[dict]) -> None:
+    """Mark each outcome correct if its SQL returns the expected rows (run outside the traces)."""
+    from src.database.execute import execute
+
+    expected = {entry["question"]: _canonical(execute(entry["expected_sql"], use_cache=False)) for entry in corpus}
+    for outcome in outcomes:
+        if "error" in outcome:
+            outcome["correct"] = False
+            continue
+        try:
+            outcome["correct"] = _canonical(execute(outcome["sql"], use_cache=False)) == expected[outcome["question"]]
+        except Exception as exc:
+            outcome["correct"] = False
+            outcome["error"] = repr(exc)
+
+
+def summarize(outcomes: list[dict], trace_path: Path) -> dict:
+    """Stage latency percentiles and cache hit rates from the questions' spans, per pass."""
+    pass_of = {o["trace_id"]: o["pass"] for o in outcomes if "trace_id" in o}
+    durations: dict[int, dict[str, list[float]]] = defaultdict(lambda: defaultdict(list))
+    hits: dict[int, dict[str, list[bool]]] = defaultdict(lambda: defaultdict(list))
+    with open(trace_path) as f:
+        for line in f:
+            record = json.loads(line)
+            pass_ = pass_of.get(record["trace_id"])
+            if pass_ is None:
+                continue  # not part of a question (e.g. the correctness checks)
+            durations[pass_][record["name"]].append(record["duration_s"])
+            if isinstance(record["attributes"].get("cache_hit"), bool):
+                hits[pass_][record["name"]].append(record["attributes"]["cache_hit"])
+    report = {}
+    for pass_ in sorted({o["pass"] for o in outcomes}):
+        done = [o for o in outcomes if o["pass"] == pass_]
+        report[pass_] = {
+            "wall_s": done[0]["wall_s"],
+            "questions": len(done),
+            "correct": sum(o.get("correct", False) for o in done),
+            "errors": sum("error" in o for o in done),
+            "stages": {
+                name: {"n": len(values), "p50_s": statistics.median(values), "p95_s": _percentile(values, 0.95)}
+                for name, values in sorted(durations[pass_].items())
+            },
+            "cache_hit_rate": {name: sum(values) / len(values) for name, values in sorted(hits[pass_].items())},
+        }
+    return report
+
+
+def print_report(report: dict, outcomes: list[dict]) -> None:
+    for pass_, r in report.items():
+        print(f"\nPass {pass_}: {r['questions']} questions in {r['wall_s']:.2f}s, "
+              f"{r['correct']}/{r['questions']} correct, {r['errors']} errors")
+        print(f"  {'stage':<16} {'n':>4} {'p50 ms':>9} {'p95 ms':>9}")
+        for name, s in r["stages"].items():
+            print(f"  {name:<16} {s['n']:>4} {s['p50_s'] * 1000:>9.1f} {s['p95_s'] * 1000:>9.1f}")
+        for name, rate in r["cache_hit_rate"].items():
+            print(f"  cache hit rate ({name}): {rate:.0%}")
+    wrong = {o["question"]: o for o in outcomes if not o.get("correct")}
+    for question, o in wrong.items():
+        print(f"\nIncorrect: {question}\n  {o.get('error') or o['sql']}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--corpus", type=Path, default=CORPUS_PATH)
+    parser.add_argument("--backend", choices=["duckdb", "postgres"], default="duckdb",
+                        help="duckdb: the synthetic fixture store; postgres: the configured database as it is")
+    parser.add_argument("--fixture", type=Path, default=FIXTURE_PATH, help="fixture store path (duckdb)")
+    parser.add_argument("--rows", type=int, default=20_000, help="synthetic rows per bank when building the fixture")
+    parser.add_argument("--rebuild", action="store_true", help="rebuild the fixture store")
+    parser.add_argument("--passes", type=int, default=2, help="runs over the corpus (later passes hit the caches)")
+    parser.add_argument("--concurrency", type=int, default=1, help="questions in flight at once (>1 uses the async chain)")
+    parser.add_argument("--candidates", type=int, default=None, help="SQL candidates per question (default SQL_CANDIDATES)")
+    parser.add_argument("--latency", type=float, default=0.0, help="replayed model latency before the first token, seconds")
+    parser.add_argument("--token-delay", type=float, default=0.0, help="replayed model delay per token, seconds")
+    parser.add_argument("--jitter", type=float, default=0.0, help="lognormal sigma applied to the replayed delays")
+    parser.add_argument("--record", type=Path, default=None, help="call the live models and write their responses here")
+    parser.add_argument("--output", type=Path, default=None, help="write the report as JSON")
+    args = parser.parse_args()
+
+    # Configuration is read at import time, so set it before importing the chain.
+    tmp = Path(tempfile.mkdtemp(prefix="bench-agent-"))
+    trace_path = tmp / "traces.jsonl"
+    os.environ.update({
+        "TRACE_JSONL_PATH": str(trace_path),
+        "METRICS_PATH": "",
+        "SQL_CACHE_PATH": str(tmp / "sql_cache.sqlite3"),
+        "QUERY_BACKEND": args.backend,
+        "COLUMNAR_STORE_PATH": str(args.fixture),
+        "LLM_REPLAY_PATH": "" if args.record else str(args.corpus),
+        "LLM_REPLAY_LATENCY_S": str(args.latency),
+        "LLM_REPLAY_TOKEN_S": str(args.token_delay),
+        "LLM_REPLAY_JITTER": str(args.jitter),
+    })
+    if args.candidates is not None:
+        os.environ["SQL_CANDIDATES"] = str(args.candidates)
+
+    if args.backend == "duckdb" and (args.rebuild or not (args.fixture / "VERSION").exists()):
+        start = time.perf_counter()
+        rows = build_fixture(args.fixture, args.rows)
+        print(f"Built fixture store {args.fixture} ({rows} rows) in {time.perf_counter() - start:.2f}s")
+
+    from src.llm.replay import load_replay
+
+    corpus = load_replay(args.corpus)
+    outcomes = run_corpus(corpus, args.passes, args.concurrency)
+    check(corpus, outcomes)
+    report = summarize(outcomes, trace_path)
+    print_report(report, outcomes)
+
+    if args.record:
+        first = {o["question"]: o for o in outcomes if o["pass"] == 1 and "error" not in o}
+        with open(args.record, "w") as f:
+            for entry in corpus:
+                recorded = first.get(entry["question"], {})
+                entry = {k: v for k, v in entry.items() if k != "repair_sql"}  # recorded afresh: no repair needed
+                f.write(json.dumps({**entry, "sql": recorded.get("sql"), "analysis": recorded.get("analysis")}) + "\n")
+        print(f"\nRecorded responses to {args.record}")
+    if args.output:
+        args.output.parent.mkdir(parents=True, exist_ok=True)
+        args.output.write_text(json.dumps({"params": vars(args), "report": report}, indent=2, default=str))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""
+Benchmark: ETL stages (extract, transform, load) per bank layout, rows/sec and peak memory.
+
+Writes synthetic statements in every layout (benchmarks/synthetic.py), then times each stage
+on them: extract (read the CSV), transform (transform_frame to canonical dicts, and optionally
+the per-record transform_records path), serialize (frameToCsv) and load (COPY + merge into a
+scratch Postgres database, rolled back so every run starts from the same table). Peak memory
+is measured with tracemalloc in a separate run so tracing does not skew the timings.
+
+The report is JSON (revision, environment, parameters and one entry per bank and stage), so
+runs from different revisions can be compared with --compare.
+
+Run from project root: uv run python benchmarks/bench_etl.py --rows 200000 --compare old.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+
+_root = Path(__file__).resolve().parent.parent
+if str(_root) not in sys.path:
+    sys.path.insert(0, str(_root))
+
+import pandas as pd
+
+from benchmarks.synthetic import BANKS, write_statements
+from src.database.connection import connect
+from src.etl.load import copyCsv, createDb, createTable, frameToCsv
+from src.etl.trasform import frame_to_records, transform_frame, transform_records
+
+BENCH_DATABASE = os.environ.get("BENCH_DATABASE", "budget_finance_bench")
+RESULTS_DIR = _root / "benchmarks" / "results"
+
+
+def revision() -> str:
+    """Short git revision of the tree, with '-dirty' when there are uncommitted changes."""
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=_root, capture_output=True, text=True, check=True).stdout.strip()
+        dirty = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=_root, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+    return f"{rev}-dirty" if dirty else rev
+
+
+def _measure(fn, repeat: int):
+    """Best wall time over `repeat` runs, then one traced run for peak memory. Returns (result, seconds, peak bytes)."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        fn()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, best, peak
+
+
+def bench(path: Path, bank: str, conn, repeat: int = 3, per_record: bool = False) -> list[dict]:
+    """Time every ETL stage on one statement file. Returns one result per stage."""
+    stages = []
+
+    def record(stage: str, rows: int, seconds: float, peak: int) -> None:
+        stages.append({
+            "bank": bank,
+            "stage": stage,
+            "rows": rows,
+            "seconds": seconds,
+            "rows_per_sec": rows / seconds if seconds > 0 else None,
+            "peak_mb": peak / 2**20,
+        })
+
+    df, seconds, peak = _measure(lambda: pd.read_csv(path), repeat)
+    rows = len(df)
+    record("extract", rows, seconds, peak)
+
+    frame, seconds, peak = _measure(lambda: transform_frame(df, path.name), repeat)
+    _, to_dicts, _ = _measure(lambda: frame_to_records(frame), repeat)
+    record("transform", rows, seconds + to_dicts, peak)
+
+    if per_record:
+        raw = df.to_dict("records")
+        _, seconds, peak = _measure(lambda: transform_records(raw, path.name), repeat)
+        record("transform_records", rows, seconds, peak)
+
+    payload, seconds, peak = _measure(lambda: frameToCsv(frame), repeat)
+    record("serialize", rows, seconds, peak)
+
+    def load() -> int:
+        with conn.transaction(force_rollback=True):
+            return copyCsv(payload, conn)
+
+    inserted, seconds, peak = _measure(load, repeat)
+    record("load", inserted, seconds, peak)
+    return stages
+
+
+def compare(report: dict, baseline: dict) -> list[str]:
+    """Lines comparing rows/sec per bank and stage against an earlier report."""
+    before = {(r["bank"], r["stage"]): r for r in baseline["results"]}
+    lines = [f"vs {baseline['revision']} ({baseline['timestamp']})"]
+    for r in report["results"]:
+        old = before.get((r["bank"], r["stage"]))
+        if not old or not old["rows_per_sec"] or not r["rows_per_sec"]:
+            continue
+        change = r["rows_per_sec"] / old["rows_per_sec"] - 1
+        lines.append(
+            f"{r['bank']:<8} {r['stage']:<18} {old['rows_per_sec']:>12,.0f} -> {r['rows_per_sec']:>12,.0f} rows/s"
+            f" ({change:+.1%})  peak {old['peak_mb']:.1f} -> {r['peak_mb']:.1f} MB"
+        )
+    return lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000, help="rows per bank")
+    parser.add_argument("--banks", nargs="+", default=list(BANKS))
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per stage (best is kept)")
+    parser.add_argument("--per-record", action="store_true", help="also time the per-record transform_records path")
+    parser.add_argument("--database", default=BENCH_DATABASE, help="scratch database for the load stage")
+    parser.add_argument("--output", help="report path (default: benchmarks/results/etl-<revision>.json)")
+    parser.add_argument("--compare", help="earlier report to compare against")
+    args = parser.parse_args()
+
+    createDb(args.database)
+    conn = connect(args.database)
+    createTable(conn)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for path, bank in zip(write_statements(tmp, args.rows, args.banks), args.banks):
+            results.extend(bench(path, bank, conn, args.repeat, args.per_record))
+    conn.close()
+
+    report = {
+        "revision": revision(),
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "params": {"rows": args.rows, "banks": args.banks, "repeat": args.repeat, "database": args.database},
+        "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "results": results,
+    }
+    output = Path(args.output) if args.output else RESULTS_DIR / f"etl-{report['revision']}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+
+    print(f"{'bank':<8} {'stage':<18} {'rows':>10} {'rows/sec':>12} {'peak MB':>9}")
+    for r in results:
+        print(f"{r['bank']:<8} {r['stage']:<18} {r['rows']:>10,} {r['rows_per_sec'] or 0:>12,.0f} {r['peak_mb']:>9.1f}")
+    print(f"Report written to {output}")
+    if args.compare:
+        print("\n".join(compare(report, json.loads(Path(args.compare).read_text()))))
@@ -0,0 +1,110 @@
+"""
+Benchmark: PDF statement extraction, pages/sec per backend.
+
+Writes a synthetic multi-page statement PDF (ruled Date / Description / Withdrawals /
+Deposits / Balance tables), then extracts it with each backend: serially, across worker
+processes, and again from the parsed-page cache. Also checks that every row made it
+through table_records and transform_records.
+
+Run from project root: uv run python benchmarks/bench_pdf.py --pages 200 --workers 4
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+_root = Path(__file__).resolve().parent.parent
+if str(_root) not in sys.path:
+    sys.path.insert(0, str(_root))
+
+import numpy as np
+import pandas as pd
+
+from src.etl.pdf import BACKENDS, PageCache, extract_tables, statement_date, table_records
+from src.etl.trasform import transform_records
+
+MERCHANTS = ["NOFRILLS JOHN'S #3457 MILTON, ON", "COSTCO WHOLESALE #524", "TIM HORTONS #2231", "AMAZON.CA", "SHELL C12345"]
+HEADER = ["Date", "Description", "Withdrawals", "Deposits", "Balance"]
+COLUMN_X = [40, 120, 360, 440, 520, 590]
+
+
+def synthetic_pdf(path: Path, pages: int, rows_per_page: int = 30, seed: int = 0) -> int:
+    """Write a statement PDF with one ruled transaction table per page. Returns the row count."""
+    import pymupdf
+
+    rng = np.random.default_rng(seed)
+    day = pd.Timestamp("2024-01-01")
+    doc = pymupdf.open()
+    for _ in range(pages):
+        page = doc.new_page(width=612, height=792)
+        top, height = 60, 22
+        for r in range(rows_per_page + 2):
+            page.draw_line((COLUMN_X[0], top + r * height), (COLUMN_X[-1], top + r * height))
+        for x in COLUMN_X:
+            page.draw_line((x, top), (x, top + (rows_per_page + 1) * height))
+        for c, text in enumerate(HEADER):
+            page.insert_text((COLUMN_X[c] + 3, top + 15), text, fontsize=9)
+        for r in range(rows_per_page):
+            amount = round(float(rng.normal(-60, 120)), 2)
+            day += pd.Timedelta(days=int(rng.integers(0, 2)))
+            cells = [
+                day.strftime("%m/%d/%Y"),
+                MERCHANTS[rng.integers(0, len(MERCHANTS))],
+                f"{-amount:,.2f}" if amount < 0 else "",
+                f"{amount:,.2f}" if amount >= 0 else "",
+                f"{rng.uniform(0, 9000):,.2f}",
+            ]
+            for c, text in enumerate(cells):
+                page.insert_text((COLUMN_X[c] + 3, top + (r + 2) * height - 7), text, fontsize=8)
+    doc.save(path)
+    return pages * rows_per_page
+
+
+def _timed(pdf: Path, backend: str, workers: int, cache: PageCache) -> tuple[float, int]:
+    start = time.perf_counter()
+    tables = extract_tables(pdf, backend, workers=workers, cache=cache)
+    rows = len(transform_records(table_records(tables, pdf.name, statement_date(pdf)), pdf.name))
+    return time.perf_counter() - start, rows
+
+
+def bench(pdf: Path, pages: int, backend: str, workers: int) -> dict:
+    """Time one backend serially, in parallel and from a warm cache."""
+    with tempfile.TemporaryDirectory() as tmp:
+        serial_s, rows = _timed(pdf, backend, 1, PageCache(Path(tmp) / "serial.sqlite3"))
+        cache = PageCache(Path(tmp) / "parallel.sqlite3")
+        parallel_s, _ = _timed(pdf, backend, workers, cache)
+        cached_s, _ = _timed(pdf, backend, workers, cache)
+    return {
+        "backend": backend,
+        "serial_pps": pages / serial_s,
+        "parallel_pps": pages / parallel_s,
+        "cached_pps": pages / cached_s,
+        "rows": rows,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--backends", nargs="+", default=list(BACKENDS))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf = Path(tmp) / "scotia-bench.pdf"
+        expected = synthetic_pdf(pdf, args.pages)
+        print(f"{args.pages} pages, {expected:,} rows, {args.workers} workers")
+        print(f"{'backend':<11} {'serial':>12} {'parallel':>12} {'cached':>12}  rows")
+        for backend in args.backends:
+            try:
+                r = bench(pdf, args.pages, backend, args.workers)
+            except Exception as exc:  # missing optional backend (e.g. docling, tabula-py + Java)
+                print(f"{backend:<11} skipped: {exc}")
+                continue
+            print(
+                f"{backend:<11} {r['serial_pps']:>8.1f} p/s {r['parallel_pps']:>8.1f} p/s {r['cached_pps']:>8.0f} p/s"
+                f"  {r['rows']:,}/{expected:,}"
+            )
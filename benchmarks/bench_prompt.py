@@ -0,0 +1,131 @@
+"""
+Benchmark: full vs dynamic (retrieved few-shot) SQL prompts.
+
+Each verified example question is held out in turn: its prompt is built from an example
+store of all the other pairs, so retrieval never sees the answer. Reports estimated prompt
+tokens for both modes, the time to retrieve examples and build the dynamic prompt, and how
+often the best retrieved example queries the same table as the held-out SQL. With --live,
+each question also goes to the SQL model under both prompts, recording model latency, the
+prompt tokens Ollama reports, and whether the generated SQL runs.
+
+Run from project root: uv run python benchmarks/bench_prompt.py [-k 3] [--live] [--limit 10]
+"""
+
+import argparse
+import csv
+import re
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+_root = Path(__file__).resolve().parent.parent
+if str(_root) not in sys.path:
+    sys.path.insert(0, str(_root))
+
+from src.llm.encode import estimate_tokens
+from src.llm.examples import ExampleStore, load_examples
+from src.llm.prompts import sql_prompt_for
+from src.utils.constants import SQL_FEW_SHOT_K
+
+_FROM = re.compile(r"\bFROM\s+(\w+)", re.IGNORECASE)
+
+
+def _percentile(values: list[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(q * (len(ordered) - 1)))]
+
+
+def held_out_stores(tmp: Path):
+    """Yield (example, store without it) for every example in the CSV."""
+    examples = load_examples()
+    for i, example in enumerate(examples):
+        path = tmp / f"examples-{i}.csv"
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["question", "sql"])
+            writer.writerows((e.question, e.sql) for j, e in enumerate(examples) if j != i)
+        yield example, ExampleStore(path, tmp / f"index-{i}.sqlite3")
+
+
+def bench(k: int, repeat: int, limit: int | None) -> list[dict]:
+    """Build both prompts for each held-out question."""
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for example, store in held_out_stores(Path(tmp)):
+            if limit is not None and len(results) == limit:
+                break
+            full = sql_prompt_for(example.question, mode="full")
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                dynamic = sql_prompt_for(example.question, k, mode="dynamic", store=store)
+                timings.append(time.perf_counter() - start)
+            top = store.search(example.question, 1)
+            expected_table = _FROM.search(example.sql)
+            results.append({
+                "question": example.question,
+                "full": full,
+                "dynamic": dynamic,
+                "full_tokens": estimate_tokens(full),
+                "dynamic_tokens": estimate_tokens(dynamic),
+                "build_s": min(timings),
+                "same_table": bool(top and expected_table and expected_table.group(1) in _FROM.findall(top[0].sql)),
+            })
+    return results
+
+
+def live(results: list[dict]) -> None:
+    """Ask the SQL model each question under both prompts; adds latency, tokens and validity."""
+    from langchain_core.prompts import ChatPromptTemplate
+    from langchain_ollama import ChatOllama
+
+    from src.database.execute import execute
+    from src.utils.constants import SQL_LLM_MODEL
+
+    prompt = ChatPromptTemplate.from_messages([("system", "{system}"), ("human", "{question}")])
+    chain = prompt | ChatOllama(model=SQL_LLM_MODEL, temperature=0)
+    for result in results:
+        for mode in ("full", "dynamic"):
+            start = time.perf_counter()
+            out = chain.invoke({"system": result[mode], "question": result["question"]})
+            result[f"{mode}_llm_s"] = time.perf_counter() - start
+            result[f"{mode}_llm_tokens"] = (out.usage_metadata or {}).get("input_tokens")
+            try:
+                execute(out.content, use_cache=False)
+                result[f"{mode}_runs"] = True
+            except Exception:
+                result[f"{mode}_runs"] = False
+
+
+def report(results: list[dict], k: int) -> None:
+    full = [r["full_tokens"] for r in results]
+    dynamic = [r["dynamic_tokens"] for r in results]
+    build_ms = [r["build_s"] * 1000 for r in results]
+    print(f"{len(results)} held-out questions, k={k}")
+    print(f"  prompt tokens (est.)  full {statistics.mean(full):7.0f}   dynamic {statistics.mean(dynamic):7.0f}"
+          f"   ({1 - sum(dynamic) / sum(full):.0%} fewer; dynamic max {max(dynamic)})")
+    print(f"  dynamic prompt build  p50 {statistics.median(build_ms):.2f} ms   p95 {_percentile(build_ms, 0.95):.2f} ms")
+    print(f"  top example on same table as the answer: {sum(r['same_table'] for r in results)}/{len(results)}")
+    if "full_llm_s" in results[0]:
+        for mode in ("full", "dynamic"):
+            seconds = [r[f"{mode}_llm_s"] for r in results]
+            tokens = [r[f"{mode}_llm_tokens"] for r in results if r[f"{mode}_llm_tokens"] is not None]
+            print(f"  {mode:>7} model: p50 {statistics.median(seconds):.2f} s   p95 {_percentile(seconds, 0.95):.2f} s"
+                  f"   prompt tokens {statistics.mean(tokens) if tokens else float('nan'):.0f}"
+                  f"   SQL runs {sum(r[f'{mode}_runs'] for r in results)}/{len(results)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("-k", type=int, default=SQL_FEW_SHOT_K, help="examples per dynamic prompt")
+    parser.add_argument("--repeat", type=int, default=5, help="timed prompt builds per question (best is kept)")
+    parser.add_argument("--limit", type=int, default=None, help="only the first N questions")
+    parser.add_argument("--live", action="store_true", help="also call the SQL model (needs Ollama)")
+    args = parser.parse_args()
+
+    results = bench(args.k, args.repeat, args.limit)
+    if args.live:
+        live(results)
+    report(results, args.k)
@@ -0,0 +1,69 @@
+"""
+Benchmark: per-record transform_records vs columnar transform_frame.
+
+Builds a synthetic DataFrame in each bank layout, runs both transform paths, checks that
+they produce the same rows and prints the speedup. The per-record timing includes
+DataFrame.to_dict("records"), since that is part of that path; converting the columnar
+result back to dicts is reported separately.
+
+Run from project root: uv run python benchmarks/bench_transform.py --rows 1000000
+"""
+
+import argparse
+import math
+import sys
+import time
+from pathlib import Path
+
+_root = Path(__file__).resolve().parent.parent
+if str(_root) not in sys.path:
+    sys.path.insert(0, str(_root))
+
+from benchmarks.synthetic import BANKS, synthetic_statement
+from src.etl.trasform import frame_to_records, transform_frame, transform_records
+
+def _same(a, b) -> bool:
+    """Compare two canonical values, treating None/NaN as equal and numbers by value."""
+    a_missing = a is None or (isinstance(a, float) and math.isnan(a))
+    b_missing = b is None or (isinstance(b, float) and math.isnan(b))
+    if a_missing or b_missing:
+        return a_missing and b_missing
+    if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+        return float(a) == float(b)
+    return a == b
+
+
+def bench(bank: str, rows: int) -> dict:
+    """Time both transform paths for one bank and verify they agree."""
+    df = synthetic_statement(bank, rows)
+    filename = f"{bank}-bench.csv"
+
+    start = time.perf_counter()
+    expected = transform_records(df.to_dict("records"), filename)
+    per_record = time.perf_counter() - start
+
+    start = time.perf_counter()
+    frame = transform_frame(df, filename)
+    columnar = time.perf_counter() - start
+    actual = frame_to_records(frame)
+    to_records = time.perf_counter() - start - columnar
+
+    mismatches = sum(
+        1 for exp, act in zip(expected, actual) if not all(_same(exp[k], act[k]) for k in exp)
+    )
+    if len(expected) != len(actual):
+        mismatches += abs(len(expected) - len(actual))
+    return {"bank": bank, "rows": rows, "per_record_s": per_record, "columnar_s": columnar, "to_records_s": to_records, "mismatches": mismatches}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--banks", nargs="+", default=list(BANKS))
+    args = parser.parse_args()
+
+    print(f"{'bank':<8} {'rows':>10} {'per-record':>12} {'columnar':>10} {'speedup':>8} {'+to-dicts':>10}  mismatches")
+    for bank in args.banks:
+        r = bench(bank, args.rows)
+        speedup = r["per_record_s"] / r["columnar_s"] if r["columnar_s"] else float("inf")
+        print(f"{bank:<8} {r['rows']:>10,} {r['per_record_s']:>11.2f}s {r['columnar_s']:>9.2f}s {speedup:>7.1f}x {r['to_records_s']:>9.2f}s  {r['mismatches']}")
@@ -0,0 +1,116 @@
+"""
+Synthetic bank statements in every supported layout.
+
+Generates statement DataFrames / CSV files with the column sets the transforms parse
+today (CIBC, Scotia, RBC, NBC, Walmart): realistic merchant descriptions with store
+numbers and cities, mostly debits with some refunds and payments, dates spread over a
+configurable number of months. Output is deterministic for a given seed.
+
+Run from project root: uv run python benchmarks/synthetic.py out_dir --rows 100000
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+_root = Path(__file__).resolve().parent.parent
+if str(_root) not in sys.path:
+    sys.path.insert(0, str(_root))
+
+import numpy as np
+import pandas as pd
+
+BANKS = ("cibc", "scotia", "rbc", "nbc", "walmart")
+
+# (description stem, category, typical spend); store numbers and cities are added per row.
+MERCHANTS = [
+    ("NOFRILLS JOHN'S", "Groceries", 85),
+    ("COSTCO WHOLESALE", "Groceries", 180),
+    ("TIM HORTONS", "Restaurants", 9),
+    ("AMAZON.CA", "Shopping", 45),
+    ("SHELL C", "Gas", 65),
+    ("LOBLAWS", "Groceries", 95),
+    ("STARBUCKS", "Restaurants", 7),
+    ("UBER* EATS", "Restaurants", 35),
+    ("CANADIAN TIRE", "Shopping", 60),
+    ("LCBO/RAO", "Alcohol", 40),
+    ("ROGERS", "Utilities", 110),
+    ("NETFLIX.COM", "Subscriptions", 17),
+    ("PETRO-CANADA", "Gas", 60),
+    ("SHOPPERS DRUG MART", "Pharmacy", 30),
+    ("RANDOM LOCAL SHOP", "Shopping", 25),
+]
+CITIES = ["MILTON, ON", "BURLINGTON, ON", "OAKVILLE, ON", "TORONTO, ON", "MISSISSAUGA, ON", ""]
+# Share of rows that are refunds or payments (money in).
+CREDIT_SHARE = 0.1
+
+
+def synthetic_statement(bank: str, rows: int, seed: int = 0, months: int = 60) -> pd.DataFrame:
+    """Build a raw statement DataFrame in the column layout of the given bank."""
+    rng = np.random.default_rng(seed)
+    days = pd.Timestamp("2020-01-01") + pd.to_timedelta(np.sort(rng.integers(0, months * 30, rows)), unit="D")
+    picks = rng.integers(0, len(MERCHANTS), rows)
+    stems = np.array([m[0] for m in MERCHANTS], dtype=object)[picks]
+    categories = np.array([m[1] for m in MERCHANTS], dtype=object)[picks]
+    typical = np.array([m[2] for m in MERCHANTS], dtype=float)[picks]
+    stores = rng.integers(100, 9999, rows)
+    cities = np.array(CITIES, dtype=object)[rng.integers(0, len(CITIES), rows)]
+    merchants = np.array([f"{s} #{n} {c}".strip() for s, n, c in zip(stems, stores, cities)], dtype=object)
+    spend = np.round(rng.lognormal(np.log(typical), 0.5), 2)
+    # Negative: money out; positive: money in.
+    amounts = np.where(rng.random(rows) < CREDIT_SHARE, spend, -spend)
+    slash_dates = days.strftime("%m/%d/%Y")
+    if bank == "cibc":
+        debit = np.where(amounts < 0, -amounts, np.nan)
+        credit = np.where(amounts >= 0, amounts, np.nan)
+        return pd.DataFrame({"Date": days.strftime("%Y-%m-%d"), "Description": merchants, "Debit": debit, "Credit": credit})
+    if bank == "nbc":
+        return pd.DataFrame({
+            "Date": days.strftime("%Y-%m-%d"),
+            "Description": merchants,
+            "Category": np.where(amounts < 0, categories, "Income"),
+            "Debit": [f"${-a:,.2f}" if a < 0 else "" for a in amounts],
+            "Credit": [f"${a:,.2f}" if a >= 0 else "" for a in amounts],
+        })
+    if bank == "rbc":
+        return pd.DataFrame({
+            "Account Type": "Chequing",
+            "Transaction Date": slash_dates,
+            "Description 1": merchants,
+            "Description 2": np.where(rng.random(rows) < 0.5, "", "POS PURCHASE"),
+            "AmountCAD": amounts,
+        })
+    if bank == "scotia":
+        return pd.DataFrame({"Date": slash_dates, "Description": merchants, "Sub-description": "Point of sale", "Amount": amounts})
+    if bank == "walmart":
+        return pd.DataFrame({
+            "Date": slash_dates,
+            "Name on Card": "JANE DOE",
+            "Merchant Name": merchants,
+            "Merchant Category": categories,
+            "Amount": [f"{-a:.2f}" for a in amounts],
+        })
+    raise ValueError(f"Unknown bank layout: {bank}")
+
+
+def write_statements(out_dir: Path | str, rows: int, banks: list[str] | tuple[str, ...] = BANKS, seed: int = 0) -> list[Path]:
+    """Write one synthetic CSV per bank (named so the bank is inferred from it). Returns the paths."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for i, bank in enumerate(banks):
+        path = out_dir / f"{bank}-synthetic-{rows}.csv"
+        synthetic_statement(bank, rows, seed + i).to_csv(path, index=False)
+        paths.append(path)
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("out_dir")
+    parser.add_argument("--rows", type=int, default=100_000, help="rows per bank")
+    parser.add_argument("--banks", nargs="+", default=list(BANKS))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    for path in write_statements(args.out_dir, args.rows, args.banks, args.seed):
+        print(path)
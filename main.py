@@ -0,0 +1,98 @@
+"""
+budget-finance command line.
+
+  python main.py serve                        start the agent service (models and DB loaded once)
+  python main.py ask "question" [--stream]    ask the running service
+  python main.py batch --file questions.txt   ask many questions concurrently
+  python main.py health                       check the service
+
+The client commands use only the standard library and talk to the service over HTTP, so
+they start instantly; langchain, pandas and psycopg are only ever imported by the service.
+"""
+
+import argparse
+import json
+import sys
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+
+from src.utils.constants import BATCH_CONCURRENCY, SERVICE_HOST, SERVICE_PORT
+
+
+def _request(url: str, path: str, body: dict | None = None):
+    data = json.dumps(body).encode() if body is not None else None
+    request = urllib.request.Request(url + path, data=data, headers={"Content-Type": "application/json"})
+    try:
+        return urllib.request.urlopen(request)
+    except urllib.error.HTTPError as exc:
+        sys.exit(f"Service error {exc.code}: {json.loads(exc.read() or b'{}').get('error', exc.reason)}")
+    except urllib.error.URLError:
+        sys.exit(f"No agent service at {url}; start it with: python main.py serve")
+
+
+def ask(url: str, question: str, stream: bool = False) -> None:
+    start = time.perf_counter()
+    with _request(url, "/ask", {"question": question, "stream": stream}) as response:
+        if stream:
+            first = None
+            while chunk := response.read1(4096):
+                first = first or time.perf_counter() - start
+                sys.stdout.write(chunk.decode(errors="replace"))
+                sys.stdout.flush()
+            print()
+            ttft = f"{first:.2f}s" if first else "n/a"
+            print(f"[time to first token {ttft}, total {time.perf_counter() - start:.2f}s]", file=sys.stderr)
+            return
+        answer = json.load(response)
+    print("SQL:", answer["sql_query"])
+    print("\nAnalysis:\n", answer["analysis"])
+    print(f"[{answer['seconds']:.2f}s in service, {time.perf_counter() - start:.2f}s total]", file=sys.stderr)
+
+
+def batch(url: str, questions: list[str], concurrency: int) -> None:
+    start = time.perf_counter()
+    with _request(url, "/batch", {"questions": questions, "concurrency": concurrency}) as response:
+        answers = json.load(response)
+    for answer in answers:
+        print("Question:", answer["question"])
+        print("\nAnalysis:\n", answer.get("analysis") or f"failed: {answer['error']}", "\n")
+    print(f"Answered {len(answers)} questions in {time.perf_counter() - start:.2f}s", file=sys.stderr)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Budget-finance agent: service and client.")
+    parser.add_argument("command", choices=["serve", "ask", "batch", "health"])
+    parser.add_argument("questions", nargs="*")
+    parser.add_argument("--file", type=Path, default=None, help="read questions from a file, one per line")
+    parser.add_argument("--stream", action="store_true", help="print the analysis as it is generated")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="questions in flight at once")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    args = parser.parse_args()
+    url = f"http://{args.host}:{args.port}"
+
+    if args.command == "serve":
+        from src.service import serve
+
+        serve(args.host, args.port)
+        return
+    if args.command == "health":
+        with _request(url, "/health") as response:
+            print(json.dumps(json.load(response), indent=2))
+        return
+
+    questions = list(args.questions)
+    if args.file:
+        questions += [line.strip() for line in args.file.read_text().splitlines() if line.strip()]
+    if not questions:
+        parser.error("give a question (or --file)")
+    if args.command == "ask" and len(questions) == 1:
+        ask(url, questions[0], args.stream)
+    else:
+        batch(url, questions, args.concurrency)
+
+
+if __name__ == "__main__":
+    main()
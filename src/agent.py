@@ -1,3 +1,4 @@
+import functools
 import os
 import sys
 from pathlib import Path
@@ -5,63 +6,108 @@ from pathlib import Path
 # Project root: from src/agent.py go up one level (src -> budget-finance)
 _root = Path(__file__).resolve().parent.parent
 if str(_root) not in sys.path:
-    sys.path.insert(0, str(_root))  
+    sys.path.insert(0, str(_root))
 
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_ollama import ChatOllama
-from langchain_core.runnables import RunnablePassthrough, RunnableLambda
-
-from src.llm.prompts import postgres_system_prompt, analyze_system_prompt
-from src.utils.constants import SQL_LLM_MODEL, ANALYZE_LLM_MODEL
+from src.llm.prompts import analyze_system_prompt, sql_prompt_for
+from src.utils.constants import SQL_LLM_MODEL, ANALYZE_LLM_MODEL, OLLAMA_KEEP_ALIVE, LLM_REPLAY_PATH
 from src.database.execute import execute
+from src.llm.encode import encode_result
+from src.llm.sql_cache import get_sql_cache
+from src.llm.streaming import TimedStream
+from src.utils.tracing import span
 
 ollama_api_key=os.getenv("OLLAMA_API_KEY")
 openai_api_key=os.getenv("OPENAI_API_KEY")
 
-sql_prompt_template = ChatPromptTemplate.from_messages([
-    ("system", postgres_system_prompt),
-    ("human", "Question: {question}"),
-])
+# LangChain is imported and the model clients and prompt templates are built on first use,
+# once per process; importing this module stays cheap. With LLM_REPLAY_PATH set, recorded
+# responses stand in for the models (src/llm/replay.py).
+
+
+def _chat_model(role: str, **kwargs):
+    if LLM_REPLAY_PATH:
+        from src.llm.replay import replay_model
+
+        return replay_model(role)
+    from langchain_ollama import ChatOllama
+
+    return ChatOllama(keep_alive=OLLAMA_KEEP_ALIVE, **kwargs)
+
+
+@functools.cache
+def sql_chain():
+    from langchain_core.prompts import ChatPromptTemplate
+
+    sql_prompt_template = ChatPromptTemplate.from_messages([
+        ("system", "{system}"),
+        ("human", "Question: {question}"),
+    ])
+    sql_llm = _chat_model("sql", model=SQL_LLM_MODEL, api_key=ollama_api_key)
+    return sql_prompt_template | sql_llm
+
+
+@functools.cache
+def analyze_chain():
+    from langchain_core.prompts import ChatPromptTemplate
 
-sql_llm = ChatOllama(model=SQL_LLM_MODEL, api_key=ollama_api_key)
-sql_chain = sql_prompt_template | sql_llm
+    analyze_prompt_template = ChatPromptTemplate.from_messages([
+        ("system", analyze_system_prompt),
+        ("human", "Question: {question}\n\nData: {financial_data}"),
+    ])
+    analyze_llm = _chat_model("analysis", model=ANALYZE_LLM_MODEL, api_key=openai_api_key, temperature=0)
+    return analyze_prompt_template | analyze_llm
+
+
+def generate_sql(question: str) -> str:
+    system = sql_prompt_for(question)
+    with span("sql_llm") as s:
+        out = sql_chain().invoke({"system": system, "question": question})
+        s.record_usage(out)
+    return out.content if hasattr(out, "content") else str(out)
 
 def get_sql_content(x: dict) -> dict:
     question = x["question"]
     print(f"Question: {question}")
-    out = sql_chain.invoke({"question": question})
-    sql_query = out.content if hasattr(out, "content") else str(out)
+    with span("sql_generation"):
+        sql_query = get_sql_cache().get_or_generate(question, generate_sql)
     print(f"SQL Query: {sql_query}")
     rows = execute(sql_query) if sql_query else []
-    print(f"Financial Data: {rows}")
-    return {**x, "sql_query": sql_query, "financial_data": str(rows)}
-
-
-
-analyze_prompt_template = ChatPromptTemplate.from_messages([
-    ("system", analyze_system_prompt),
-    ("human", "Question: {question}\n\nData: {financial_data}"),
-])
+    with span("encode", rows=len(rows)) as s:
+        financial_data, encoding = encode_result(rows)
+        s.set(tokens=encoding["tokens"], saved_tokens=encoding["saved_tokens"])
+    print(f"Financial Data: {financial_data}")
+    print(f"Encoded {encoding['rows']} rows in ~{encoding['tokens']} tokens (saved ~{encoding['saved_tokens']})")
+    return {**x, "sql_query": sql_query, "financial_data": financial_data, "encoding": encoding}
 
-analyze_llm = ChatOllama(model=ANALYZE_LLM_MODEL, api_key=openai_api_key, temperature=0)
-analyze_chain = analyze_prompt_template | analyze_llm
 
 def analyze_data(x: dict) -> dict:
     question = x["question"]
     print(f"Question: {question}")
     financial_data = x["financial_data"]
     print(f"Financial Data: {financial_data}")
-    out = analyze_chain.invoke({"question": question, "financial_data": financial_data})
+    with span("analysis") as s:
+        out = analyze_chain().invoke({"question": question, "financial_data": financial_data})
+        s.record_usage(out)
     print(f"Output: {out}")
     print(f"Analysis: {out.content if hasattr(out, "content") else str(out)}")
-    return {**x, "analysis": out.content if hasattr(out, "content") else str(out)} 
+    return {**x, "analysis": out.content if hasattr(out, "content") else str(out)}
+
+def stream_analyze_data(x: dict) -> TimedStream:
+    """Stream the analysis chunk by chunk; the returned stream records time-to-first-token."""
+    return TimedStream(analyze_chain().stream({"question": x["question"], "financial_data": x["financial_data"]}), name="analysis_stream")
+
+
+@functools.cache
+def sequential_chain():
+    from langchain_core.runnables import RunnablePassthrough, RunnableLambda
 
+    return (
+        RunnablePassthrough()
+        | RunnableLambda(get_sql_content)
+        # | RunnableLambda(analyze_data)
+    )
 
-sequential_chain = (
-    RunnablePassthrough()
-    | RunnableLambda(get_sql_content)
-    # | RunnableLambda(analyze_data)
-)
 
-response = sequential_chain.invoke({"question": "How much did I spend at No Frills?"})
-print("Final Response: ", response)
\ No newline at end of file
+if __name__ == "__main__":
+    response = sequential_chain().invoke({"question": "How much did I spend at No Frills?"})
+    print("Final Response: ", response)
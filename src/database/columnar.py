@@ -0,0 +1,264 @@
+"""
+Embedded columnar store: DuckDB over Parquet files partitioned by month.
+
+The canonical transactions (exported from PostgreSQL, or ingested straight from the
+statements by src/etl/extract.py) are written as one Parquet directory per month, plus the
+two monthly totals tables, under COLUMNAR_STORE_PATH. Queries run in an in-process DuckDB
+whose views are named like the PostgreSQL tables, so the same generated SQL works against
+either backend; scans are vectorized and files outside the months a date filter selects are
+skipped from their Parquet statistics. No server is needed.
+
+The DuckDB connection can only read the store directory: external access is switched off
+and the configuration locked before any query runs.
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import threading
+import time
+from collections.abc import Iterable
+from pathlib import Path
+
+_root = Path(__file__).resolve().parent.parent.parent
+if str(_root) not in sys.path:
+    sys.path.insert(0, str(_root))
+
+import duckdb
+import pandas as pd
+import psycopg
+
+from src.database.execute import FETCH_SIZE, _column_array, streamBatches
+from src.database.guard import QUERY_MAX_ROWS, QUERY_TIMEOUT_MS, QueryRejected, guard_query
+from src.database.result_cache import ResultCache
+from src.utils.tracing import span
+
+COLUMNAR_STORE_PATH = Path(os.environ.get("COLUMNAR_STORE_PATH", _root / ".cache" / "columnar"))
+
+TABLE_NAME = "transactions"
+MERCHANT_TOTALS_TABLE_NAME = "monthly_merchant_totals"
+CATEGORY_TOTALS_TABLE_NAME = "monthly_category_totals"
+# Hive partition column of the transactions files; hidden from queries.
+PARTITION_COLUMN = "txn_month"
+# Written last by every store rewrite; its mtime is the store's data version.
+VERSION_FILE = "VERSION"
+
+STORE_COLUMNS = (
+    "id", "bank", "account_type", "name", "date", "category", "merchant", "description",
+    "debit_amount", "credit_amount", "created_at",
+)
+
+CREATE_STAGING_SQL = f"""
+CREATE TABLE staging (
+    id BIGINT,
+    bank VARCHAR,
+    account_type VARCHAR,
+    name VARCHAR,
+    date DATE,
+    category VARCHAR,
+    merchant VARCHAR,
+    description VARCHAR,
+    debit_amount DECIMAL(15, 2),
+    credit_amount DECIMAL(15, 2),
+    created_at TIMESTAMPTZ,
+    source VARCHAR
+)
+"""
+
+# The same statement row from overlapping exports is stored once, while identical purchases
+# within one file are all kept: the load.FINGERPRINT_SQL rule.
+_DEDUPE_SQL = """
+SELECT * EXCLUDE (ordinal) FROM (
+    SELECT *, row_number() OVER (PARTITION BY source, bank, account_type, date, description, debit_amount, credit_amount) AS ordinal
+    FROM staging
+)
+QUALIFY row_number() OVER (PARTITION BY bank, account_type, date, description, debit_amount, credit_amount, ordinal ORDER BY source) = 1
+"""
+
+# Same shape as the PostgreSQL totals tables (see load._totalsUpsertSql).
+_TOTALS_SQL = """
+SELECT date_trunc('month', date)::DATE AS month, COALESCE(bank, '') AS bank, COALESCE(account_type, '') AS account_type,
+       COALESCE({expr}, '') AS {key}, COALESCE(SUM(debit_amount), 0)::DECIMAL(15, 2) AS debit_total,
+       COALESCE(SUM(credit_amount), 0)::DECIMAL(15, 2) AS credit_total, COUNT(*)::INTEGER AS txn_count
+FROM transactions
+WHERE date IS NOT NULL
+GROUP BY ALL
+ORDER BY month
+"""
+
+
+def write_store(frames: Iterable[pd.DataFrame], path: Path | str = COLUMNAR_STORE_PATH, dedupe: bool = False) -> int:
+    """Rewrite the store from canonical transaction frames. Returns the number of rows written.
+
+    Frames need the load.COLUMNS columns; id and created_at are filled in when missing.
+    With dedupe, each frame must carry a "source" column (e.g. the statement path) and
+    rows are de-duplicated across sources like the PostgreSQL loader does. The new store
+    is built next to the old one and swapped in when complete.
+    """
+    path = Path(path)
+    building = path.with_name(path.name + ".building")
+    shutil.rmtree(building, ignore_errors=True)
+    building.mkdir(parents=True)
+    con = duckdb.connect()
+    try:
+        con.execute(CREATE_STAGING_SQL)
+        for frame in frames:
+            con.register("batch", frame)
+            con.execute("INSERT INTO staging BY NAME SELECT * FROM batch")
+            con.unregister("batch")
+        rows = _DEDUPE_SQL if dedupe else "SELECT * FROM staging"
+        con.execute(f"""
+            CREATE TABLE transactions AS
+            SELECT COALESCE(id, row_number() OVER (ORDER BY date, source)) AS id, * EXCLUDE (id, created_at, source),
+                   COALESCE(created_at, now()) AS created_at
+            FROM ({rows})
+        """)
+        con.execute(
+            f"COPY (SELECT {', '.join(STORE_COLUMNS)}, strftime(date, '%Y-%m') AS {PARTITION_COLUMN} FROM transactions ORDER BY date, id)"
+            f" TO '{building / TABLE_NAME}' (FORMAT parquet, PARTITION_BY ({PARTITION_COLUMN}))"
+        )
+        count = con.execute("SELECT COUNT(*) FROM transactions").fetchone()[0]
+        if count == 0:
+            # A partitioned COPY of no rows writes no files; keep one empty file so the
+            # store still has the table's schema and open_store's glob matches.
+            empty = building / TABLE_NAME / f"{PARTITION_COLUMN}=none"
+            empty.mkdir(parents=True)
+            con.execute(f"COPY (SELECT {', '.join(STORE_COLUMNS)} FROM transactions) TO '{empty / 'data_0.parquet'}' (FORMAT parquet)")
+        for table, key, expr in (
+            (MERCHANT_TOTALS_TABLE_NAME, "merchant", "merchant, description"),
+            (CATEGORY_TOTALS_TABLE_NAME, "category", "category"),
+        ):
+            con.execute(f"COPY ({_TOTALS_SQL.format(key=key, expr=expr)}) TO '{building / table}.parquet' (FORMAT parquet)")
+    finally:
+        con.close()
+    (building / VERSION_FILE).write_text(f"{time.time_ns()}\n")
+    previous = path.with_name(path.name + ".previous")
+    shutil.rmtree(previous, ignore_errors=True)
+    if path.exists():
+        path.rename(previous)
+    building.rename(path)
+    shutil.rmtree(previous, ignore_errors=True)
+    return count
+
+
+def export_from_postgres(
+    path: Path | str = COLUMNAR_STORE_PATH, conn: psycopg.Connection | None = None, fetch_size: int = FETCH_SIZE
+) -> int:
+    """Rewrite the store from the PostgreSQL transactions table, streamed batch by batch."""
+    query = f"SELECT {', '.join(STORE_COLUMNS)} FROM {TABLE_NAME}"
+
+    def frames():
+        for columns, batch in streamBatches(query, conn, fetch_size):
+            yield pd.DataFrame({c.name: _column_array(values, c.type_code) for c, values in zip(columns, zip(*batch))})
+
+    return write_store(frames(), path)
+
+
+def store_version(path: Path | str = COLUMNAR_STORE_PATH) -> int | None:
+    """Data version of the store (changes on every rewrite), or None if there is no store."""
+    try:
+        return os.stat(Path(path) / VERSION_FILE).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def open_store(path: Path | str = COLUMNAR_STORE_PATH) -> duckdb.DuckDBPyConnection:
+    """Open an in-memory DuckDB with read-only views over the store, sandboxed to it."""
+    path = Path(path).resolve()
+    con = duckdb.connect()
+    con.execute(
+        f"CREATE VIEW {TABLE_NAME} AS SELECT * EXCLUDE ({PARTITION_COLUMN})"
+        f" FROM read_parquet('{path / TABLE_NAME}/**/*.parquet', hive_partitioning = true)"
+    )
+    for table in (MERCHANT_TOTALS_TABLE_NAME, CATEGORY_TOTALS_TABLE_NAME):
+        con.execute(f"CREATE VIEW {table} AS SELECT * FROM read_parquet('{path / table}.parquet')")
+    con.execute(f"SET allowed_directories = ['{path}/']")
+    con.execute("SET enable_external_access = false")
+    con.execute("SET lock_configuration = true")
+    return con
+
+
+_store: duckdb.DuckDBPyConnection | None = None
+_store_version: int | None = None
+_store_lock = threading.Lock()
+
+result_cache = ResultCache()
+
+
+def get_store() -> tuple[duckdb.DuckDBPyConnection, int]:
+    """Return the process-wide store connection and its version, reopening it after a rewrite."""
+    global _store, _store_version
+    version = store_version()
+    if version is None:
+        raise FileNotFoundError(
+            f"No columnar store at {COLUMNAR_STORE_PATH}; build it with: python src/database/columnar.py export"
+        )
+    with _store_lock:
+        if _store is None or _store_version != version:
+            if _store is not None:
+                _store.close()
+            _store, _store_version = open_store(), version
+        return _store, version
+
+
+def execute(query: str, use_cache: bool = True, max_rows: int | None = QUERY_MAX_ROWS) -> list[dict]:
+    """Run a query against the columnar store and return the rows as dicts.
+
+    Guarded like the PostgreSQL path (one read-only statement, LIMIT max_rows) and
+    interrupted after QUERY_TIMEOUT_MS. Results are cached until the store is rewritten.
+    """
+    query = guard_query(query, max_rows)
+    with span("query", backend="duckdb") as s:
+        store, version = get_store()
+        if use_cache:
+            rows = result_cache.get(query, version)
+            s.set(cache_hit=rows is not None)
+            if rows is not None:
+                s.set(rows=len(rows))
+                return rows
+        cur = store.cursor()  # one cursor per call: safe across threads
+        timer = threading.Timer(QUERY_TIMEOUT_MS / 1000, cur.interrupt)
+        timer.start()
+        try:
+            cur.execute(query)
+            names = [d[0] for d in cur.description]
+            rows = [dict(zip(names, row)) for row in cur.fetchall()]
+        finally:
+            timer.cancel()
+            cur.close()
+        s.set(rows=len(rows))
+    if use_cache:
+        result_cache.put(query, version, rows)
+    return rows
+
+
+def explain(query: str) -> str | None:
+    """Columnar counterpart of execute.explainQuery: None if the query would run, else the error."""
+    try:
+        query = guard_query(query)
+        with span("explain", backend="duckdb"):
+            store, _ = get_store()
+            cur = store.cursor()
+            try:
+                cur.execute(f"EXPLAIN {query}")
+            finally:
+                cur.close()
+    except (QueryRejected, duckdb.Error) as exc:
+        return str(exc).strip()
+    return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage the embedded columnar store.")
+    parser.add_argument("command", choices=["export", "query"])
+    parser.add_argument("sql", nargs="?", help="query to run (query command)")
+    args = parser.parse_args()
+    start = time.perf_counter()
+    if args.command == "export":
+        rows = export_from_postgres()
+        print(f"Exported {rows} rows to {COLUMNAR_STORE_PATH} in {time.perf_counter() - start:.2f}s")
+    else:
+        for row in execute(args.sql):
+            print(row)
+        print(f"({time.perf_counter() - start:.3f}s)")
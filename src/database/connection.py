@@ -0,0 +1,156 @@
+"""Shared PostgreSQL connection settings and connection pool for budget-finance."""
+
+import asyncio
+import os
+from collections.abc import AsyncIterator, Iterator
+from contextlib import asynccontextmanager, contextmanager
+
+import psycopg
+from psycopg_pool import AsyncConnectionPool, ConnectionPool
+
+# Connection parameters from environment variables
+db = os.environ.get("PGDATABASE", "budget_finance")
+user = os.environ.get("PGUSER", "postgres")
+password = os.environ.get("PGPASSWORD", "sa")
+host = os.environ.get("PGHOST", "localhost")
+port = os.environ.get("PGPORT", "5432")
+
+# Pool sizing and housekeeping
+POOL_MIN_SIZE = int(os.environ.get("PGPOOL_MIN_SIZE", "1"))
+POOL_MAX_SIZE = int(os.environ.get("PGPOOL_MAX_SIZE", "10"))
+POOL_MAX_IDLE = float(os.environ.get("PGPOOL_MAX_IDLE", "600"))  # seconds before an idle extra connection is closed
+POOL_TIMEOUT = float(os.environ.get("PGPOOL_TIMEOUT", "30"))  # seconds to wait for a free connection
+
+_pool: ConnectionPool | None = None
+
+# The async pool belongs to the event loop it was opened on; a new loop gets a new pool.
+_async_pool: AsyncConnectionPool | None = None
+_async_pool_loop: asyncio.AbstractEventLoop | None = None
+_async_pool_lock: asyncio.Lock | None = None
+
+
+def dsn(database: str | None = None) -> str:
+    """Build the connection string for a database (default: PGDATABASE)."""
+    auth = f"{user}:{password}" if password else user
+    return f"postgresql://{auth}@{host}:{port}/{database or db}"
+
+
+def connect(database: str | None = None, autocommit: bool = False) -> psycopg.Connection:
+    """Open a dedicated, unpooled connection (e.g. for CREATE DATABASE)."""
+    return psycopg.connect(dsn(database), autocommit=autocommit)
+
+
+def _reset(conn: psycopg.Connection) -> None:
+    """Undo per-use session changes before a connection goes back to the pool."""
+    if conn.autocommit:
+        conn.autocommit = False
+
+
+async def _areset(conn: psycopg.AsyncConnection) -> None:
+    """Async counterpart of _reset."""
+    if conn.autocommit:
+        await conn.set_autocommit(False)
+
+
+def get_pool() -> ConnectionPool:
+    """Return the process-wide pool, opening it on first use.
+
+    Connections are health-checked before being handed out, and connections above
+    POOL_MIN_SIZE are closed after POOL_MAX_IDLE seconds without use.
+    """
+    global _pool
+    if _pool is None:
+        _pool = ConnectionPool(
+            dsn(),
+            min_size=POOL_MIN_SIZE,
+            max_size=POOL_MAX_SIZE,
+            max_idle=POOL_MAX_IDLE,
+            timeout=POOL_TIMEOUT,
+            check=ConnectionPool.check_connection,
+            reset=_reset,
+            name="budget-finance",
+            open=True,
+        )
+    return _pool
+
+
+@contextmanager
+def connection(conn: psycopg.Connection | None = None) -> Iterator[psycopg.Connection]:
+    """Yield conn if one is given, else borrow a connection from the pool.
+
+    A borrowed connection is committed (or rolled back on error) and returned to the pool
+    on exit; a caller-supplied connection is left untouched.
+    """
+    if conn is not None:
+        yield conn
+        return
+    with get_pool().connection() as pooled:
+        yield pooled
+
+
+async def get_async_pool() -> AsyncConnectionPool:
+    """Return the async pool for the running event loop, opening it on first use."""
+    global _async_pool, _async_pool_loop, _async_pool_lock
+    loop = asyncio.get_running_loop()
+    if _async_pool_loop is not loop:
+        stale, stale_loop = _async_pool, _async_pool_loop
+        _async_pool, _async_pool_loop, _async_pool_lock = None, loop, asyncio.Lock()
+        if stale is not None and stale_loop.is_running():
+            asyncio.run_coroutine_threadsafe(stale.close(), stale_loop)
+        # A pool whose loop has finished has no workers left; dropping it closes its connections.
+    async with _async_pool_lock:
+        if _async_pool is None:
+            pool = AsyncConnectionPool(
+                dsn(),
+                min_size=POOL_MIN_SIZE,
+                max_size=POOL_MAX_SIZE,
+                max_idle=POOL_MAX_IDLE,
+                timeout=POOL_TIMEOUT,
+                check=AsyncConnectionPool.check_connection,
+                reset=_areset,
+                name="budget-finance-async",
+                open=False,
+            )
+            await pool.open()
+            _async_pool = pool
+    return _async_pool
+
+
+@asynccontextmanager
+async def async_connection(conn: psycopg.AsyncConnection | None = None) -> AsyncIterator[psycopg.AsyncConnection]:
+    """Async counterpart of connection()."""
+    if conn is not None:
+        yield conn
+        return
+    pool = await get_async_pool()
+    async with pool.connection() as pooled:
+        yield pooled
+
+
+def pool_stats() -> dict[str, int]:
+    """Return pool statistics, including connections currently in use."""
+    if _pool is None:
+        return {}
+    stats = _pool.get_stats()
+    stats["connections_in_use"] = stats.get("pool_size", 0) - stats.get("pool_available", 0)
+    return stats
+
+
+def close_pool() -> None:
+    """Close the pool and all its connections."""
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        _pool = None
+
+
+async def close_async_pool() -> None:
+    """Close the running loop's async pool and all its connections.
+
+    Call before the event loop ends (e.g. at the end of the coroutine given to
+    asyncio.run): once the loop is gone the pool can no longer be closed cleanly.
+    """
+    global _async_pool
+    if _async_pool is not None and _async_pool_loop is asyncio.get_running_loop():
+        pool, _async_pool = _async_pool, None
+        await pool.close()
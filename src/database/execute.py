@@ -1,51 +1,255 @@
 
+import asyncio
+import itertools
+import math
 import os
+import sys
+from collections.abc import Iterator
+from pathlib import Path
 
+# Project root: from src/database/execute.py go up three levels
+_root = Path(__file__).resolve().parent.parent.parent
+if str(_root) not in sys.path:
+    sys.path.insert(0, str(_root))
+
+import numpy as np
+import pandas as pd
 import psycopg
-from psycopg.rows import dict_row
+from psycopg.rows import dict_row, tuple_row
 
-# Connection parameters from environment variables
-db = os.environ.get("PGDATABASE", "budget_finance")
-user = os.environ.get("PGUSER", "postgres")
-password = os.environ.get("PGPASSWORD", "sa")
-host = os.environ.get("PGHOST", "localhost")
-port = os.environ.get("PGPORT", "5432")
+from src.database.connection import async_connection, connection
+from src.database.guard import (
+    QUERY_MAX_ROWS,
+    QueryRejected,
+    acheck_cost,
+    arestrict_transaction,
+    check_cost,
+    check_query,
+    guard_query,
+    restrict_transaction,
+)
+from src.database.result_cache import result_cache
+from src.utils.constants import QUERY_BACKEND
+from src.utils.tracing import span
 
 TABLE_NAME = "transactions"
 
+# Rows per round trip for server-side cursors.
+FETCH_SIZE = int(os.environ.get("FETCH_SIZE", "10000"))
+
+# PostgreSQL type OIDs with a native NumPy dtype; anything else stays an object array.
+_INT_OIDS = {20, 21, 23}  # int8, int2, int4
+_FLOAT_OIDS = {700, 701, 1700}  # float4, float8, numeric
+_BOOL_OID = 16
+_DATE_OID = 1082
 
-def connect(database: str | None = None) -> psycopg.Connection:
-    """Connect to the database."""
-    auth = f"{user}:{password}" if password else user
-    dsn = f"postgresql://{auth}@{host}:{port}/{database or db}"
-    return psycopg.connect(dsn)
+_cursor_ids = itertools.count()
 
 
 def validateQuery(query: str) -> bool:
-    """Validate a query is a valid SQL query. Which does not contain any SQL injection, delete, update, insert, drop, alter, grant, revoke, etc."""
-    if "SELECT" in query:
-        return True
-    return False
-
-
-def execute(query: str, conn: psycopg.Connection | None = None) -> None:
-    """Execute a query and return the results."""
-    if not validateQuery(query):
-        raise ValueError("Invalid query")
-    if conn is None:
-        conn = connect()
-        own_conn = True
-    else:
-        own_conn = False
-    cur = conn.cursor(row_factory=dict_row)
-    cur.execute(query)
-    rows = cur.fetchall()
-    conn.commit()
-    cur.close()
-    if own_conn:
-        conn.close()
+    """Check that a query is exactly one read-only statement (see src/database/guard.py)."""
+    try:
+        check_query(query)
+    except QueryRejected:
+        return False
+    return True
+
+
+def execute(
+    query: str,
+    conn: psycopg.Connection | None = None,
+    use_cache: bool = True,
+    max_rows: int | None = QUERY_MAX_ROWS,
+    backend: str = QUERY_BACKEND,
+) -> list[dict]:
+    """Execute a query and return the results.
+
+    The query must be a single read-only statement; it gets a LIMIT of max_rows, is
+    rejected if EXPLAIN estimates it above QUERY_MAX_COST, and runs in a read-only
+    transaction under QUERY_TIMEOUT_MS. Raises QueryRejected (a ValueError) otherwise.
+    Results are cached per normalized query until the loader bumps the data version.
+    With backend="duckdb" the query runs on the embedded columnar store instead
+    (src/database/columnar.py) and conn is not used.
+    """
+    if backend == "duckdb":
+        from src.database import columnar
+
+        return columnar.execute(query, use_cache, max_rows)
+    query = guard_query(query, max_rows)
+    with span("query", backend="postgres") as s, connection(conn) as conn:
+        version = result_cache.data_version(conn) if use_cache else None
+        if version is not None:
+            rows = result_cache.get(query, version)
+            s.set(cache_hit=rows is not None)
+            if rows is not None:
+                s.set(rows=len(rows))
+                return rows
+        with conn.transaction():
+            restrict_transaction(conn)
+            check_cost(conn, query)
+            cur = conn.cursor(row_factory=dict_row)
+            cur.execute(query)
+            rows = cur.fetchall()
+            cur.close()
+        s.set(rows=len(rows))
+    if version is not None:
+        result_cache.put(query, version, rows)
     return rows
-    
+
+
+async def aexecute(
+    query: str,
+    conn: psycopg.AsyncConnection | None = None,
+    use_cache: bool = True,
+    max_rows: int | None = QUERY_MAX_ROWS,
+    backend: str = QUERY_BACKEND,
+) -> list[dict]:
+    """Async counterpart of execute(), on the async connection pool."""
+    if backend == "duckdb":
+        from src.database import columnar
+
+        return await asyncio.to_thread(columnar.execute, query, use_cache, max_rows)
+    query = guard_query(query, max_rows)
+    with span("query", backend="postgres") as s:
+        async with async_connection(conn) as conn:
+            version = await result_cache.adata_version(conn) if use_cache else None
+            if version is not None:
+                rows = result_cache.get(query, version)
+                s.set(cache_hit=rows is not None)
+                if rows is not None:
+                    s.set(rows=len(rows))
+                    return rows
+            async with conn.transaction():
+                await arestrict_transaction(conn)
+                await acheck_cost(conn, query)
+                cur = conn.cursor(row_factory=dict_row)
+                await cur.execute(query)
+                rows = await cur.fetchall()
+                await cur.close()
+        s.set(rows=len(rows))
+    if version is not None:
+        result_cache.put(query, version, rows)
+    return rows
+
+
+# Errors that mean the query itself is wrong (syntax, unknown column, type mismatch), as
+# opposed to the database being unreachable.
+_QUERY_ERRORS = (QueryRejected, psycopg.ProgrammingError, psycopg.DataError, psycopg.NotSupportedError)
+
+
+def explainQuery(query: str, conn: psycopg.Connection | None = None, backend: str = QUERY_BACKEND) -> str | None:
+    """Check that a query would run, without running it.
+
+    The query goes through the same guard and EXPLAIN cost check as execute(). Returns
+    None if it passes, else the guard's or the database's error message (the kind of
+    feedback a model can repair a query from).
+    """
+    if backend == "duckdb":
+        from src.database import columnar
+
+        return columnar.explain(query)
+    try:
+        query = guard_query(query)
+        with span("explain", backend="postgres"), connection(conn) as conn, conn.transaction():
+            restrict_transaction(conn)
+            check_cost(conn, query)
+    except _QUERY_ERRORS as exc:
+        return str(exc).strip()
+    return None
+
+
+async def aexplainQuery(query: str, conn: psycopg.AsyncConnection | None = None, backend: str = QUERY_BACKEND) -> str | None:
+    """Async counterpart of explainQuery()."""
+    if backend == "duckdb":
+        from src.database import columnar
+
+        return await asyncio.to_thread(columnar.explain, query)
+    try:
+        query = guard_query(query)
+        with span("explain", backend="postgres"):
+            async with async_connection(conn) as conn, conn.transaction():
+                await arestrict_transaction(conn)
+                await acheck_cost(conn, query)
+    except _QUERY_ERRORS as exc:
+        return str(exc).strip()
+    return None
+
+
+def streamBatches(
+    query: str, conn: psycopg.Connection | None = None, fetch_size: int = FETCH_SIZE
+) -> Iterator[tuple[list[psycopg.Column], list[tuple]]]:
+    """Run a query on a named server-side cursor and yield (columns, rows) batches.
+
+    At most fetch_size rows are held client-side at a time, so arbitrarily large
+    results stream in constant memory. The query must be a single read-only statement and
+    runs in a read-only transaction, but without a row limit, cost check or timeout, since
+    this is the path for full exports. Results bypass the result cache.
+    """
+    query = check_query(query)
+    with connection(conn) as conn, conn.transaction():
+        restrict_transaction(conn, timeout_ms=None)
+        with conn.cursor(name=f"stream_{next(_cursor_ids)}", row_factory=tuple_row) as cur:
+            cur.execute(query)
+            batch = cur.fetchmany(fetch_size)
+            yield cur.description, batch  # even when empty, so callers see the columns
+            while batch := cur.fetchmany(fetch_size):
+                yield cur.description, batch
+
+
+def streamRows(query: str, conn: psycopg.Connection | None = None, fetch_size: int = FETCH_SIZE) -> Iterator[dict]:
+    """Like execute(), but yield rows one at a time from a server-side cursor."""
+    for columns, batch in streamBatches(query, conn, fetch_size):
+        names = [c.name for c in columns]
+        for row in batch:
+            yield dict(zip(names, row))
+
+
+def _column_array(values: tuple, type_code: int) -> np.ndarray:
+    """Convert one batch of a column to a NumPy array with a native dtype where possible."""
+    if type_code in _FLOAT_OIDS:
+        return np.fromiter((math.nan if v is None else v for v in values), dtype=np.float64, count=len(values))
+    if type_code in _INT_OIDS:
+        if None in values:
+            return np.fromiter((math.nan if v is None else v for v in values), dtype=np.float64, count=len(values))
+        return np.fromiter(values, dtype=np.int64, count=len(values))
+    if type_code == _BOOL_OID and None not in values:
+        return np.fromiter(values, dtype=np.bool_, count=len(values))
+    if type_code == _DATE_OID:
+        return np.array(values, dtype="datetime64[D]")
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def fetchArrays(query: str, conn: psycopg.Connection | None = None, fetch_size: int = FETCH_SIZE) -> dict[str, np.ndarray]:
+    """Run a query and return one NumPy array per column, built batch by batch.
+
+    Numbers become float64 (or int64 for integer columns without NULLs, with NULL as
+    NaN otherwise), dates datetime64[D]; other types are object arrays. Rows are never
+    materialized as dicts.
+    """
+    names: list[str] = []
+    chunks: list[list[np.ndarray]] = []
+    for columns, batch in streamBatches(query, conn, fetch_size):
+        if not names:
+            names = [c.name for c in columns]
+            chunks = [[] for _ in columns]
+        for i, values in enumerate(zip(*batch)):
+            chunks[i].append(_column_array(values, columns[i].type_code))
+    arrays = {}
+    for name, parts in zip(names, chunks):
+        # An int column that had NULLs in some batch only: promote the others to float.
+        if any(p.dtype == np.float64 for p in parts) and any(p.dtype == np.int64 for p in parts):
+            parts = [p.astype(np.float64) for p in parts]
+        arrays[name] = np.concatenate(parts) if parts else np.empty(0, dtype=object)
+    return arrays
+
+
+def fetchFrame(query: str, conn: psycopg.Connection | None = None, fetch_size: int = FETCH_SIZE) -> pd.DataFrame:
+    """Run a query and return a DataFrame built from fetchArrays() columns."""
+    return pd.DataFrame(fetchArrays(query, conn, fetch_size))
+
+
 # if __name__ == "__main__":
     # rows = execute("SELECT * FROM transactions where bank = 'CIBC' and debit_amount > 100")
     # rows = execute("delete from transactions")
@@ -0,0 +1,219 @@
+"""
+Guard for model-generated SQL.
+
+A small lexer (strings, quoted identifiers, dollar quotes and comments are skipped, so
+keywords inside them do not count) checks that the text is exactly one read-only
+statement, then adds a row LIMIT when the top-level query has none or caps one above
+QUERY_MAX_ROWS. At run time the statement executes in a READ ONLY transaction with a
+statement_timeout, after EXPLAIN has checked that its estimated cost is below
+QUERY_MAX_COST, so one bad query cannot tie up the database for everyone else.
+"""
+
+import os
+import re
+from typing import NamedTuple
+
+import psycopg
+
+QUERY_MAX_ROWS = int(os.environ.get("QUERY_MAX_ROWS", "10000"))
+QUERY_TIMEOUT_MS = int(os.environ.get("QUERY_TIMEOUT_MS", "10000"))
+# Planner cost units; a sequential scan costs roughly 0.01 per row plus 1 per 8 kB page.
+QUERY_MAX_COST = float(os.environ.get("QUERY_MAX_COST", "1000000"))
+
+_TOKEN = re.compile(
+    r"""
+      (?P<space>\s+)
+    | (?P<comment>--[^\n]*|/\*.*?\*/)
+    | (?P<string>[Ee]'(?:[^'\\]|\\.|'')*'|(?:[BbXxNn]|[Uu]&)?'(?:[^']|'')*')
+    | (?P<dollar>\$(?P<tag>(?:[A-Za-z_]\w*)?)\$.*?\$(?P=tag)\$)
+    | (?P<ident>(?:[Uu]&)?"(?:[^"]|"")*")
+    | (?P<param>\$\d+)
+    | (?P<word>[A-Za-z_][\w$]*)
+    | (?P<number>(?:\d+(?:\.\d*)?|\.\d+)(?:[Ee][+-]?\d+)?)
+    | (?P<punct>::|[(),;.\[\]])
+    | (?P<op>[+\-*/<>=~!@#%^&|`?:]+)
+    """,
+    re.S | re.X,
+)
+
+_STATEMENT_STARTS = {"SELECT", "WITH", "VALUES", "TABLE"}
+
+# Keywords that only appear in statements that write, lock or change session state.
+_FORBIDDEN_WORDS = {
+    "ALTER", "ANALYZE", "CALL", "CHECKPOINT", "CLUSTER", "COPY", "CREATE", "DEALLOCATE",
+    "DELETE", "DISCARD", "DO", "DROP", "EXECUTE", "GRANT", "IMPORT", "INSERT", "INTO", "LISTEN",
+    "LOAD", "LOCK", "MERGE", "NOTIFY", "PREPARE", "REASSIGN", "REFRESH", "REINDEX", "RESET",
+    "REVOKE", "SECURITY", "SET", "TRUNCATE", "UNLISTEN", "UPDATE", "VACUUM",
+    # DuckDB (src/database/columnar.py)
+    "ATTACH", "DETACH", "EXPORT", "INSTALL", "PRAGMA",
+}
+
+# Functions with side effects outside the query (sleeping, signalling backends, files, config).
+_FORBIDDEN_FUNCTIONS = re.compile(
+    r"pg_sleep\w*|pg_(?:terminate|cancel)_backend|pg_reload_conf|pg_rotate_logfile|pg_read_\w*file"
+    r"|pg_ls_\w+|pg_stat_file|pg_(?:try_)?advisory\w*|pg_notify|lo_\w+|dblink\w*|set_config"
+    r"|nextval|setval|txid_current\w*|pg_current_xact_id\w*|query_to_xml\w*"
+    r"|read_\w+|glob|getenv|query(?:_table)?",  # DuckDB file readers and dynamic SQL
+    re.I,
+)
+
+
+class QueryRejected(ValueError):
+    """Raised when a query is not a single read-only statement or is too expensive."""
+
+
+class Token(NamedTuple):
+    kind: str
+    value: str
+    start: int
+    end: int
+
+
+def tokenize(sql: str) -> list[Token]:
+    """Split sql into significant tokens (no whitespace or comments)."""
+    tokens, pos = [], 0
+    while pos < len(sql):
+        match = _TOKEN.match(sql, pos)
+        if match is None:
+            raise QueryRejected(f"Cannot parse query near: {sql[pos:pos + 20]!r}")
+        kind = match.lastgroup if match.lastgroup != "tag" else "dollar"
+        if kind not in ("space", "comment"):
+            tokens.append(Token(kind, match.group(), match.start(), match.end()))
+        pos = match.end()
+    return tokens
+
+
+def _single_statement(tokens: list[Token]) -> list[Token]:
+    statements, current = [], []
+    for token in tokens:
+        if token.value == ";":
+            if current:
+                statements.append(current)
+            current = []
+        else:
+            current.append(token)
+    if current:
+        statements.append(current)
+    if len(statements) != 1:
+        raise QueryRejected(f"Expected exactly one statement, got {len(statements)}")
+    return statements[0]
+
+
+def _check_read_only(tokens: list[Token]) -> None:
+    first = next((t for t in tokens if t.value != "("), None)
+    if first is None or first.kind != "word" or first.value.upper() not in _STATEMENT_STARTS:
+        raise QueryRejected("Only SELECT queries are allowed")
+    for i, token in enumerate(tokens):
+        if token.kind == "ident" and i + 1 < len(tokens) and tokens[i + 1].value == "(":
+            _check_quoted_call(token.value)
+        if token.kind != "word":
+            continue
+        word = token.value.upper()
+        if word in _FORBIDDEN_WORDS:
+            raise QueryRejected(f"{word} is not allowed in a read-only query")
+        following = tokens[i + 1].value.upper() if i + 1 < len(tokens) else ""
+        if word == "FOR" and following in ("SHARE", "NO", "KEY"):
+            raise QueryRejected("Row-locking clauses are not allowed")
+        if word == "COMMENT" and following == "ON":  # a bare "comment" is an ordinary name
+            raise QueryRejected("COMMENT is not allowed in a read-only query")
+        if following == "(" and _FORBIDDEN_FUNCTIONS.fullmatch(token.value):
+            raise QueryRejected(f"{token.value}() is not allowed")
+
+
+def _check_quoted_call(ident: str) -> None:
+    """Apply the function check to a quoted name called as a function, e.g. "pg_sleep"(9).
+
+    Names are compared ignoring case (DuckDB folds even quoted names). Unicode-escaped
+    names (U&"...") could spell any function, so they are not allowed as calls at all.
+    """
+    if ident[0] in "Uu":
+        raise QueryRejected(f"{ident}() is not allowed")
+    name = ident[1:-1].replace('""', '"')
+    if _FORBIDDEN_FUNCTIONS.fullmatch(name):
+        raise QueryRejected(f"{name}() is not allowed")
+
+
+def _limit_query(sql: str, tokens: list[Token], max_rows: int) -> str:
+    """Rebuild the statement with a top-level LIMIT of at most max_rows."""
+    text = sql[tokens[0].start:tokens[-1].end]
+    offset = tokens[0].start
+    depth = 0
+    for i, token in enumerate(tokens):
+        if token.value in ("(", "["):
+            depth += 1
+        elif token.value in (")", "]"):
+            depth -= 1
+        elif depth == 0 and token.kind == "word" and token.value.upper() in ("LIMIT", "FETCH"):
+            if token.value.upper() == "FETCH":
+                return text  # FETCH FIRST n ROWS ONLY: leave as written
+            value = tokens[i + 1] if i + 1 < len(tokens) else None
+            if value is not None and (value.value.upper() == "ALL" or (value.kind == "number" and float(value.value) > max_rows)):
+                return text[:value.start - offset] + str(max_rows) + text[value.end - offset:]
+            return text
+    return f"{text}\nLIMIT {max_rows}"
+
+
+def check_query(sql: str) -> str:
+    """Return the single read-only statement in sql (without trailing ';' or comments).
+
+    >>> check_query('SELECT "merchant", COUNT(*) FROM transactions GROUP BY 1;')
+    'SELECT "merchant", COUNT(*) FROM transactions GROUP BY 1'
+    >>> for sql in ('SELECT "pg_sleep"(9)', 'SELECT "pg_catalog"."set_config"(user, user, false)'):
+    ...     try:
+    ...         check_query(sql)
+    ...     except QueryRejected as exc:
+    ...         print(exc)
+    pg_sleep() is not allowed
+    set_config() is not allowed
+    """
+    tokens = _single_statement(tokenize(sql))
+    _check_read_only(tokens)
+    return sql[tokens[0].start:tokens[-1].end]
+
+
+def guard_query(sql: str, max_rows: int | None = QUERY_MAX_ROWS) -> str:
+    """Check sql like check_query and bound its result to max_rows (None: no limit)."""
+    tokens = _single_statement(tokenize(sql))
+    _check_read_only(tokens)
+    if max_rows is None:
+        return sql[tokens[0].start:tokens[-1].end]
+    return _limit_query(sql, tokens, max_rows)
+
+
+def _restrict_sql(timeout_ms: int | None) -> list[str]:
+    statements = ["SET TRANSACTION READ ONLY"]
+    if timeout_ms:
+        statements.append(f"SET LOCAL statement_timeout = {int(timeout_ms)}")
+    return statements
+
+
+def _check_plan(plan, max_cost: float) -> float:
+    cost = plan[0]["Plan"]["Total Cost"]
+    if cost > max_cost:
+        raise QueryRejected(f"Estimated query cost {cost:,.0f} exceeds the limit of {max_cost:,.0f}")
+    return cost
+
+
+def restrict_transaction(conn: psycopg.Connection, timeout_ms: int | None = QUERY_TIMEOUT_MS) -> None:
+    """Make the open transaction read-only and bound each statement's run time."""
+    for statement in _restrict_sql(timeout_ms):
+        conn.execute(statement)
+
+
+async def arestrict_transaction(conn: psycopg.AsyncConnection, timeout_ms: int | None = QUERY_TIMEOUT_MS) -> None:
+    """Async counterpart of restrict_transaction."""
+    for statement in _restrict_sql(timeout_ms):
+        await conn.execute(statement)
+
+
+def check_cost(conn: psycopg.Connection, sql: str, max_cost: float = QUERY_MAX_COST) -> float:
+    """EXPLAIN sql and reject it if the planner's total cost estimate exceeds max_cost."""
+    plan = conn.execute(f"EXPLAIN (FORMAT JSON) {sql}").fetchone()[0]
+    return _check_plan(plan, max_cost)
+
+
+async def acheck_cost(conn: psycopg.AsyncConnection, sql: str, max_cost: float = QUERY_MAX_COST) -> float:
+    """Async counterpart of check_cost."""
+    cur = await conn.execute(f"EXPLAIN (FORMAT JSON) {sql}")
+    plan = (await cur.fetchone())[0]
+    return _check_plan(plan, max_cost)
@@ -0,0 +1,139 @@
+"""
+In-process cache of query results, invalidated by the ingestion data version.
+
+The loader bumps a counter in the data_version table in the same transaction that commits
+new rows. Cached results are keyed on the normalized SQL text plus that counter, so a
+result is reused until the next ingest. The counter is re-read at most every
+RESULT_CACHE_VERSION_CHECK_SECONDS, so for up to that long after an ingest commits, other
+processes may still serve results from before it. The loading process itself re-reads the
+counter as soon as its load commits (expire_version).
+"""
+
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+
+import psycopg
+
+DATA_VERSION_TABLE_NAME = "data_version"
+DATA_VERSION_SQL = f"SELECT version FROM {DATA_VERSION_TABLE_NAME}"
+
+RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", "256"))
+RESULT_CACHE_MAX_ROWS = int(os.environ.get("RESULT_CACHE_MAX_ROWS", "200000"))
+# How long a data version read from the database is trusted before asking again.
+RESULT_CACHE_VERSION_CHECK_SECONDS = float(os.environ.get("RESULT_CACHE_VERSION_CHECK_SECONDS", "5"))
+
+_STRING_LITERAL = re.compile(r"('(?:[^']|'')*')")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_sql(query: str) -> str:
+    """Collapse whitespace outside string literals and drop a trailing semicolon."""
+    parts = _STRING_LITERAL.split(query.strip())
+    # Odd indexes are the string literals captured by the split; keep them verbatim.
+    text = "".join(part if i % 2 else _WHITESPACE.sub(" ", part) for i, part in enumerate(parts))
+    return text.strip().rstrip(";").strip()
+
+
+class ResultCache:
+    """LRU cache of query results bounded by entry count and total cached rows."""
+
+    def __init__(
+        self,
+        max_entries: int = RESULT_CACHE_MAX_ENTRIES,
+        max_rows: int = RESULT_CACHE_MAX_ROWS,
+        version_check_seconds: float = RESULT_CACHE_VERSION_CHECK_SECONDS,
+    ):
+        self.max_entries = max_entries
+        self.max_rows = max_rows
+        self.version_check_seconds = version_check_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[tuple[str, int], list[dict]] = OrderedDict()
+        self._rows = 0
+        self._version: int | None = None
+        self._version_read_at = 0.0
+        self._lock = threading.Lock()
+
+    def data_version(self, conn: psycopg.Connection) -> int | None:
+        """Return the current data version, re-reading it at most every few seconds.
+
+        Returns None when the data_version table does not exist yet (caching disabled).
+        """
+        if self._version_is_fresh():
+            return self._version
+        try:
+            with conn.transaction():
+                row = conn.execute(DATA_VERSION_SQL).fetchone()
+        except psycopg.errors.UndefinedTable:
+            return None
+        return self._remember_version(row)
+
+    async def adata_version(self, conn: psycopg.AsyncConnection) -> int | None:
+        """Async counterpart of data_version."""
+        if self._version_is_fresh():
+            return self._version
+        try:
+            async with conn.transaction():
+                cur = await conn.execute(DATA_VERSION_SQL)
+                row = await cur.fetchone()
+        except psycopg.errors.UndefinedTable:
+            return None
+        return self._remember_version(row)
+
+    def _version_is_fresh(self) -> bool:
+        return self._version is not None and time.monotonic() - self._version_read_at < self.version_check_seconds
+
+    def _remember_version(self, row: tuple | None) -> int:
+        self._version = row[0] if row else 0
+        self._version_read_at = time.monotonic()
+        return self._version
+
+    def expire_version(self) -> None:
+        """Stop trusting the data version read last; the next lookup reads it again."""
+        with self._lock:
+            self._version = None
+
+    def get(self, query: str, version: int) -> list[dict] | None:
+        """Return cached rows for the query at this data version, or None on a miss."""
+        key = (normalize_sql(query), version)
+        with self._lock:
+            rows = self._entries.get(key)
+            if rows is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return list(rows)
+
+    def put(self, query: str, version: int, rows: list[dict]) -> None:
+        """Cache rows for the query, evicting least recently used results to stay in bounds."""
+        if len(rows) > self.max_rows:
+            return
+        key = (normalize_sql(query), version)
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._rows -= len(old)
+            self._entries[key] = list(rows)
+            self._rows += len(rows)
+            while len(self._entries) > self.max_entries or self._rows > self.max_rows:
+                _, evicted = self._entries.popitem(last=False)
+                self._rows -= len(evicted)
+
+    def clear(self) -> None:
+        """Drop every cached result."""
+        with self._lock:
+            self._entries.clear()
+            self._rows = 0
+            self._version = None
+
+    def stats(self) -> dict[str, int]:
+        """Return hit/miss counters and current size."""
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "rows": self._rows}
+
+
+result_cache = ResultCache()
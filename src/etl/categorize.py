@@ -0,0 +1,178 @@
+"""
+Merchant normalization and categorization for the ETL.
+
+Rules come from a user-editable CSV (merchant_rules.csv next to this file, or
+MERCHANT_RULES_PATH): pattern, merchant, category. All patterns are compiled into one
+Aho-Corasick automaton, so each description is scanned once no matter how many rules
+there are, and each distinct description in a batch is matched only once. Descriptions
+that match no rule get a merchant derived from their leading words (store numbers,
+locations and payment-type suffixes dropped).
+"""
+
+import csv
+import os
+import re
+import unicodedata
+from pathlib import Path
+from typing import NamedTuple
+
+import numpy as np
+import pandas as pd
+
+MERCHANT_RULES_PATH = Path(os.environ.get("MERCHANT_RULES_PATH", Path(__file__).resolve().parent / "merchant_rules.csv"))
+
+_NON_ALNUM = re.compile(r"[^A-Z0-9]+")
+# Most merchant names are a few words; store numbers and locations come after.
+_FALLBACK_WORDS = 3
+
+
+class Rule(NamedTuple):
+    pattern: str
+    merchant: str
+    category: str | None
+
+
+def normalize_description(description: str) -> str:
+    """Uppercase, strip accents and reduce everything but letters and digits to single spaces."""
+    text = unicodedata.normalize("NFKD", description).encode("ascii", "ignore").decode()
+    return _NON_ALNUM.sub(" ", text.upper()).strip()
+
+
+def load_rules(path: Path | str = MERCHANT_RULES_PATH) -> list[Rule]:
+    """Read rules from a CSV with pattern, merchant, category columns ('#' lines are comments)."""
+    with open(path, newline="") as f:
+        lines = (line for line in f if not line.lstrip().startswith("#"))
+        rules = []
+        for row in csv.DictReader(lines):
+            pattern = normalize_description(row.get("pattern") or "")
+            if pattern and row.get("merchant"):
+                rules.append(Rule(pattern, row["merchant"].strip(), (row.get("category") or "").strip() or None))
+    return rules
+
+
+class MerchantMatcher:
+    """Aho-Corasick automaton over rule patterns, matching whole words.
+
+    The automaton is compiled to a full transition table over the normalized alphabet
+    (A-Z, 0-9, space), so matching is one dict lookup per character with no fallback
+    loop. When several patterns match, the longest wins, then the earliest rule.
+    """
+
+    def __init__(self, rules: list[Rule]):
+        self.rules = rules
+        # Trie over " PATTERN " so matches start and end on word boundaries.
+        goto: list[dict[str, int]] = [{}]
+        rank: list[float] = [np.inf]
+        for index, rule in enumerate(rules):
+            state = 0
+            for ch in f" {rule.pattern} ":
+                if ch not in goto[state]:
+                    goto.append({})
+                    rank.append(np.inf)
+                    goto[state][ch] = len(goto) - 1
+                state = goto[state][ch]
+            # Lower rank is better: longer patterns first, then rule order.
+            rank[state] = min(rank[state], -len(rule.pattern) * len(rules) + index)
+
+        alphabet = set(" ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789")
+        delta: list[dict[str, int]] = [dict.fromkeys(alphabet, 0) for _ in goto]
+        fail = [0] * len(goto)
+        queue = []
+        for ch, child in goto[0].items():
+            delta[0][ch] = child
+            queue.append(child)
+        for state in queue:  # breadth-first; the queue grows as we go
+            # A state also reports the best match of its longest proper suffix.
+            rank[state] = min(rank[state], rank[fail[state]])
+            for ch in alphabet:
+                child = goto[state].get(ch)
+                if child is None:
+                    delta[state][ch] = delta[fail[state]][ch]
+                else:
+                    fail[child] = delta[fail[state]][ch]
+                    delta[state][ch] = child
+                    queue.append(child)
+        self._delta = delta
+        self._rank = rank
+
+    def match(self, normalized: str) -> Rule | None:
+        """Return the best rule matching a normalized description, or None."""
+        delta, rank = self._delta, self._rank
+        state, best = 0, np.inf
+        for ch in f" {normalized} ":
+            state = delta[state][ch]
+            if rank[state] < best:
+                best = rank[state]
+        if best == np.inf:
+            return None
+        return self.rules[int(best) % len(self.rules)]
+
+
+def fallback_merchant(normalized: str) -> str | None:
+    """Merchant name from a description no rule matched: its leading words, title-cased.
+
+    Words from the first one containing a digit (store numbers, card suffixes) on are dropped.
+    """
+    words = []
+    for word in normalized.split():
+        if any(ch.isdigit() for ch in word) or len(words) == _FALLBACK_WORDS:
+            break
+        words.append(word)
+    if not words:
+        words = normalized.split()[:_FALLBACK_WORDS]
+    return " ".join(words).title() or None
+
+
+_matcher: MerchantMatcher | None = None
+_matcher_key: tuple[str, float] | None = None
+
+
+def get_matcher(path: Path | str = MERCHANT_RULES_PATH) -> MerchantMatcher:
+    """Return the matcher for the rule file, recompiling it when the file changes."""
+    global _matcher, _matcher_key
+    key = (str(path), os.stat(path).st_mtime)
+    if _matcher is None or _matcher_key != key:
+        _matcher, _matcher_key = MerchantMatcher(load_rules(path)), key
+    return _matcher
+
+
+def categorize(description: str | None, category: str | None = None) -> tuple[str | None, str | None]:
+    """Return (merchant, category) for one description.
+
+    A matching rule's category replaces the bank's; otherwise the bank's category is kept.
+    A missing description (None, empty, or the NaN of a pandas-sourced record) has no
+    merchant.
+
+    >>> categorize(float("nan"), "Groceries")
+    (None, 'Groceries')
+    """
+    if not isinstance(description, str) or not description:
+        return None, category
+    normalized = normalize_description(description)
+    rule = get_matcher().match(normalized)
+    if rule is None:
+        return fallback_merchant(normalized), category
+    return rule.merchant, rule.category or category
+
+
+def categorize_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    """Fill the merchant and category columns of a canonical DataFrame in place.
+
+    Each distinct description is matched once, so cost scales with the number of distinct
+    descriptions rather than rows.
+    """
+    codes, uniques = pd.factorize(frame["description"], use_na_sentinel=True)
+    matcher = get_matcher()
+    merchants = np.empty(len(uniques) + 1, dtype=object)  # last slot: missing description
+    rule_categories = np.empty(len(uniques) + 1, dtype=object)
+    for i, description in enumerate(uniques):
+        normalized = normalize_description(str(description))
+        rule = matcher.match(normalized)
+        if rule is None:
+            merchants[i] = fallback_merchant(normalized)
+        else:
+            merchants[i], rule_categories[i] = rule.merchant, rule.category
+    frame["merchant"] = merchants[codes]
+    rule_category = pd.Series(rule_categories[codes], index=frame.index)
+    frame["category"] = rule_category.where(rule_category.notna(), frame["category"])
+    return frame
@@ -1,32 +1,247 @@
-"""Read CSV files from the statements folder."""
+"""Read CSV and PDF statements from the statements folder."""
 
+import argparse
+import hashlib
+import multiprocessing
+import sys
+import time
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from itertools import chain
 from pathlib import Path
 
+# Project root: from src/etl/extract.py go up three levels
+_root = Path(__file__).resolve().parent.parent.parent
+if str(_root) not in sys.path:
+    sys.path.insert(0, str(_root))
+
 import pandas as pd
-from etl.trasform import transform_records
+import psycopg
+from src.database.connection import connection
+from src.database.result_cache import result_cache
+from src.etl.load import COLUMNS, copyCsv, copyTransactions, frameToCsv, loadedFileHashes, recordFile
+from src.etl.pdf import PDF_BACKEND, extract_tables, statement_date, table_records
+from src.etl.trasform import frame_to_records, transform_frame, transform_records
+from src.utils.tracing import record_span, span
 
-transactions = []
+# Rows per chunk in streaming mode; bounds peak memory per file.
+CHUNK_SIZE = 50_000
 
-def read_statements(csv_path: Path) -> dict[Path, pd.DataFrame]:
-    """Read all CSV files from the statements folder, including subfolders.
+STATEMENT_SUFFIXES = (".csv", ".pdf")
 
-    Returns a dict mapping each file path to its DataFrame.
-    """
-    df = pd.read_csv(csv_path)
+
+def read_pdf_statement(
+    pdf_path: Path, backend: str = PDF_BACKEND, workers: int | None = None, executor=None, content_hash: str | None = None
+) -> list[dict]:
+    """Read a PDF statement's tables page-parallel (cached per page) and transform them into canonical dicts."""
+    with span("read", file=pdf_path.name, backend=backend) as s:
+        tables = extract_tables(pdf_path, backend, workers=workers, executor=executor, content_hash=content_hash)
+        s.set(tables=len(tables))
+    with span("transform", file=pdf_path.name) as s:
+        records = transform_records(table_records(tables, pdf_path.name, statement_date(pdf_path)), pdf_path.name)
+        s.set(rows=len(records))
+    return records
+
+def read_statements(csv_path: Path) -> list[dict]:
+    """Read a single statement CSV (or PDF) and transform it into canonical transaction dicts."""
+    if csv_path.suffix.lower() == ".pdf":
+        return read_pdf_statement(csv_path)
     filename = csv_path.name
-    transformed = transform_records(df.to_dict("records"), filename)
+    with span("read", file=filename) as s:
+        df = pd.read_csv(csv_path)
+        s.set(rows=len(df))
+    with span("transform", file=filename) as s:
+        transformed = frame_to_records(transform_frame(df, filename))
+        s.set(rows=len(transformed))
     return transformed
 
-def extract_statements(statements_dir: Path | str | None = None) -> dict[Path, pd.DataFrame]:
-    """Extract all statements from the statements folder, including subfolders.
-    """
+def iter_statement_chunks(csv_path: Path, chunksize: int = CHUNK_SIZE) -> Iterator[list[dict]]:
+    """Read and transform a statement CSV chunk by chunk, yielding canonical dicts per chunk."""
+    with pd.read_csv(csv_path, chunksize=chunksize) as reader:
+        for df in reader:
+            with span("transform", file=csv_path.name) as s:
+                records = frame_to_records(transform_frame(df, csv_path.name))
+                s.set(rows=len(records))
+            yield records
+
+def statement_files(statements_dir: Path | str | None = None) -> list[Path]:
+    """List all statement CSVs and PDFs in the statements folder, including subfolders."""
     base = Path(__file__).resolve().parent.parent
     statements_dir = Path(statements_dir) if statements_dir else base / "statements/dec"
-    for csv_path in statements_dir.rglob("*.csv"):
-        transformed = read_statements(csv_path)
-        transactions.append(transformed)
-    print(transactions)
-    return transactions
+    return sorted(p for p in statements_dir.rglob("*") if p.suffix.lower() in STATEMENT_SUFFIXES)
+
+def file_digest(csv_path: Path) -> str:
+    """SHA-256 of a file's bytes; its identity in the ingest manifest."""
+    with open(csv_path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+def _pending_files(files: list[Path], conn: psycopg.Connection, force: bool = False) -> list[tuple[Path, str]]:
+    """Pair each file with its content hash, dropping files the manifest already has."""
+    # Read in a transaction of its own: left open, it would turn each file's transaction
+    # into a savepoint, committing nothing until the whole run ends.
+    with conn.transaction():
+        loaded = set() if force else loadedFileHashes(conn)
+    pending = []
+    for csv_path in files:
+        digest = file_digest(csv_path)
+        if digest in loaded:
+            print(f"Skipping unchanged {csv_path.name}")
+            continue
+        loaded.add(digest)
+        pending.append((csv_path, digest))
+    return pending
+
+def _print_summary(total: int, files: int, start: float) -> None:
+    elapsed = time.perf_counter() - start
+    rate = total / elapsed if elapsed > 0 else float("inf")
+    print(f"Loaded {total} new rows from {files} files in {elapsed:.2f}s ({rate:,.0f} rows/sec)")
+
+def extract_statements(
+    statements_dir: Path | str | None = None,
+    chunksize: int | None = None,
+    force: bool = False,
+    pdf_backend: str = PDF_BACKEND,
+) -> int:
+    """Extract all statements from the statements folder, including subfolders.
+
+    Files whose content hash is already in the ingest manifest are skipped without being
+    parsed (unless force). Each remaining file is bulk-loaded with COPY and recorded in the
+    manifest in its own transaction over one shared connection; rows already stored (by
+    fingerprint) are skipped, so overlapping exports load idempotently.
+    With chunksize, files are read, transformed and streamed into COPY chunk by chunk, so
+    peak memory is bounded by the chunk size rather than the file size. PDF pages are
+    parsed across one worker process per CPU with pdf_backend.
+    Returns the number of new rows loaded.
+    """
+    def file_rows(csv_path: Path, digest: str) -> Iterator[dict]:
+        if csv_path.suffix.lower() == ".pdf":
+            return iter(read_pdf_statement(csv_path, pdf_backend, content_hash=digest))
+        if chunksize is None:
+            return iter(read_statements(csv_path))
+        return chain.from_iterable(iter_statement_chunks(csv_path, chunksize))
+
+    total = 0
+    start = time.perf_counter()
+    with span("etl", mode="chunked" if chunksize else "serial") as etl, connection() as conn:
+        pending = _pending_files(statement_files(statements_dir), conn, force)
+        for csv_path, digest in pending:
+            # Streamed files are read and transformed while COPY runs, inside this span.
+            with span("load", file=csv_path.name) as s, conn.transaction():
+                rows = copyTransactions(file_rows(csv_path, digest), conn)
+                recordFile(digest, str(csv_path), rows, conn)
+                s.set(rows=rows)
+            result_cache.expire_version()
+            total += rows
+        etl.set(files=len(pending), rows=total)
+    _print_summary(total, len(pending), start)
+    return total
+
+def _transform_file(csv_path: Path) -> tuple[Path, bytes, float]:
+    """Worker: read, transform and serialize one file for COPY. Returns the payload and elapsed seconds."""
+    start = time.perf_counter()
+    frame = transform_frame(pd.read_csv(csv_path), csv_path.name)
+    return csv_path, frameToCsv(frame), time.perf_counter() - start
+
+def extract_statements_parallel(
+    statements_dir: Path | str | None = None,
+    workers: int | None = None,
+    force: bool = False,
+    pdf_backend: str = PDF_BACKEND,
+) -> int:
+    """Extract all statements, parsing and transforming files across worker processes.
+
+    Workers hand COPY-ready CSV payloads back to this process, which is the single writer:
+    it COPYs each file in its own transaction over one connection as soon as the file is
+    ready, so the database sees one loader no matter how many workers run. PDFs are split
+    across the same workers page by page and loaded first. Files already in
+    the ingest manifest are skipped as in extract_statements. Prints progress and per-file
+    timings. Returns the number of new rows loaded.
+    """
+    total = 0
+    start = time.perf_counter()
+    # spawn, not fork: the parent already holds pooled connections and pool threads.
+    context = multiprocessing.get_context("spawn")
+    with (
+        span("etl", mode="parallel") as etl,
+        ProcessPoolExecutor(max_workers=workers, mp_context=context) as pool,
+        connection() as conn,
+    ):
+        pending = _pending_files(statement_files(statements_dir), conn, force)
+        digests = dict(pending)
+        pdfs = [(path, digest) for path, digest in pending if path.suffix.lower() == ".pdf"]
+        for done, (pdf_path, digest) in enumerate(pdfs, 1):
+            load_start = time.perf_counter()
+            records = read_pdf_statement(pdf_path, pdf_backend, executor=pool, content_hash=digest)
+            with span("load", file=pdf_path.name) as s, conn.transaction():
+                rows = copyTransactions(records, conn)
+                recordFile(digest, str(pdf_path), rows, conn)
+                s.set(rows=rows)
+            result_cache.expire_version()
+            total += rows
+            print(f"[{done}/{len(pending)}] {pdf_path.name}: {rows} new rows, {time.perf_counter() - load_start:.2f}s")
+        futures = [pool.submit(_transform_file, csv_path) for csv_path, _ in pending if csv_path.suffix.lower() != ".pdf"]
+        for done, future in enumerate(as_completed(futures), len(pdfs) + 1):
+            csv_path, payload, transform_s = future.result()
+            record_span("transform", transform_s, file=csv_path.name, worker=True)  # read + transform, timed in the worker
+            load_start = time.perf_counter()
+            with span("load", file=csv_path.name) as s, conn.transaction():
+                rows = copyCsv(payload, conn)
+                recordFile(digests[csv_path], str(csv_path), rows, conn)
+                s.set(rows=rows)
+            result_cache.expire_version()
+            total += rows
+            print(
+                f"[{done}/{len(pending)}] {csv_path.name}: {rows} new rows, "
+                f"transform {transform_s:.2f}s, load {time.perf_counter() - load_start:.2f}s"
+            )
+        etl.set(files=len(pending), rows=total)
+    _print_summary(total, len(pending), start)
+    return total
+
+def extract_statements_columnar(statements_dir: Path | str | None = None, pdf_backend: str = PDF_BACKEND) -> int:
+    """Rebuild the embedded columnar store (src/database/columnar.py) from all statements.
+
+    Every file is read and transformed as for PostgreSQL, and rows repeated across
+    overlapping exports are stored once. No database server is involved. Returns the
+    number of rows in the store.
+    """
+    from src.database.columnar import COLUMNAR_STORE_PATH, write_store
+
+    def frames() -> Iterator[pd.DataFrame]:
+        for path in statement_files(statements_dir):
+            if path.suffix.lower() == ".pdf":
+                frame = pd.DataFrame(read_pdf_statement(path, pdf_backend), columns=list(COLUMNS))
+            else:
+                with span("read", file=path.name) as s:
+                    df = pd.read_csv(path)
+                    s.set(rows=len(df))
+                with span("transform", file=path.name) as s:
+                    frame = transform_frame(df, path.name)
+                    s.set(rows=len(frame))
+            yield frame.assign(source=str(path))
+
+    start = time.perf_counter()
+    with span("etl", mode="columnar") as etl:
+        # Files are read and transformed as the store consumes them, inside this span.
+        with span("load", backend="duckdb") as s:
+            total = write_store(frames(), dedupe=True)
+            s.set(rows=total)
+        etl.set(rows=total)
+    print(f"Wrote {total} rows to {COLUMNAR_STORE_PATH} in {time.perf_counter() - start:.2f}s")
+    return total
 
 if __name__ == "__main__":
-    transactions = extract_statements()
+    parser = argparse.ArgumentParser(description="Extract, transform and load bank statements.")
+    parser.add_argument("statements_dir", nargs="?", default=None)
+    parser.add_argument("--chunksize", type=int, default=None, help=f"stream files in chunks of N rows (e.g. {CHUNK_SIZE})")
+    parser.add_argument("--workers", type=int, default=None, help="parse and transform files in N worker processes")
+    parser.add_argument("--force", action="store_true", help="re-read files already in the ingest manifest")
+    parser.add_argument("--pdf-backend", default=PDF_BACKEND, help=f"table extractor for PDF statements (default {PDF_BACKEND})")
+    parser.add_argument("--columnar", action="store_true", help="rebuild the embedded columnar store instead of loading PostgreSQL")
+    args = parser.parse_args()
+    if args.columnar:
+        extract_statements_columnar(args.statements_dir, pdf_backend=args.pdf_backend)
+    elif args.workers:
+        extract_statements_parallel(args.statements_dir, workers=args.workers, force=args.force, pdf_backend=args.pdf_backend)
+    else:
+        extract_statements(args.statements_dir, chunksize=args.chunksize, force=args.force, pdf_backend=args.pdf_backend)
@@ -1,16 +1,28 @@
 """PostgreSQL database setup for budget-finance."""
 
+import argparse
+import csv
 import os
+import re
+import sys
+import time
+from collections.abc import Iterable, Iterator
+from datetime import date as Date
+from pathlib import Path
 
+# Project root: from src/etl/load.py go up three levels
+_root = Path(__file__).resolve().parent.parent.parent
+if str(_root) not in sys.path:
+    sys.path.insert(0, str(_root))
+
+import pandas as pd
 import psycopg
 from psycopg.rows import dict_row
 
-# Connection parameters from environment variables
-db = os.environ.get("PGDATABASE", "budget_finance")
-user = os.environ.get("PGUSER", "postgres")
-password = os.environ.get("PGPASSWORD", "sa")
-host = os.environ.get("PGHOST", "localhost")
-port = os.environ.get("PGPORT", "5432")
+from src.database.connection import connect, connection, db
+from src.database.execute import FETCH_SIZE, streamBatches, streamRows
+from src.database.result_cache import result_cache
+from src.etl.categorize import categorize
 
 TABLE_NAME = "transactions"
 
@@ -19,37 +31,321 @@ CREATE TABLE IF NOT EXISTS {TABLE_NAME} (
     id SERIAL PRIMARY KEY,
     bank VARCHAR(100),
     account_type VARCHAR(100),
-    # account_number VARCHAR(100),
+    -- account_number VARCHAR(100),
     name VARCHAR(255),
     date DATE,
     category VARCHAR(255),
+    merchant VARCHAR(255),
     description TEXT,
     debit_amount DECIMAL(15, 2),
     credit_amount DECIMAL(15, 2),
+    fingerprint TEXT,
     created_at TIMESTAMPTZ DEFAULT NOW()
 );
 """
 
-INSERT_SQL = f"""
-INSERT INTO {TABLE_NAME}
-(bank, account_type, name, date, category, description, debit_amount, credit_amount)
-VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+MANIFEST_TABLE_NAME = "ingest_manifest"
+
+CREATE_MANIFEST_SQL = f"""
+CREATE TABLE IF NOT EXISTS {MANIFEST_TABLE_NAME} (
+    content_hash CHAR(64) PRIMARY KEY,
+    path TEXT,
+    rows_loaded INTEGER,
+    loaded_at TIMESTAMPTZ DEFAULT NOW()
+);
+"""
+
+DATA_VERSION_TABLE_NAME = "data_version"
+
+# Single-row counter bumped by every transaction that adds rows; query result caches are
+# keyed on it (see src/database/result_cache.py).
+CREATE_DATA_VERSION_SQL = f"""
+CREATE TABLE IF NOT EXISTS {DATA_VERSION_TABLE_NAME} (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    version BIGINT NOT NULL DEFAULT 0
+);
+INSERT INTO {DATA_VERSION_TABLE_NAME} (id) VALUES (TRUE) ON CONFLICT DO NOTHING;
+"""
+
+BUMP_DATA_VERSION_SQL = f"UPDATE {DATA_VERSION_TABLE_NAME} SET version = version + 1"
+
+# Deterministic row identity: the canonical fields plus the row's ordinal among identical
+# rows from the same source, so two identical purchases on one day are both kept while the
+# same statement row from overlapping exports is stored once. {order} sets the ordinal order.
+FINGERPRINT_SQL = (
+    "md5(format('%s|%s|%s|%s|%s|%s|%s', bank, account_type, to_char(date, 'YYYY-MM-DD'),"
+    " description, debit_amount, credit_amount,"
+    " row_number() OVER (PARTITION BY bank, account_type, date, description, debit_amount,"
+    " credit_amount ORDER BY {order})))"
+)
+
+# Adds the fingerprint to tables created before it existed, backfilling existing rows.
+MIGRATE_FINGERPRINT_SQL = f"""
+ALTER TABLE {TABLE_NAME} ADD COLUMN IF NOT EXISTS fingerprint TEXT;
+UPDATE {TABLE_NAME} t SET fingerprint = f.fingerprint
+FROM (SELECT id, {FINGERPRINT_SQL.format(order="id")} AS fingerprint FROM {TABLE_NAME}) f
+WHERE t.id = f.id AND t.fingerprint IS NULL;
+CREATE UNIQUE INDEX IF NOT EXISTS {TABLE_NAME}_fingerprint_key ON {TABLE_NAME} (fingerprint);
+"""
+
+# Pre-aggregated monthly totals for the common "how much at X in month Y" / "by category
+# per month" questions. Kept current by the same statement that inserts new rows.
+MERCHANT_TOTALS_TABLE_NAME = "monthly_merchant_totals"
+CATEGORY_TOTALS_TABLE_NAME = "monthly_category_totals"
+
+# Merchant key for the totals: the normalized merchant (see src/etl/categorize.py),
+# falling back to the raw description for rows loaded without one.
+MERCHANT_SQL = "COALESCE(merchant, description)"
+
+CREATE_TOTALS_SQL = "".join(
+    f"""
+CREATE TABLE IF NOT EXISTS {table} (
+    month DATE NOT NULL,
+    bank VARCHAR(100) NOT NULL DEFAULT '',
+    account_type VARCHAR(100) NOT NULL DEFAULT '',
+    {key} TEXT NOT NULL DEFAULT '',
+    debit_total DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    credit_total DECIMAL(15, 2) NOT NULL DEFAULT 0,
+    txn_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (month, bank, account_type, {key})
+);
+"""
+    for table, key in ((MERCHANT_TOTALS_TABLE_NAME, "merchant"), (CATEGORY_TOTALS_TABLE_NAME, "category"))
+)
+
+
+def _totalsUpsertSql(table: str, key: str, expr: str, source: str) -> str:
+    """SQL adding the rows of source (a table or CTE of transactions) into a totals table."""
+    return f"""
+INSERT INTO {table} AS agg (month, bank, account_type, {key}, debit_total, credit_total, txn_count)
+SELECT date_trunc('month', date)::date, COALESCE(bank, ''), COALESCE(account_type, ''), COALESCE({expr}, ''),
+       COALESCE(SUM(debit_amount), 0), COALESCE(SUM(credit_amount), 0), COUNT(*)
+FROM {source}
+WHERE date IS NOT NULL
+GROUP BY 1, 2, 3, 4
+ON CONFLICT (month, bank, account_type, {key}) DO UPDATE
+SET debit_total = agg.debit_total + EXCLUDED.debit_total,
+    credit_total = agg.credit_total + EXCLUDED.credit_total,
+    txn_count = agg.txn_count + EXCLUDED.txn_count"""
+
+
+def _withTotalsSql(insert_sql: str) -> str:
+    """Wrap an INSERT ... RETURNING into transactions so the monthly totals move with it.
+
+    The statement returns the number of rows inserted.
+    """
+    return f"""
+WITH inserted AS ({insert_sql}),
+merchant_totals AS ({_totalsUpsertSql(MERCHANT_TOTALS_TABLE_NAME, "merchant", MERCHANT_SQL, "inserted")}),
+category_totals AS ({_totalsUpsertSql(CATEGORY_TOTALS_TABLE_NAME, "category", "category", "inserted")})
+SELECT COUNT(*) FROM inserted
+"""
+
+
+MIGRATIONS_TABLE_NAME = "schema_migrations"
+
+CREATE_MIGRATIONS_SQL = f"""
+CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE_NAME} (
+    name TEXT PRIMARY KEY,
+    applied_at TIMESTAMPTZ DEFAULT NOW()
+);
+"""
+
+# Ordered schema migrations: (name, sql, transactional), where sql may also be a function
+# of the connection for data migrations. Each is applied once and recorded in
+# schema_migrations. Index builds run outside a transaction with CONCURRENTLY so they
+# do not block loads on an existing table. The indexes match what postgres_system_prompt
+# asks the model to generate: description ILIKE '%...%' (trigram GIN), date ranges,
+# bank/account_type filters and amount comparisons. Once transactions is partitioned
+# (0015), new indexes are created on it without CONCURRENTLY, which partitioned tables do
+# not support; the index is built on every partition.
+MIGRATIONS = [
+    ("0001_fingerprint", MIGRATE_FINGERPRINT_SQL, True),
+    ("0002_ingest_manifest", CREATE_MANIFEST_SQL, True),
+    ("0003_data_version", CREATE_DATA_VERSION_SQL, True),
+    ("0004_pg_trgm", "CREATE EXTENSION IF NOT EXISTS pg_trgm", True),
+    (
+        "0005_description_trgm_idx",
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {TABLE_NAME}_description_trgm_idx"
+        f" ON {TABLE_NAME} USING gin (description gin_trgm_ops)",
+        False,
+    ),
+    (
+        "0006_date_idx",
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {TABLE_NAME}_date_idx ON {TABLE_NAME} (date)",
+        False,
+    ),
+    (
+        "0007_bank_account_type_idx",
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {TABLE_NAME}_bank_account_type_idx"
+        f" ON {TABLE_NAME} (bank, account_type)",
+        False,
+    ),
+    (
+        "0008_debit_amount_idx",
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {TABLE_NAME}_debit_amount_idx ON {TABLE_NAME} (debit_amount)",
+        False,
+    ),
+    (
+        "0009_credit_amount_idx",
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {TABLE_NAME}_credit_amount_idx ON {TABLE_NAME} (credit_amount)",
+        False,
+    ),
+    (
+        "0010_monthly_totals",
+        CREATE_TOTALS_SQL
+        + _totalsUpsertSql(MERCHANT_TOTALS_TABLE_NAME, "merchant", "description", TABLE_NAME)
+        + ";"
+        + _totalsUpsertSql(CATEGORY_TOTALS_TABLE_NAME, "category", "category", TABLE_NAME),
+        True,
+    ),
+    ("0011_merchant", f"ALTER TABLE {TABLE_NAME} ADD COLUMN IF NOT EXISTS merchant VARCHAR(255)", True),
+    ("0012_categorize", lambda conn: categorizeTransactions(conn), True),
+    (
+        "0013_merchant_idx",
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {TABLE_NAME}_merchant_idx ON {TABLE_NAME} (merchant)",
+        False,
+    ),
+    (
+        "0014_category_idx",
+        f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {TABLE_NAME}_category_idx ON {TABLE_NAME} (category)",
+        False,
+    ),
+    ("0015_partition_by_month", lambda conn: partitionTransactions(conn), True),
+]
+
+# Monthly range partitions of transactions on date: one table per month, named
+# transactions_yYYYYmMM, plus a default partition for rows without a date. Queries bounded
+# by date scan only the months they cover, and each month is vacuumed and indexed on its
+# own. The load that first brings rows for a month creates its partition (ensurePartitions).
+# Old years can be detached into the archive schema or compressed to Parquet
+# (archivePartitions).
+DEFAULT_PARTITION_NAME = f"{TABLE_NAME}_default"
+ARCHIVE_SCHEMA = "archive"
+ARCHIVE_DIR = Path(os.environ.get("ARCHIVE_DIR", _root / "archive"))
+
+_PARTITION_MONTH = re.compile(rf"^{TABLE_NAME}_y(\d{{4}})m(\d{{2}})$")
+
+# Unique keys of a partitioned table must include the partition key. The fingerprint
+# already covers the date, so for dated rows (fingerprint, date) is as strict as the
+# fingerprint alone. NULL dates never conflict in it, so MERGE_STAGING_SQL checks rows
+# without a date separately. (NULLS NOT DISTINCT would also make the NULL fingerprints
+# of rows stored before the fingerprint existed collide.)
+PARTITIONED_KEYS_SQL = f"""
+CREATE UNIQUE INDEX {TABLE_NAME}_id_key ON {TABLE_NAME} (id, date);
+CREATE UNIQUE INDEX {TABLE_NAME}_fingerprint_key ON {TABLE_NAME} (fingerprint, date);
+"""
+
+# Definitions of the table's non-unique indexes, to rebuild them on the partitioned table.
+INDEX_DEFINITIONS_SQL = """
+SELECT pg_get_indexdef(x.indexrelid)
+FROM pg_index x
+WHERE x.indrelid = %s::regclass AND NOT x.indisunique
+ORDER BY x.indexrelid
+"""
+
+PARTITIONS_SQL = """
+SELECT c.relname AS name,
+       pg_get_expr(c.relpartbound, c.oid) AS bounds,
+       c.reltuples::bigint AS rows_estimate,
+       pg_size_pretty(pg_total_relation_size(c.oid)) AS size
+FROM pg_inherits i
+JOIN pg_class c ON c.oid = i.inhrelid
+WHERE i.inhparent = %s::regclass
+ORDER BY c.relname
+"""
+
+# Description → (merchant, category) computed in Python by categorizeTransactions. A rule's
+# category replaces the stored one; descriptions no rule matches keep their category.
+MERCHANT_MAP_TABLE_NAME = "merchant_map"
+
+CREATE_MERCHANT_MAP_SQL = f"""
+DROP TABLE IF EXISTS {MERCHANT_MAP_TABLE_NAME};
+CREATE TEMP TABLE {MERCHANT_MAP_TABLE_NAME} (
+    description TEXT PRIMARY KEY,
+    merchant VARCHAR(255),
+    category VARCHAR(255)
+) ON COMMIT DROP
+"""
+
+APPLY_MERCHANT_MAP_SQL = f"""
+UPDATE {TABLE_NAME} t
+SET merchant = m.merchant, category = COALESCE(m.category, t.category)
+FROM {MERCHANT_MAP_TABLE_NAME} m
+WHERE t.description = m.description
+  AND (t.merchant IS DISTINCT FROM m.merchant OR t.category IS DISTINCT FROM COALESCE(m.category, t.category))
+"""
+
+# Per index of the table; on a partitioned table, the partitions' indexes are summed
+# under the index they were created from.
+INDEX_USAGE_SQL = """
+SELECT %s AS table_name,
+       COALESCE(parent.relname, s.indexrelname) AS index_name,
+       SUM(s.idx_scan) AS scans,
+       SUM(s.idx_tup_read) AS tuples_read,
+       SUM(s.idx_tup_fetch) AS tuples_fetched,
+       pg_size_pretty(SUM(pg_relation_size(s.indexrelid))::bigint) AS size,
+       (SELECT SUM(seq_scan) FROM pg_stat_user_tables
+        WHERE relid IN (SELECT relid FROM pg_partition_tree(%s::regclass))) AS table_seq_scans
+FROM pg_stat_user_indexes s
+LEFT JOIN pg_inherits i ON i.inhrelid = s.indexrelid
+LEFT JOIN pg_class parent ON parent.oid = i.inhparent
+WHERE s.relid IN (SELECT relid FROM pg_partition_tree(%s::regclass))
+GROUP BY 2
+ORDER BY scans DESC, index_name
+"""
+
+COLUMNS = (
+    "bank",
+    "account_type",
+    # "account_number",
+    "name",
+    "date",
+    "category",
+    "merchant",
+    "description",
+    "debit_amount",
+    "credit_amount",
+)
+
+# Bulk loads COPY into a per-connection staging table first, then merge into transactions
+# so rows already present (by fingerprint) are skipped instead of failing the COPY.
+STAGING_TABLE_NAME = "transactions_staging"
+
+CREATE_STAGING_SQL = f"""
+CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE_NAME} AS
+SELECT {', '.join(COLUMNS)} FROM {TABLE_NAME} WITH NO DATA;
+ALTER TABLE {STAGING_TABLE_NAME} ADD COLUMN IF NOT EXISTS line BIGINT GENERATED ALWAYS AS IDENTITY;
 """
 
+MERGE_STAGING_SQL = _withTotalsSql(f"""
+INSERT INTO {TABLE_NAME} ({', '.join(COLUMNS)}, fingerprint)
+SELECT {', '.join(COLUMNS)}, fingerprint
+FROM (SELECT {', '.join(COLUMNS)}, {FINGERPRINT_SQL.format(order="line")} AS fingerprint FROM {STAGING_TABLE_NAME}) s
+WHERE s.date IS NOT NULL
+   OR NOT EXISTS (SELECT 1 FROM {TABLE_NAME} t WHERE t.date IS NULL AND t.fingerprint = s.fingerprint)
+ON CONFLICT (fingerprint, date) DO NOTHING
+RETURNING {', '.join(COLUMNS)}
+""")
 
+STAGING_MONTHS_SQL = f"SELECT DISTINCT date_trunc('month', date)::date FROM {STAGING_TABLE_NAME} WHERE date IS NOT NULL"
 
-def connect(database: str | None = None) -> psycopg.Connection:
-    """Connect to the database."""
-    auth = f"{user}:{password}" if password else user
-    dsn = f"postgresql://{auth}@{host}:{port}/{database or db}"
-    return psycopg.connect(dsn)
+COPY_SQL = f"COPY {STAGING_TABLE_NAME} ({', '.join(COLUMNS)}) FROM STDIN"
 
+# CSV variant for pre-serialized payloads: an empty unquoted field is NULL.
+COPY_CSV_SQL = f"COPY {STAGING_TABLE_NAME} ({', '.join(COLUMNS)}) FROM STDIN (FORMAT csv)"
+
+UPSERT_MANIFEST_SQL = f"""
+INSERT INTO {MANIFEST_TABLE_NAME} (content_hash, path, rows_loaded)
+VALUES (%s, %s, %s)
+ON CONFLICT (content_hash) DO UPDATE
+SET path = EXCLUDED.path, rows_loaded = EXCLUDED.rows_loaded, loaded_at = NOW()
+"""
 
 def createDb(database: str | None = None) -> None:
     """Check if database exists; create it if not."""
     target = database or db
-    conn = connect("postgres")  # must use existing db to create another
-    conn.autocommit = True
+    conn = connect("postgres", autocommit=True)  # must use existing db to create another
     cur = conn.cursor()
     cur.execute("SELECT 1 FROM pg_database WHERE datname = %s", (target,))
     if cur.fetchone() is None:
@@ -59,18 +355,271 @@ def createDb(database: str | None = None) -> None:
 
 
 def createTable(conn: psycopg.Connection | None = None) -> None:
-    """Check if table exists; create it if not."""
-    if conn is None:
-        conn = connect()
-        own_conn = True
-    else:
-        own_conn = False
-    conn.autocommit = True
-    cur = conn.cursor()
-    cur.execute(CREATE_TABLE_SQL)
-    cur.close()
-    if own_conn:
-        conn.close()
+    """Check if table exists; create it if not, then apply pending migrations."""
+    with connection(conn) as conn:
+        with conn.transaction():
+            cur = conn.cursor()
+            cur.execute(CREATE_TABLE_SQL)
+            cur.close()
+        migrate(conn)
+
+
+def migrate(conn: psycopg.Connection | None = None) -> list[str]:
+    """Apply pending schema migrations in order. Returns the names of those applied."""
+    with connection(conn) as conn:
+        with conn.transaction():
+            conn.execute(CREATE_MIGRATIONS_SQL)
+            applied = {row[0] for row in conn.execute(f"SELECT name FROM {MIGRATIONS_TABLE_NAME}")}
+        done = []
+        for name, sql, transactional in MIGRATIONS:
+            if name in applied:
+                continue
+            if callable(sql):
+                with conn.transaction():
+                    sql(conn)
+                    conn.execute(f"INSERT INTO {MIGRATIONS_TABLE_NAME} (name) VALUES (%s)", (name,))
+            elif transactional:
+                with conn.transaction():
+                    conn.execute(sql)
+                    conn.execute(f"INSERT INTO {MIGRATIONS_TABLE_NAME} (name) VALUES (%s)", (name,))
+            else:
+                previous = conn.autocommit
+                conn.autocommit = True
+                try:
+                    conn.execute(sql)
+                    conn.execute(f"INSERT INTO {MIGRATIONS_TABLE_NAME} (name) VALUES (%s)", (name,))
+                finally:
+                    conn.autocommit = previous
+            print(f"Applied migration {name}")
+            done.append(name)
+        if done:
+            with conn.transaction():
+                conn.execute(f"ANALYZE {TABLE_NAME}")
+    return done
+
+
+def categorizeTransactions(conn: psycopg.Connection | None = None) -> int:
+    """Re-apply the merchant rules to every stored transaction and rebuild the totals.
+
+    Run after editing the rule file. Each distinct description is categorized once and
+    the results are COPYed into a temp table joined back in one UPDATE. Returns the number
+    of rows changed. Totals are rebuilt from the oldest attached month on; those of years
+    taken out by archivePartitions are kept as they were.
+    """
+    with connection(conn) as conn, conn.transaction():
+        since = _oldestPartitionMonth(conn)
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT DISTINCT description FROM {TABLE_NAME} WHERE description IS NOT NULL")
+            descriptions = [row[0] for row in cur.fetchall()]
+            cur.execute(CREATE_MERCHANT_MAP_SQL)
+            with cur.copy(f"COPY {MERCHANT_MAP_TABLE_NAME} (description, merchant, category) FROM STDIN") as copy:
+                for description in descriptions:
+                    copy.write_row((description, *categorize(description)))
+            cur.execute(APPLY_MERCHANT_MAP_SQL)
+            updated = cur.rowcount
+            if since is None:
+                cur.execute(f"TRUNCATE {MERCHANT_TOTALS_TABLE_NAME}, {CATEGORY_TOTALS_TABLE_NAME}")
+                source = TABLE_NAME
+            else:
+                for table in (MERCHANT_TOTALS_TABLE_NAME, CATEGORY_TOTALS_TABLE_NAME):
+                    cur.execute(f"DELETE FROM {table} WHERE month >= %s", (since,))
+                source = f"(SELECT * FROM {TABLE_NAME} WHERE date >= '{since.isoformat()}') live"
+            cur.execute(_totalsUpsertSql(MERCHANT_TOTALS_TABLE_NAME, "merchant", MERCHANT_SQL, source))
+            cur.execute(_totalsUpsertSql(CATEGORY_TOTALS_TABLE_NAME, "category", "category", source))
+            cur.execute(BUMP_DATA_VERSION_SQL)
+    result_cache.expire_version()
+    return updated
+
+
+def _partitionName(month: Date) -> str:
+    return f"{TABLE_NAME}_y{month.year}m{month.month:02d}"
+
+
+def _partitionBounds(month: Date) -> str:
+    end = Date(month.year + month.month // 12, month.month % 12 + 1, 1)
+    return f"FOR VALUES FROM ('{month.isoformat()}') TO ('{end.isoformat()}')"
+
+
+def _createPartitionSql(month: Date, parent: str = TABLE_NAME) -> str:
+    """SQL creating the partition of parent for the month starting on month."""
+    return f"CREATE TABLE IF NOT EXISTS {_partitionName(month)} PARTITION OF {parent} {_partitionBounds(month)}"
+
+
+def _partitionMonth(name: str) -> Date | None:
+    """First day of the month a partition holds, from its name (None for the default)."""
+    match = _PARTITION_MONTH.match(name)
+    return Date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+def isPartitioned(conn: psycopg.Connection | None = None) -> bool:
+    """Whether the transactions table is partitioned (migration 0015 applied)."""
+    with connection(conn) as conn:
+        row = conn.execute("SELECT relkind FROM pg_class WHERE oid = to_regclass(%s)", (TABLE_NAME,)).fetchone()
+    return row is not None and row[0] == "p"
+
+
+def _oldestPartitionMonth(conn: psycopg.Connection) -> Date | None:
+    """First month with an attached partition, or None if transactions is not partitioned."""
+    if not isPartitioned(conn):
+        return None
+    months = [_partitionMonth(row["name"]) for row in partitionInfo(conn)]
+    return min((m for m in months if m is not None), default=Date.max)
+
+
+def partitionTransactions(conn: psycopg.Connection) -> int:
+    """Convert a plain transactions table into monthly range partitions (migration 0015).
+
+    The rows are copied into a new partitioned table with one partition per month present,
+    which then takes over the old table's name, id sequence and indexes; unique keys gain
+    the partition key. Runs in the caller's transaction, holding an exclusive lock on the
+    table throughout. Returns the number of rows moved.
+    """
+    if isPartitioned(conn):
+        return 0
+    new_table = f"{TABLE_NAME}_partitioned"
+    with conn.cursor() as cur:
+        cur.execute(f"LOCK TABLE {TABLE_NAME} IN ACCESS EXCLUSIVE MODE")
+        cur.execute(INDEX_DEFINITIONS_SQL, (TABLE_NAME,))
+        index_definitions = [row[0] for row in cur.fetchall()]
+        cur.execute("SELECT pg_get_serial_sequence(%s, 'id')", (TABLE_NAME,))
+        sequence = cur.fetchone()[0]
+        if sequence:
+            cur.execute(f"ALTER SEQUENCE {sequence} OWNED BY NONE")  # keep it when the old table goes
+        cur.execute(f"CREATE TABLE {new_table} (LIKE {TABLE_NAME} INCLUDING DEFAULTS) PARTITION BY RANGE (date)")
+        cur.execute(f"CREATE TABLE {DEFAULT_PARTITION_NAME} PARTITION OF {new_table} DEFAULT")
+        cur.execute(f"SELECT DISTINCT date_trunc('month', date)::date FROM {TABLE_NAME} WHERE date IS NOT NULL")
+        for (month,) in cur.fetchall():
+            cur.execute(_createPartitionSql(month, new_table))
+        cur.execute(f"INSERT INTO {new_table} SELECT * FROM {TABLE_NAME}")
+        moved = cur.rowcount
+        cur.execute(f"DROP TABLE {TABLE_NAME}")
+        cur.execute(f"ALTER TABLE {new_table} RENAME TO {TABLE_NAME}")
+        if sequence:
+            cur.execute(f"ALTER SEQUENCE {sequence} OWNED BY {TABLE_NAME}.id")
+        # Indexes are built after the copy, once per partition.
+        cur.execute(PARTITIONED_KEYS_SQL)
+        for definition in index_definitions:
+            cur.execute(definition)
+    return moved
+
+
+def ensurePartitions(months: Iterable[Date], conn: psycopg.Connection) -> list[str]:
+    """Create the monthly partitions missing for the given dates. Does not commit.
+
+    Called before rows are written, so a new month gets its own partition rather than the
+    default one. Raises ValueError for months detached into the archive schema: their rows
+    would be loaded again and the month could no longer be restored. Months compressed by
+    archivePartitions get a new, empty partition. Does nothing while the table is not
+    partitioned. Returns the partitions created.
+    """
+    wanted = {Date(m.year, m.month, 1) for m in months if m is not None}
+    if not wanted or not isPartitioned(conn):
+        return []
+    with conn.cursor() as cur:
+        cur.execute("SELECT tablename FROM pg_tables WHERE schemaname = %s", (ARCHIVE_SCHEMA,))
+        archived = sorted(wanted & {_partitionMonth(row[0]) for row in cur.fetchall()})
+        if archived:
+            raise ValueError(
+                f"Rows for archived months {', '.join(m.strftime('%Y-%m') for m in archived)};"
+                " restore them first (restorePartitions)"
+            )
+        cur.execute(PARTITIONS_SQL, (TABLE_NAME,))
+        existing = {_partitionMonth(row[0]) for row in cur.fetchall()}
+        created = []
+        for month in sorted(wanted - existing):
+            cur.execute(_createPartitionSql(month))
+            created.append(_partitionName(month))
+    return created
+
+
+def partitionInfo(conn: psycopg.Connection | None = None) -> list[dict]:
+    """List the partitions of transactions with their bounds, estimated rows and size."""
+    with connection(conn) as conn:
+        cur = conn.cursor(row_factory=dict_row)
+        cur.execute(PARTITIONS_SQL, (TABLE_NAME,))
+        rows = cur.fetchall()
+        cur.close()
+    return rows
+
+
+def archivePartitions(
+    before: int,
+    compress: bool = False,
+    archive_dir: Path | str = ARCHIVE_DIR,
+    conn: psycopg.Connection | None = None,
+) -> list[str]:
+    """Take the monthly partitions of years before `before` out of transactions.
+
+    Detached partitions move to the archive schema, where they can still be queried
+    (archive.transactions_y2019m01) or put back with restorePartitions. With compress,
+    each year is written to a zstd-compressed Parquet file in archive_dir (appending to
+    an earlier archive of the year) and its partitions are dropped. Each year is archived
+    in its own transaction. The monthly totals are kept, so totals still cover archived
+    years. Returns the partitions archived.
+    """
+    archived = []
+    with connection(conn) as conn:
+        years: dict[int, list[str]] = {}
+        with conn.transaction():  # left open, it would make each year's transaction a savepoint
+            partitions = partitionInfo(conn)
+        for row in partitions:
+            month = _partitionMonth(row["name"])
+            if month is not None and month.year < before:
+                years.setdefault(month.year, []).append(row["name"])
+        for year, names in sorted(years.items()):
+            with conn.transaction(), conn.cursor() as cur:
+                for name in names:
+                    cur.execute(f"ALTER TABLE {TABLE_NAME} DETACH PARTITION {name}")
+                if compress:
+                    cur.execute(" UNION ALL ".join(f"SELECT * FROM {name}" for name in names) + " ORDER BY id")
+                    frame = pd.DataFrame(cur.fetchall(), columns=[c.name for c in cur.description])
+                    path = Path(archive_dir) / f"{TABLE_NAME}-{year}.parquet"
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    if path.exists():
+                        # Rows written by an archive that failed to commit are replaced, not doubled.
+                        frame = pd.concat([pd.read_parquet(path), frame], ignore_index=True).drop_duplicates("id", keep="last")
+                    tmp = path.with_name(path.name + ".tmp")
+                    frame.to_parquet(tmp, compression="zstd", index=False)
+                    os.replace(tmp, path)
+                    for name in names:
+                        cur.execute(f"DROP TABLE {name}")
+                    print(f"Compressed {len(frame)} rows of {year} to {path}")
+                else:
+                    cur.execute(f"CREATE SCHEMA IF NOT EXISTS {ARCHIVE_SCHEMA}")
+                    for name in names:
+                        cur.execute(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}")
+                    print(f"Detached {len(names)} partitions of {year} to schema {ARCHIVE_SCHEMA}")
+                cur.execute(BUMP_DATA_VERSION_SQL)
+            result_cache.expire_version()
+            archived += names
+    return archived
+
+
+def restorePartitions(year: int, conn: psycopg.Connection | None = None) -> list[str]:
+    """Attach a year's partitions detached by archivePartitions back to transactions."""
+    with connection(conn) as conn, conn.transaction(), conn.cursor() as cur:
+        cur.execute(
+            "SELECT tablename FROM pg_tables WHERE schemaname = %s AND tablename LIKE %s ORDER BY tablename",
+            (ARCHIVE_SCHEMA, f"{TABLE_NAME}_y{year}m%"),
+        )
+        names = [row[0] for row in cur.fetchall()]
+        for name in names:
+            cur.execute(f"ALTER TABLE {ARCHIVE_SCHEMA}.{name} SET SCHEMA public")
+            cur.execute(f"ALTER TABLE {TABLE_NAME} ATTACH PARTITION {name} {_partitionBounds(_partitionMonth(name))}")
+        if names:
+            cur.execute(BUMP_DATA_VERSION_SQL)
+    result_cache.expire_version()
+    return names
+
+
+def indexUsage(conn: psycopg.Connection | None = None) -> list[dict]:
+    """Report scans, tuples read and size for each index on the transactions table."""
+    with connection(conn) as conn:
+        cur = conn.cursor(row_factory=dict_row)
+        cur.execute(INDEX_USAGE_SQL, (TABLE_NAME, TABLE_NAME, TABLE_NAME))
+        rows = cur.fetchall()
+        cur.close()
+    return rows
 
 
 def insertTransaction(
@@ -83,54 +632,201 @@ def insertTransaction(
     description: str | None = None,
     debit_amount: float | None = None,
     credit_amount: float | None = None,
+    merchant: str | None = None,
     conn: psycopg.Connection | None = None,
 ) -> None:
-    """Insert a single record into the transactions table."""
-    if conn is None:
-        conn = connect()
-        own_conn = True
-    else:
-        own_conn = False
-    cur = conn.cursor()
-    cur.execute(
-        INSERT_SQL,
-        (
-            bank,
-            account_type,
-            # account_number,
-            name,
-            date,
-            category,
-            description,
-            debit_amount,
-            credit_amount,
-        ),
-    )
-    conn.commit()
-    cur.close()
-    if own_conn:
-        conn.close()
+    """Insert a single record into the transactions table, updating the monthly totals.
+
+    Without a merchant, merchant and category come from the merchant rules. The record
+    goes through the same staging merge as a bulk load, so it gets a fingerprint and is
+    skipped if that fingerprint is already stored.
+    """
+    if merchant is None:
+        merchant, category = categorize(description, category)
+    record = {
+        "bank": bank,
+        "account_type": account_type,
+        # "account_number": account_number,
+        "name": name,
+        "date": date,
+        "category": category,
+        "merchant": merchant,
+        "description": description,
+        "debit_amount": debit_amount,
+        "credit_amount": credit_amount,
+    }
+    with connection(conn) as conn:
+        copyTransactions([record], conn)
+        conn.commit()
+    result_cache.expire_version()
+
+
+def copyTransactions(records: Iterable[dict], conn: psycopg.Connection) -> int:
+    """Stream records into the transactions table with COPY FROM STDIN.
+
+    Rows whose fingerprint is already stored are skipped. Does not commit; the caller owns
+    the transaction. Returns the number of new rows inserted.
+    """
+    with conn.cursor() as cur:
+        cur.execute(CREATE_STAGING_SQL)
+        with cur.copy(COPY_SQL) as copy:
+            for record in records:
+                copy.write_row(tuple(record.get(col) for col in COLUMNS))
+    return _mergeStaging(conn)
+
+
+def frameToCsv(frame: pd.DataFrame) -> bytes:
+    """Serialize a canonical transactions DataFrame as a COPY CSV payload."""
+    return frame.to_csv(columns=list(COLUMNS), header=False, index=False).encode()
+
+
+def copyCsv(payload: bytes, conn: psycopg.Connection) -> int:
+    """COPY a payload from frameToCsv into the transactions table.
+
+    Rows whose fingerprint is already stored are skipped. Does not commit; the caller owns
+    the transaction. Returns the number of new rows inserted.
+    """
+    with conn.cursor() as cur:
+        cur.execute(CREATE_STAGING_SQL)
+        with cur.copy(COPY_CSV_SQL) as copy:
+            copy.write(payload)
+    return _mergeStaging(conn)
+
+
+def _mergeStaging(conn: psycopg.Connection) -> int:
+    """Move staged rows into transactions, skipping known fingerprints. Returns rows inserted.
+
+    Partitions for new months are created first. The monthly totals are updated by the
+    same statement. Bumps the data version when rows were added, so cached query results
+    are invalidated when this transaction commits; the caller then calls
+    result_cache.expire_version() so this process sees the new version straight away.
+    """
+    with conn.cursor() as cur:
+        cur.execute(STAGING_MONTHS_SQL)
+        ensurePartitions([row[0] for row in cur.fetchall()], conn)
+        cur.execute(MERGE_STAGING_SQL)
+        inserted = cur.fetchone()[0]
+        cur.execute(f"TRUNCATE {STAGING_TABLE_NAME} RESTART IDENTITY")
+        if inserted:
+            cur.execute(BUMP_DATA_VERSION_SQL)
+    return inserted
+
+
+def loadedFileHashes(conn: psycopg.Connection | None = None) -> set[str]:
+    """Return the content hashes of all source files recorded in the ingest manifest."""
+    with connection(conn) as conn:
+        cur = conn.cursor()
+        cur.execute(f"SELECT content_hash FROM {MANIFEST_TABLE_NAME}")
+        hashes = {row[0] for row in cur.fetchall()}
+        cur.close()
+    return hashes
+
+
+def recordFile(content_hash: str, path: str, rows_loaded: int, conn: psycopg.Connection) -> None:
+    """Record a loaded source file in the ingest manifest. Does not commit."""
+    with conn.cursor() as cur:
+        cur.execute(UPSERT_MANIFEST_SQL, (content_hash, path, rows_loaded))
+
+
+def loadBatch(records: Iterable[dict], conn: psycopg.Connection | None = None) -> int:
+    """Bulk-load one transformed batch (e.g. one statement file) in a single transaction."""
+    return loadBatches([records], conn=conn)
+
+
+def loadBatches(batches: Iterable[Iterable[dict]], conn: psycopg.Connection | None = None) -> int:
+    """Bulk-load a stream of transformed batches over one connection.
+
+    Each batch is written with COPY and committed as its own transaction, so a bad file
+    rolls back on its own without losing the batches already loaded. Prints rows/sec.
+    Returns the number of new rows inserted.
+    """
+    total = 0
+    start = time.perf_counter()
+    with connection(conn) as conn:
+        for records in batches:
+            with conn.transaction():
+                total += copyTransactions(records, conn)
+            result_cache.expire_version()
+    elapsed = time.perf_counter() - start
+    rate = total / elapsed if elapsed > 0 else float("inf")
+    print(f"Loaded {total} rows in {elapsed:.2f}s ({rate:,.0f} rows/sec)")
+    return total
 
 
 def getAllTransactions(conn: psycopg.Connection | None = None) -> list[dict]:
     """Fetch all records from the transactions table."""
-    if conn is None:
-        conn = connect()
-        own_conn = True
-    else:
-        own_conn = False
-    cur = conn.cursor(row_factory=dict_row)
-    cur.execute(f"SELECT * FROM {TABLE_NAME}")
-    rows = cur.fetchall()
-    cur.close()
-    if own_conn:
-        conn.close()
+    with connection(conn) as conn:
+        cur = conn.cursor(row_factory=dict_row)
+        cur.execute(f"SELECT * FROM {TABLE_NAME}")
+        rows = cur.fetchall()
+        cur.close()
     return rows
 
 
+def iterTransactions(conn: psycopg.Connection | None = None, fetch_size: int = FETCH_SIZE) -> Iterator[dict]:
+    """Yield every record from the transactions table via a server-side cursor, in constant memory."""
+    return streamRows(f"SELECT * FROM {TABLE_NAME} ORDER BY id", conn, fetch_size)
+
+
+def exportTransactions(path: Path | str, conn: psycopg.Connection | None = None, fetch_size: int = FETCH_SIZE) -> int:
+    """Write the full transaction history to a CSV file, batch by batch. Returns rows written."""
+    written = 0
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        for columns, batch in streamBatches(f"SELECT * FROM {TABLE_NAME} ORDER BY id", conn, fetch_size):
+            if written == 0:
+                writer.writerow(c.name for c in columns)
+            writer.writerows(batch)
+            written += len(batch)
+    return written
+
+
 if __name__ == "__main__":
-    createDb()
-    createTable()
-    print(f"Database and table '{TABLE_NAME}' are ready.")
-    transactions = getAllTransactions()
-    print(transactions)
+    parser = argparse.ArgumentParser(description="Manage the budget-finance database.")
+    parser.add_argument(
+        "command",
+        nargs="?",
+        choices=["setup", "migrate", "index-usage", "export", "categorize", "partitions", "archive", "restore"],
+        default="setup",
+    )
+    parser.add_argument("--output", default="transactions.csv", help="CSV file written by export")
+    parser.add_argument("--before", type=int, help="archive: take out the years before this one")
+    parser.add_argument("--compress", action="store_true", help="archive: write Parquet files and drop the partitions")
+    parser.add_argument("--archive-dir", default=ARCHIVE_DIR, help="archive: where compressed years are written")
+    parser.add_argument("--year", type=int, help="restore: the detached year to attach back")
+    args = parser.parse_args()
+    if args.command == "partitions":
+        for row in partitionInfo():
+            print(f"{row['name']:<28} {row['bounds']:<60} rows~{row['rows_estimate']:<10} size={row['size']}")
+    elif args.command == "archive":
+        if args.before is None:
+            parser.error("archive needs --before YEAR")
+        archived = archivePartitions(args.before, args.compress, args.archive_dir)
+        print(f"Archived {len(archived)} partitions.")
+    elif args.command == "restore":
+        if args.year is None:
+            parser.error("restore needs --year YEAR")
+        print(f"Restored {len(restorePartitions(args.year))} partitions.")
+    elif args.command == "migrate":
+        applied = migrate()
+        print(f"Applied {len(applied)} migrations." if applied else "Schema is up to date.")
+    elif args.command == "categorize":
+        start = time.perf_counter()
+        rows = categorizeTransactions()
+        print(f"Re-categorized {rows} rows in {time.perf_counter() - start:.2f}s")
+    elif args.command == "export":
+        start = time.perf_counter()
+        rows = exportTransactions(args.output)
+        print(f"Exported {rows} rows to {args.output} in {time.perf_counter() - start:.2f}s")
+    elif args.command == "index-usage":
+        for row in indexUsage():
+            print(
+                f"{row['index_name']:<45} scans={row['scans']:<10} tuples_read={row['tuples_read']:<12} "
+                f"size={row['size']:<10} (table seq scans={row['table_seq_scans']})"
+            )
+    else:
+        createDb()
+        createTable()
+        print(f"Database and table '{TABLE_NAME}' are ready.")
+        transactions = getAllTransactions()
+        print(transactions)
@@ -0,0 +1,404 @@
+"""
+Transaction tables from PDF statements.
+
+Pages are parsed in worker processes, a range of pages per task, with one of the table
+extraction backends (pdfplumber, pymupdf, tabula, docling). Each parsed page is cached
+by the PDF's content hash, backend and page number, so re-reading a statement that has
+been parsed before does not touch the PDF at all. Tables are then turned into raw records
+keyed like the bank's CSV export, so they go through the same transform_records as CSVs.
+"""
+
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import sqlite3
+import sys
+import threading
+from collections.abc import Callable
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import date as Date
+from pathlib import Path
+
+_root = Path(__file__).resolve().parent.parent.parent
+if str(_root) not in sys.path:
+    sys.path.insert(0, str(_root))
+
+from src.etl.trasform import _bank_key, _parse_date
+
+PDF_BACKEND = os.environ.get("PDF_BACKEND", "pdfplumber")
+PDF_PAGE_CACHE_PATH = Path(os.environ.get("PDF_PAGE_CACHE_PATH", _root / ".cache" / "pdf_pages.sqlite3"))
+# Page-range tasks per worker: enough to balance uneven pages without reopening the PDF too often.
+_TASKS_PER_WORKER = 4
+
+Table = list[list[str | None]]
+
+_WHITESPACE = re.compile(r"\s+")
+
+# Statement dates with a month name ("Jan 2", "02 JAN", "January 2, 2024"), which
+# _parse_date does not read; most PDF statements leave out the year.
+_MONTHS = {m: i for i, m in enumerate(("jan", "feb", "mar", "apr", "may", "jun", "jul", "aug", "sep", "oct", "nov", "dec"), 1)}
+_MONTH = r"(?P<month>jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]*\.?"
+_MONTH_DAY = re.compile(
+    rf"(?:{_MONTH}\s+(?P<day>\d{{1,2}})|(?P<day2>\d{{1,2}})\s+{_MONTH.replace('month', 'month2')})(?:,?\s+(?P<year>\d{{4}}))?",
+    re.IGNORECASE,
+)
+_FULL_DATE = re.compile(rf"{_MONTH_DAY.pattern}|\b\d{{1,2}}/\d{{1,2}}/\d{{4}}\b|\b\d{{4}}-\d{{2}}-\d{{2}}\b", re.IGNORECASE)
+
+# PDF table headers (lowercased) → the CSV column the bank transforms read.
+_HEADER_ALIASES = {
+    "date": "Date",
+    "transaction date": "Date",
+    "trans date": "Date",
+    "posting date": "Date",
+    "description": "Description",
+    "details": "Description",
+    "transaction details": "Description",
+    "merchant": "Description",
+    "merchant name": "Description",
+    "withdrawal": "Debit",
+    "withdrawals": "Debit",
+    "debit": "Debit",
+    "debits": "Debit",
+    "deposit": "Credit",
+    "deposits": "Credit",
+    "credit": "Credit",
+    "credits": "Credit",
+    "amount": "Amount",
+    "amount ($)": "Amount",
+    "category": "Category",
+}
+# Layouts whose CSV export names those columns differently.
+_BANK_COLUMNS = {
+    "rbc": {"Date": "Transaction Date", "Description": "Description 1", "Amount": "AmountCAD"},
+    "walmart": {"Description": "Merchant Name", "Category": "Merchant Category"},
+}
+# Layouts that read one signed amount, with the sign a debit has in it.
+_SIGNED_AMOUNT = {"scotia": ("Amount", -1), "rbc": ("AmountCAD", -1), "walmart": ("Amount", 1)}
+
+
+def _clean(cell) -> str | None:
+    if cell is None:
+        return None
+    text = _WHITESPACE.sub(" ", str(cell)).strip()
+    return text or None
+
+
+def _clean_table(rows) -> Table:
+    return [[_clean(cell) for cell in row] for row in rows]
+
+
+def _pdfplumber_pages(pdf_path: str, pages: list[int]) -> dict[int, list[Table]]:
+    import pdfplumber
+
+    parsed = {}
+    with pdfplumber.open(pdf_path) as pdf:
+        for number in pages:
+            page = pdf.pages[number]
+            parsed[number] = [_clean_table(t) for t in page.extract_tables()]
+            page.close()
+    return parsed
+
+
+def _pymupdf_pages(pdf_path: str, pages: list[int]) -> dict[int, list[Table]]:
+    import pymupdf
+
+    with pymupdf.open(pdf_path) as doc:
+        return {number: [_clean_table(t.extract()) for t in doc[number].find_tables().tables] for number in pages}
+
+
+def _tabula_pages(pdf_path: str, pages: list[int]) -> dict[int, list[Table]]:
+    import tabula
+
+    if not hasattr(tabula, "read_pdf"):
+        raise RuntimeError("The tabula backend needs tabula-py (and a Java runtime)")
+    parsed = {}
+    for number in pages:
+        frames = tabula.read_pdf(pdf_path, pages=number + 1, multiple_tables=True, lattice=True, pandas_options={"header": None})
+        parsed[number] = [_clean_table(frame.astype(object).where(frame.notna(), None).values.tolist()) for frame in frames]
+    return parsed
+
+
+def _docling_pages(pdf_path: str, pages: list[int]) -> dict[int, list[Table]]:
+    from docling.document_converter import DocumentConverter
+
+    # Tasks get contiguous page ranges, so one conversion covers the whole task.
+    result = DocumentConverter().convert(pdf_path, page_range=(min(pages) + 1, max(pages) + 1))
+    parsed: dict[int, list[Table]] = {number: [] for number in pages}
+    for table in result.document.tables:
+        number = table.prov[0].page_no - 1 if table.prov else min(pages)
+        frame = table.export_to_dataframe()
+        parsed.setdefault(number, []).append(_clean_table([list(frame.columns), *frame.values.tolist()]))
+    return parsed
+
+
+BACKENDS: dict[str, Callable[[str, list[int]], dict[int, list[Table]]]] = {
+    "pdfplumber": _pdfplumber_pages,
+    "pymupdf": _pymupdf_pages,
+    "tabula": _tabula_pages,
+    "docling": _docling_pages,
+}
+
+
+def page_count(pdf_path: Path | str) -> int:
+    """Number of pages in a PDF."""
+    try:
+        import pymupdf
+
+        with pymupdf.open(pdf_path) as doc:
+            return doc.page_count
+    except ImportError:
+        import pdfplumber
+
+        with pdfplumber.open(pdf_path) as pdf:
+            return len(pdf.pages)
+
+
+CREATE_PAGE_CACHE_SQL = """
+CREATE TABLE IF NOT EXISTS pdf_pages (
+    content_hash TEXT NOT NULL,
+    backend TEXT NOT NULL,
+    page INTEGER NOT NULL,
+    tables TEXT NOT NULL,
+    PRIMARY KEY (content_hash, backend, page)
+)
+"""
+
+
+class PageCache:
+    """SQLite-backed cache of parsed pages keyed by PDF content hash, backend and page."""
+
+    def __init__(self, path: Path | str = PDF_PAGE_CACHE_PATH):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute(CREATE_PAGE_CACHE_SQL)
+
+    def get(self, content_hash: str, backend: str) -> dict[int, list[Table]]:
+        """All cached pages of one PDF for a backend."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT page, tables FROM pdf_pages WHERE content_hash = ? AND backend = ?", (content_hash, backend)
+            ).fetchall()
+        return {page: json.loads(tables) for page, tables in rows}
+
+    def put(self, content_hash: str, backend: str, pages: dict[int, list[Table]]) -> None:
+        """Store parsed pages."""
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR REPLACE INTO pdf_pages (content_hash, backend, page, tables) VALUES (?, ?, ?, ?)",
+                [(content_hash, backend, page, json.dumps(tables)) for page, tables in pages.items()],
+            )
+
+    def clear(self) -> None:
+        """Remove every cached page."""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM pdf_pages")
+
+
+_cache: PageCache | None = None
+
+
+def get_page_cache() -> PageCache:
+    """Return the process-wide page cache, opening it on first use."""
+    global _cache
+    if _cache is None:
+        _cache = PageCache()
+    return _cache
+
+
+def _page_ranges(pages: list[int], tasks: int) -> list[list[int]]:
+    """Split sorted page numbers into about `tasks` contiguous runs."""
+    size = max(1, -(-len(pages) // max(tasks, 1)))
+    return [pages[i:i + size] for i in range(0, len(pages), size)]
+
+
+def extract_tables(
+    pdf_path: Path | str,
+    backend: str = PDF_BACKEND,
+    workers: int | None = None,
+    cache: PageCache | None = None,
+    executor: Executor | None = None,
+    content_hash: str | None = None,
+) -> list[Table]:
+    """Extract all tables of a PDF, in page order, parsing uncached pages in parallel.
+
+    Pages are parsed by `executor` when one is given (e.g. the extract pool), else by a
+    new pool of `workers` processes (one per CPU by default; 1 parses inline). Parsed
+    pages go to `cache` (default: the process-wide PageCache); content_hash saves
+    re-hashing a file the caller has already hashed.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown PDF backend {backend!r}; choose from {', '.join(BACKENDS)}")
+    pdf_path = Path(pdf_path)
+    cache = cache or get_page_cache()
+    if content_hash is None:
+        with open(pdf_path, "rb") as f:
+            content_hash = hashlib.file_digest(f, "sha256").hexdigest()
+    parsed = cache.get(content_hash, backend)
+    missing = [page for page in range(page_count(pdf_path)) if page not in parsed]
+    if missing:
+        fresh: dict[int, list[Table]] = {}
+        parse = BACKENDS[backend]
+        workers = workers or os.cpu_count() or 1
+        if executor is None and (workers == 1 or len(missing) == 1):
+            fresh = parse(str(pdf_path), missing)
+        else:
+            own = executor is None
+            if own:
+                executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            try:
+                tasks = workers * _TASKS_PER_WORKER
+                futures = [executor.submit(parse, str(pdf_path), pages) for pages in _page_ranges(missing, tasks)]
+                for future in futures:
+                    fresh.update(future.result())
+            finally:
+                if own:
+                    executor.shutdown()
+        cache.put(content_hash, backend, fresh)
+        parsed.update(fresh)
+    return [table for page in sorted(parsed) for table in parsed[page]]
+
+
+def _page_text(pdf_path: str, number: int = 0) -> str:
+    try:
+        import pymupdf
+
+        with pymupdf.open(pdf_path) as doc:
+            return doc[number].get_text()
+    except ImportError:
+        import pdfplumber
+
+        with pdfplumber.open(pdf_path) as pdf:
+            return pdf.pages[number].extract_text() or ""
+
+
+def _month_day(text: str) -> tuple[int, int, int | None] | None:
+    """(month, day, year or None) of a whole month-name date, e.g. "Jan 2" → (1, 2, None)."""
+    match = _MONTH_DAY.fullmatch(text.strip())
+    if match is None:
+        return None
+    month = match.group("month") or match.group("month2")
+    day = match.group("day") or match.group("day2")
+    return _MONTHS[month[:3].lower()], int(day), int(match.group("year")) if match.group("year") else None
+
+
+def statement_date(pdf_path: Path | str) -> Date | None:
+    """The latest full date printed on a statement's first page (its closing or due date).
+
+    Used to give a year to transaction dates printed without one. None if the page has
+    no date with a year.
+    """
+    dates = []
+    for match in _FULL_DATE.finditer(_page_text(str(pdf_path))):
+        parts = _month_day(match.group())
+        try:
+            if parts is not None and parts[2] is not None:
+                dates.append(Date(parts[2], parts[0], parts[1]))
+            elif parts is None and (iso := _parse_date(match.group())):
+                dates.append(Date.fromisoformat(iso))
+        except ValueError:
+            continue  # not a real date, e.g. "Feb 30, 2024"
+    return max(dates, default=None)
+
+
+def _statement_row_date(text: str, filename: str, closing: Date | None) -> str:
+    """A transaction date cell as YYYY-MM-DD (or as is, when _parse_date reads it).
+
+    A date without a year takes the statement's: the year of the closing date, or the one
+    before for months after it (December rows on a January statement). Raises ValueError
+    for dates that cannot be read, rather than loading the row without a date.
+    """
+    if _parse_date(text):
+        return text
+    parts = _month_day(text)
+    if parts is None:
+        raise ValueError(f"{filename}: cannot read the transaction date {text!r}")
+    month, day, year = parts
+    if year is None:
+        if closing is None:
+            raise ValueError(f"{filename}: the date {text!r} has no year and the statement date was not found")
+        year = closing.year - 1 if month > closing.month else closing.year
+    try:
+        return Date(year, month, day).isoformat()
+    except ValueError:
+        raise ValueError(f"{filename}: cannot read the transaction date {text!r}") from None
+
+
+def _header_columns(row: list[str | None], bank: str | None) -> list[str | None] | None:
+    """Map a header row to CSV column names, or None if the row is not a header."""
+    renames = _BANK_COLUMNS.get(bank, {})
+    columns = [_HEADER_ALIASES.get((cell or "").lower()) for cell in row]
+    if "Date" not in columns or sum(c is not None for c in columns) < 2:
+        return None
+    return [renames.get(c, c) if c else None for c in columns]
+
+
+def table_records(tables: list[Table], filename: str, closing: Date | None = None) -> list[dict]:
+    """Turn extracted tables into raw records keyed like the bank's CSV export.
+
+    Tables without a recognizable header row (date plus at least one other known column)
+    are skipped, as are repeated headers. A row without a date continues the description
+    of the row before it, as multi-line descriptions do in most statements. Dates printed
+    with a month name are read as YYYY-MM-DD, taking a missing year from closing (see
+    statement_date). For banks whose CSV has one signed amount, dated rows with neither a
+    withdrawal nor a deposit (an opening or closing balance) are dropped.
+
+    >>> from src.etl.trasform import transform_records
+    >>> tables = [[["Date", "Description", "Withdrawals", "Deposits", "Balance"],
+    ...            ["Dec 31", "Opening Balance", None, None, "100.00"],
+    ...            ["Dec 31", "TIM HORTONS", "2.50", None, "97.50"],
+    ...            ["Jan 2", "NO FRILLS", "12.50", None, "85.00"]]]
+    >>> records = table_records(tables, "scotia.pdf", closing=Date(2024, 1, 20))
+    >>> [(r["date"], r["description"], r["debit_amount"]) for r in transform_records(records, "scotia.pdf")]
+    [('2023-12-31', 'TIM HORTONS', -2.5), ('2024-01-02', 'NO FRILLS', -12.5)]
+    >>> table_records(tables, "scotia.pdf")
+    Traceback (most recent call last):
+    ...
+    ValueError: scotia.pdf: the date 'Dec 31' has no year and the statement date was not found
+    """
+    bank = _bank_key(filename)
+    renames = _BANK_COLUMNS.get(bank, {})
+    date_key = renames.get("Date", "Date")
+    description_key = renames.get("Description", "Description")
+    records: list[dict] = []
+    for table in tables:
+        columns = None
+        for row in table:
+            header = _header_columns(row, bank)
+            if header is not None:
+                columns = header
+                continue
+            if columns is None:
+                continue
+            record = {c: v for c, v in zip(columns, row) if c is not None}
+            if record.get(date_key):
+                record[date_key] = _statement_row_date(record[date_key], filename, closing)
+                records.append(record)
+            elif records and record.get(description_key):
+                previous = records[-1]
+                previous[description_key] = " ".join(s for s in (previous.get(description_key), record[description_key]) if s)
+
+    if bank in _SIGNED_AMOUNT:
+        amount_key, debit_sign = _SIGNED_AMOUNT[bank]
+        for record in records:
+            if record.get(amount_key) is None and ("Debit" in record or "Credit" in record):
+                record[amount_key] = _signed(record.pop("Debit", None), record.pop("Credit", None), debit_sign)
+        records = [record for record in records if record.get(amount_key) is not None]
+    return records
+
+
+def _signed(debit: str | None, credit: str | None, debit_sign: int) -> str | None:
+    """One signed amount from separate withdrawal/deposit columns."""
+    def value(text):
+        return float(text.replace("$", "").replace(",", "")) if text else 0.0
+
+    if not debit and not credit:
+        return None
+    try:
+        return f"{debit_sign * (value(debit) - value(credit)):.2f}"
+    except ValueError:
+        return None
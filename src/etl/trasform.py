@@ -1,6 +1,17 @@
 from datetime import datetime
 
-from load import insertTransaction
+import numpy as np
+import pandas as pd
+
+from src.etl.categorize import categorize, categorize_frame
+from src.etl.load import COLUMNS
+
+# Formats tried by _parse_date, in order, with a shape check used by the columnar parser.
+_DATE_FORMATS = (
+    ("%m/%d/%Y", r"\d{1,2}/\d{1,2}/\d{4}"),
+    ("%Y-%m-%d", r"\d{4}-\d{1,2}-\d{1,2}"),
+    ("%d/%m/%Y", r"\d{1,2}/\d{1,2}/\d{4}"),
+)
 
 
 def transform_records(records: list[dict], filename: str) -> list[dict]:
@@ -12,27 +23,70 @@ def transform_records(records: list[dict], filename: str) -> list[dict]:
 
     Returns:
         List of dicts with keys: bank, account_type, # account_number, name, date,
-        category, description, debit_amount, credit_amount.
+        category, merchant, description, debit_amount, credit_amount. merchant and
+        category come from the merchant rules (see categorize.py).
     """
     transformed = []
+    bank = _bank_key(filename)
     for record in records:
-        name = filename.lower().split(".")[0]
-        if "cibc" in name:
+        if bank == "cibc":
             transformed.append(_transform_cibc_record(record))
-        elif "scotia" in name:
+        elif bank == "scotia":
             transformed.append(_transform_scotia_record(record))
-        elif "rbc" in name:
+        elif bank == "rbc":
             transformed.append(_transform_rbc_record(record))
-        elif "nbc" in name:
+        elif bank == "nbc":
             transformed.append(_transform_nbc_record(record))
-        elif "walmart" in name:
+        elif bank == "walmart":
             transformed.append(_transform_walmart_record(record))
-        insertTransaction(bank=transformed[-1]["bank"], account_type=transformed[-1]["account_type"], # account_number=transformed[-1]["account_number"], 
-        name=transformed[-1]["name"], date=transformed[-1]["date"], category=transformed[-1]["category"], description=transformed[-1]["description"], 
-        debit_amount=transformed[-1]["debit_amount"], credit_amount=transformed[-1]["credit_amount"])
+    for record in transformed:
+        if not isinstance(record["description"], str):
+            record["description"] = None  # NaN from an empty pandas cell, as frame_to_records maps it
+        record["merchant"], record["category"] = categorize(record["description"], record["category"])
     return transformed
 
 
+def transform_frame(df: pd.DataFrame, filename: str) -> pd.DataFrame:
+    """Columnar counterpart of transform_records.
+
+    Maps a whole statement DataFrame to the canonical schema with vectorized pandas/NumPy
+    operations instead of one dict per row. Produces the same values as transform_records,
+    except that missing values are always NaN/None (see frame_to_records).
+
+    Args:
+        df: Raw statement DataFrame (e.g. from pd.read_csv).
+        filename: Source filename (e.g. 'cibc-dec.csv') - used to infer bank.
+
+    Returns:
+        DataFrame with the canonical columns (load.COLUMNS), one row per input row.
+    """
+    bank = _bank_key(filename)
+    if bank is None:
+        return pd.DataFrame(columns=list(COLUMNS))
+    out = pd.DataFrame(_FRAME_TRANSFORMS[bank](df), columns=list(COLUMNS)).reset_index(drop=True)
+    return categorize_frame(out)
+
+
+def frame_to_records(frame: pd.DataFrame) -> list[dict]:
+    """Convert a canonical DataFrame to row dicts, mapping NaN to None (SQL NULL)."""
+    names = list(frame.columns)
+    columns = []
+    for name in names:
+        values = frame[name].to_numpy(dtype=object)
+        values[pd.isna(values)] = None
+        columns.append(values)
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+
+def _bank_key(filename: str) -> str | None:
+    """Infer the bank layout from the source filename."""
+    name = filename.lower().split(".")[0]
+    for bank in ("cibc", "scotia", "rbc", "nbc", "walmart"):
+        if bank in name:
+            return bank
+    return None
+
+
 def _transform_cibc_record(record: dict) -> dict:
     """Map a single raw record to the canonical schema."""
     return {
@@ -129,7 +183,7 @@ def _parse_date(val) -> str | None:
     s = str(val).strip()
     if not s or s.lower() == "nan":
         return None
-    for fmt in ("%m/%d/%Y", "%Y-%m-%d", "%d/%m/%Y"):
+    for fmt, _ in _DATE_FORMATS:
         try:
             return datetime.strptime(s, fmt).strftime("%Y-%m-%d")
         except ValueError:
@@ -156,3 +210,201 @@ def _parse_amount(val) -> float | None:
         return float(s)
     except ValueError:
         return None
+
+
+# --- Columnar transforms -------------------------------------------------------------
+
+
+def _transform_cibc_frame(df: pd.DataFrame) -> dict:
+    """Columnar _transform_cibc_record."""
+    return {
+        "bank": "CIBC",
+        "account_type": "Credit Card",
+        "name": None,
+        "date": _parse_date_column(_coalesce(df, "Date", "date")),
+        "category": None,
+        "description": _coalesce(df, "Description", "description", None),
+        "debit_amount": _parse_amount_column(_coalesce(df, "Debit", "Debit Amount", "Amount")),
+        "credit_amount": _parse_amount_column(_coalesce(df, "Credit", "Credit Amount", "Amount")),
+    }
+
+
+def _transform_nbc_frame(df: pd.DataFrame) -> dict:
+    """Columnar _transform_nbc_record."""
+    return {
+        "bank": "NBC",
+        "account_type": "Chequing",
+        "name": None,
+        "date": _parse_date_column(_coalesce(df, "Date", "date")),
+        "category": _coalesce(df, "Category", "category", None),
+        "description": _coalesce(df, "Description", "description", None),
+        "debit_amount": _parse_amount_column(_coalesce(df, "Debit", "Debit Amount", "Amount")),
+        "credit_amount": _parse_amount_column(_coalesce(df, "Credit", "Credit Amount", "Amount")),
+    }
+
+
+def _transform_rbc_frame(df: pd.DataFrame) -> dict:
+    """Columnar _transform_rbc_record."""
+    debit_amount, credit_amount = _split_amount(_parse_amount_column(_column(df, "AmountCAD")))
+    return {
+        "bank": "RBC",
+        "account_type": _coalesce(df, "Account Type", None),
+        "name": None,
+        "date": _parse_date_column(_column(df, "Transaction Date")),
+        "category": None,
+        "description": _join_columns(_str_or_empty_column(df, "Description 1"), _str_or_empty_column(df, "Description 2")),
+        "debit_amount": debit_amount,
+        "credit_amount": credit_amount,
+    }
+
+
+def _transform_scotia_frame(df: pd.DataFrame) -> dict:
+    """Columnar _transform_scotia_record."""
+    debit_amount, credit_amount = _split_amount(_parse_amount_column(_column(df, "Amount")))
+    return {
+        "bank": "Scotia",
+        "account_type": "Chequing",
+        "name": None,
+        "date": _parse_date_column(_coalesce(df, "Date", "date")),
+        "category": None,
+        "description": _join_columns(_str_or_empty_column(df, "Description"), _str_or_empty_column(df, "Sub-description")),
+        "debit_amount": debit_amount,
+        "credit_amount": credit_amount,
+    }
+
+
+def _transform_walmart_frame(df: pd.DataFrame) -> dict:
+    """Columnar _transform_walmart_record. Positive amounts are purchases (debits)."""
+    credit_amount, debit_amount = _split_amount(_parse_amount_column(_column(df, "Amount")))
+    return {
+        "bank": "Walmart",
+        "account_type": "Credit Card",
+        "name": _coalesce(df, "Name on Card", None),
+        "date": _parse_date_column(_coalesce(df, "Date", "date")),
+        "category": _coalesce(df, "Merchant Category", None),
+        "description": _coalesce(df, "Merchant Name", None),
+        "debit_amount": debit_amount,
+        "credit_amount": credit_amount,
+    }
+
+
+_FRAME_TRANSFORMS = {
+    "cibc": _transform_cibc_frame,
+    "scotia": _transform_scotia_frame,
+    "rbc": _transform_rbc_frame,
+    "nbc": _transform_nbc_frame,
+    "walmart": _transform_walmart_frame,
+}
+
+
+def _column(df: pd.DataFrame, col: str) -> pd.Series:
+    """Vectorized record.get(col): the column, or all-None when it is absent."""
+    if col in df:
+        return df[col]
+    return pd.Series(None, index=df.index, dtype=object)
+
+
+def _falsy(col: pd.Series) -> np.ndarray:
+    """Elementwise Python falsiness. NaN is truthy, as in `or` chains."""
+    if pd.api.types.is_numeric_dtype(col):
+        return col.to_numpy() == 0
+    values = col.to_numpy(dtype=object)
+    return (values == None) | (values == "") | (values == 0)  # noqa: E711
+
+
+def _coalesce(df: pd.DataFrame, *columns: str | None) -> pd.Series:
+    """Vectorized `record.get(a) or record.get(b) or ...`.
+
+    A None entry in columns stands for a literal None operand. As with `or`, each row takes
+    the first truthy value, falling back to the last operand when none is truthy.
+    """
+    n = len(df)
+    result = np.full(n, None, dtype=object)
+    pending = np.ones(n, dtype=bool)
+    last = result
+    for col in columns:
+        if col is not None and col in df:
+            truthy = ~_falsy(df[col])
+            values = df[col].to_numpy(dtype=object)
+        else:
+            truthy = np.zeros(n, dtype=bool)
+            values = np.full(n, None, dtype=object)
+        take = pending & truthy
+        result[take] = values[take]
+        pending &= ~truthy
+        last = values
+        if not pending.any():
+            break
+    result[pending] = last[pending]
+    # Let numeric results get a numeric dtype so the amount parser can skip string cleaning.
+    return pd.Series(result, index=df.index).infer_objects()
+
+
+def _parse_date_column(col: pd.Series) -> np.ndarray:
+    """Vectorized _parse_date.
+
+    Each distinct value is parsed once. For every format (in _parse_date's order) the values
+    shaped like it are parsed in a single pd.to_datetime call; anything left over goes
+    through _parse_date itself, so results match the per-record path exactly.
+    """
+    codes, uniques = pd.factorize(col)
+    raw = pd.Series(uniques, dtype=object)
+    text = raw.astype(str).str.strip()
+    parsed = pd.Series(None, index=text.index, dtype=object)
+    for fmt, pattern in _DATE_FORMATS:
+        todo = parsed.isna() & text.str.fullmatch(pattern)
+        if not todo.any():
+            continue
+        dates = pd.to_datetime(text[todo], format=fmt, errors="coerce")
+        parsed[todo] = dates.dt.strftime("%Y-%m-%d")
+    rest = parsed.isna()
+    if rest.any():
+        parsed[rest] = raw[rest].map(_parse_date)
+    out = parsed.to_numpy(dtype=object)[codes]
+    out[codes == -1] = None
+    return out
+
+
+def _parse_amount_column(col: pd.Series) -> np.ndarray:
+    """Vectorized _parse_amount. Returns float64 with NaN where _parse_amount gives None."""
+    if pd.api.types.is_numeric_dtype(col) and not pd.api.types.is_bool_dtype(col):
+        return col.to_numpy(dtype="float64")
+    codes, uniques = pd.factorize(col)
+    raw = pd.Series(uniques, dtype=object)
+    text = (
+        raw.astype(str)
+        .str.replace("$", "", regex=False)
+        .str.replace(",", "", regex=False)
+        .str.strip()
+    )
+    values = pd.to_numeric(text, errors="coerce").astype("float64")
+    # Strings float() accepts but to_numeric does not (e.g. '1_000') take the scalar path.
+    rest = values.isna() & ~text.isin(["", "-"])
+    if rest.any():
+        values[rest] = raw[rest].map(_parse_amount).astype("float64")
+    out = values.to_numpy(dtype="float64")[codes]
+    out[codes == -1] = np.nan
+    return out
+
+
+def _split_amount(amount: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Split signed amounts into (non-positive, positive) columns, with 0 in the other one."""
+    positive = amount > 0
+    return np.where(positive, 0.0, amount), np.where(positive, amount, 0.0)
+
+
+def _str_or_empty_column(df: pd.DataFrame, col: str) -> pd.Series:
+    """Vectorized _str_or_empty."""
+    if col not in df:
+        return pd.Series("", index=df.index, dtype=object)
+    codes, uniques = pd.factorize(df[col])
+    text = pd.Series(uniques, dtype=object).astype(str).str.strip()
+    text = text.where(text.str.lower().ne("nan"), "").to_numpy(dtype=object)[codes]
+    text[codes == -1] = ""
+    return pd.Series(text, index=df.index)
+
+
+def _join_columns(first: pd.Series, second: pd.Series) -> pd.Series:
+    """Vectorized `" ".join(s for s in [first, second] if s) or None`."""
+    joined = (first + " " + second).where((first != "") & (second != ""), first + second)
+    return joined.where(joined != "", None)
@@ -1,3 +1,4 @@
+import functools
 import os
 import sys
 from pathlib import Path
@@ -10,23 +11,35 @@ if str(_root) not in sys.path:
 from dotenv import load_dotenv
 from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
-from src.utils.constants import analyze_llm_model
+from src.utils.constants import ANALYZE_LLM_MODEL
 from src.llm.prompts import analyze_system_prompt
+from src.llm.streaming import TimedStream
+from src.utils.tracing import span
 
 
 load_dotenv()
 openai_api_key = os.getenv("OPENAI_API_KEY")
 
-def analyze_data(financial_data: str, question: str) -> str:
+@functools.cache
+def _analyze_chain():
+    """Prompt template and client, built once per process."""
     analyze_prompt_template = ChatPromptTemplate.from_messages([
         ("system", analyze_system_prompt),
         ("human", "{question}: {financial_data}"),
     ])
-    llm = ChatOpenAI(model=analyze_llm_model, api_key=openai_api_key)
-    chain = analyze_prompt_template | llm
-    response = chain.invoke({"financial_data": financial_data, "question": question})
+    llm = ChatOpenAI(model=ANALYZE_LLM_MODEL, api_key=openai_api_key)
+    return analyze_prompt_template | llm
+
+def analyze_data(financial_data: str, question: str) -> str:
+    with span("analysis") as s:
+        response = _analyze_chain().invoke({"financial_data": financial_data, "question": question})
+        s.record_usage(response)
     return response.content
 
+def stream_analyze_data(financial_data: str, question: str) -> TimedStream:
+    """Stream the analysis chunk by chunk; the returned stream records time-to-first-token."""
+    return TimedStream(_analyze_chain().stream({"financial_data": financial_data, "question": question}), name="analysis_stream")
+
 
 
 # analyze_prompt_template = ChatPromptTemplate.from_messages([
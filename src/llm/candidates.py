@@ -0,0 +1,141 @@
+"""
+Speculative SQL generation with validation and self-repair.
+
+A question's SQL is requested from several model calls at once (SQL_CANDIDATES, each at
+a different temperature). Each candidate is checked with EXPLAIN as soon as it arrives
+(execute.explainQuery: the query guard plus the planner, without running the query), and
+the first that passes wins; calls still in flight are cancelled or their results ignored.
+A question is then only as slow as its fastest valid answer, and one bad generation no
+longer fails the whole chain. If every candidate fails, the model is shown its query and
+the database error and asked for a fix, up to SQL_REPAIR_ROUNDS times. If that fails too,
+QueryRejected is raised, so the invalid SQL never reaches the SQL cache.
+"""
+
+import asyncio
+import contextvars
+import sys
+from collections.abc import Awaitable, Callable
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+_root = Path(__file__).resolve().parent.parent.parent
+if str(_root) not in sys.path:
+    sys.path.insert(0, str(_root))
+
+from src.database.execute import aexplainQuery, explainQuery
+from src.database.guard import QueryRejected
+from src.utils.constants import SQL_CANDIDATES, SQL_REPAIR_ROUNDS
+from src.utils.tracing import span
+
+
+def candidate_temperatures(n: int = SQL_CANDIDATES) -> list[float]:
+    """Sampling temperature per candidate: the first is deterministic, the rest vary.
+
+    >>> candidate_temperatures(3)
+    [0.0, 0.4, 0.8]
+    """
+    return [round(min(0.4 * i, 1.0), 2) for i in range(max(n, 1))]
+
+
+def _failure(failures: list[tuple[int, str, str]], errors: list[Exception]) -> tuple[str, str]:
+    if not failures:
+        raise errors[0]  # every model call raised: nothing to repair
+    # Repair the lowest-temperature candidate: usually the closest to right.
+    _, sql, error = min(failures)
+    return sql, error
+
+
+def generate_valid_sql(
+    candidates: list[Callable[[], str]],
+    repair: Callable[[str, str], str],
+    validate: Callable[[str], str | None] = explainQuery,
+    rounds: int = SQL_REPAIR_ROUNDS,
+) -> str:
+    """Return the first candidate's SQL that validates, repairing the best failure if none does.
+
+    candidates are zero-argument model calls run concurrently; repair(sql, error) asks for
+    a corrected query; validate returns None for valid SQL, else the error message.
+    """
+    with span("sql_candidates", candidates=len(candidates)) as s:
+        failures: list[tuple[int, str, str]] = []
+        errors: list[Exception] = []
+
+        def attempt(index: int) -> tuple[int, str, str | None]:
+            sql = candidates[index]()
+            return index, sql, validate(sql)
+
+        pool = ThreadPoolExecutor(max_workers=len(candidates), thread_name_prefix="sql-candidate")
+        try:
+            # Each thread runs in a copy of this context, so its spans nest under this one.
+            pending = {pool.submit(contextvars.copy_context().run, attempt, i) for i in range(len(candidates))}
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    if future.exception() is not None:
+                        errors.append(future.exception())
+                        continue
+                    index, sql, error = future.result()
+                    if error is None:
+                        s.set(winner=index, failed=len(failures) + len(errors))
+                        return sql
+                    failures.append((index, sql, error))
+        finally:
+            # Don't wait for the losers; their model calls finish in the background.
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        s.set(failed=len(failures) + len(errors))
+        sql, error = _failure(failures, errors)
+        for round_ in range(rounds):
+            with span("sql_repair", round=round_ + 1) as r:
+                sql = repair(sql, error)
+                error = validate(sql)
+                r.set(valid=error is None)
+            if error is None:
+                s.set(winner="repair")
+                return sql
+        raise QueryRejected(f"No valid SQL after {len(candidates)} candidates and {rounds} repairs: {error}")
+
+
+async def agenerate_valid_sql(
+    candidates: list[Callable[[], Awaitable[str]]],
+    arepair: Callable[[str, str], Awaitable[str]],
+    avalidate: Callable[[str], Awaitable[str | None]] = aexplainQuery,
+    rounds: int = SQL_REPAIR_ROUNDS,
+) -> str:
+    """Async counterpart of generate_valid_sql; losing candidates' model calls are cancelled."""
+    with span("sql_candidates", candidates=len(candidates)) as s:
+        failures: list[tuple[int, str, str]] = []
+        errors: list[Exception] = []
+
+        async def attempt(index: int) -> tuple[int, str, str | None]:
+            sql = await candidates[index]()
+            # Shielded: cancelled mid-EXPLAIN, its connection would be discarded by the pool.
+            return index, sql, await asyncio.shield(avalidate(sql))
+
+        tasks = [asyncio.ensure_future(attempt(i)) for i in range(len(candidates))]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                try:
+                    index, sql, error = await next_done
+                except Exception as exc:  # one failed model call; the others may still succeed
+                    errors.append(exc)
+                    continue
+                if error is None:
+                    s.set(winner=index, failed=len(failures) + len(errors))
+                    return sql
+                failures.append((index, sql, error))
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        s.set(failed=len(failures) + len(errors))
+        sql, error = _failure(failures, errors)
+        for round_ in range(rounds):
+            with span("sql_repair", round=round_ + 1) as r:
+                sql = await arepair(sql, error)
+                error = await avalidate(sql)
+                r.set(valid=error is None)
+            if error is None:
+                s.set(winner="repair")
+                return sql
+        raise QueryRejected(f"No valid SQL after {len(candidates)} candidates and {rounds} repairs: {error}")
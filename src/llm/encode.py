@@ -0,0 +1,175 @@
+"""
+Compact, token-budgeted encoding of query results for the analysis prompt.
+
+Rows are written as a CSV table (one header, then values) instead of a list of Python
+dict reprs. When the table would not fit the token budget, it is replaced by a summary:
+row count and numeric totals, the date range, top-N groups by merchant/description and
+category, a per-month rollup, and as many leading rows as still fit.
+
+Tokens are estimated as characters / 4, which is close enough for budgeting across the
+models we use and needs no tokenizer download.
+"""
+
+import csv
+import io
+import math
+import sys
+from datetime import date, datetime
+from decimal import Decimal
+from pathlib import Path
+
+_root = Path(__file__).resolve().parent.parent.parent
+if str(_root) not in sys.path:
+    sys.path.insert(0, str(_root))
+
+import pandas as pd
+
+from src.utils.constants import RESULT_TOKEN_BUDGET, RESULT_TOP_N
+
+# Columns to group "top N" summaries by, in order of preference.
+_GROUP_COLUMNS = (("merchant", "description", "name"), ("category",))
+_RAW_SAMPLE_ROWS = 1000
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count of text (characters / 4)."""
+    return math.ceil(len(text) / 4)
+
+
+def _format(value) -> str:
+    if value is None or (isinstance(value, float) and math.isnan(value)):
+        return ""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, float):
+        return f"{value:.2f}"
+    return str(value)
+
+
+def to_csv(rows: list[dict], columns: list[str] | None = None) -> str:
+    """Render rows as a CSV table with a single header line."""
+    columns = columns or (list(rows[0]) if rows else [])
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow([_format(row.get(c)) for c in columns])
+    return out.getvalue()
+
+
+def _frame_to_csv(frame: pd.DataFrame) -> str:
+    return to_csv(frame.to_dict("records"), list(frame.columns))
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float, Decimal)) and not isinstance(value, bool)
+
+
+def _column_kinds(rows: list[dict]) -> tuple[list[str], list[str], list[str]]:
+    """Split columns into numeric, date and text columns by their first non-null value."""
+    numeric, dates, text = [], [], []
+    for column in rows[0]:
+        sample = next((r[column] for r in rows if r[column] is not None), None)
+        if _is_number(sample):
+            # Keys like id / account_id are numbers but summing them means nothing.
+            if column != "id" and not column.endswith("_id"):
+                numeric.append(column)
+        elif isinstance(sample, (date, datetime)):
+            dates.append(column)
+        elif isinstance(sample, str):
+            text.append(column)
+    return numeric, dates, text
+
+
+def _summarize(rows: list[dict], token_budget: int, top_n: int) -> str:
+    """Summary sections of a large result, most important first, cut to the budget."""
+    numeric, dates, text = _column_kinds(rows)
+    df = pd.DataFrame.from_records(rows)
+    for column in numeric:
+        df[column] = pd.to_numeric(df[column], errors="coerce")
+
+    sections = [f"{len(rows)} rows; summarized to fit the token budget."]
+    if numeric:
+        totals = pd.DataFrame({
+            "column": numeric,
+            "sum": [df[c].sum() for c in numeric],
+            "min": [df[c].min() for c in numeric],
+            "max": [df[c].max() for c in numeric],
+        })
+        sections.append("Totals:\n" + _frame_to_csv(totals))
+    when = pd.to_datetime(df[dates[0]]) if dates else None
+    if when is not None:
+        sections.append(f"Date range ({dates[0]}): {when.min().date()} to {when.max().date()}")
+
+    for candidates in _GROUP_COLUMNS:
+        key = next((c for c in candidates if c in text), None)
+        if key is None:
+            continue
+        grouped = df.groupby(key, dropna=False).agg(rows=(key, "size"), **{c: (c, "sum") for c in numeric})
+        # By magnitude: some banks store debits as negative amounts.
+        top = grouped.sort_values(numeric[0] if numeric else "rows", key=abs, ascending=False).head(top_n).reset_index()
+        sections.append(f"Top {len(top)} by {key} (of {len(grouped)}):\n" + _frame_to_csv(top))
+
+    monthly = None
+    if when is not None:
+        month = when.dt.to_period("M").astype(str)
+        monthly = df.groupby(month).agg(rows=(dates[0], "size"), **{c: (c, "sum") for c in numeric})
+        monthly = monthly.rename_axis("month").reset_index()
+
+    text_out = "\n".join(sections)
+    if monthly is not None:
+        # Most recent months first if the whole rollup does not fit.
+        for start in range(len(monthly)):
+            part = monthly.iloc[start:]
+            label = "Per month:" if start == 0 else f"Per month (last {len(part)} of {len(monthly)}):"
+            candidate = f"{text_out}\n{label}\n{_frame_to_csv(part)}"
+            if estimate_tokens(candidate) <= token_budget:
+                text_out = candidate
+                break
+
+    # Fill what is left of the budget with leading rows.
+    header = "\nFirst {k} rows:\n"
+    columns = list(rows[0])
+    lines = [to_csv([], columns)]
+    used = estimate_tokens(text_out + header.format(k=len(rows)) + lines[0])
+    for row in rows:
+        line = to_csv([row], columns).split("\n", 1)[1]
+        cost = estimate_tokens(line)
+        if used + cost > token_budget:
+            break
+        lines.append(line)
+        used += cost
+    if len(lines) > 1:
+        text_out += header.format(k=len(lines) - 1) + "".join(lines)
+    return text_out
+
+
+def encode_result(
+    rows: list[dict], token_budget: int = RESULT_TOKEN_BUDGET, top_n: int = RESULT_TOP_N
+) -> tuple[str, dict]:
+    """Encode query rows for the analysis prompt within token_budget.
+
+    Returns the encoded text and a report: rows, raw_tokens (roughly what str(rows)
+    would have cost), tokens, saved_tokens and whether the result was summarized.
+    """
+    # Baseline for the report, extrapolated from a sample: repr of a large result is slow.
+    sample = rows[:_RAW_SAMPLE_ROWS]
+    raw_tokens = estimate_tokens(str(sample)) * len(rows) // max(len(sample), 1) if rows else 1
+    if not rows:
+        text, summarized = "(no rows)", False
+    # Every value costs at least a separator character, so big results are known not to
+    # fit without rendering them first.
+    elif len(rows) * len(rows[0]) > 4 * token_budget:
+        text, summarized = _summarize(rows, token_budget, top_n), True
+    else:
+        text, summarized = to_csv(rows), False
+        if estimate_tokens(text) > token_budget:
+            text, summarized = _summarize(rows, token_budget, top_n), True
+    tokens = estimate_tokens(text)
+    return text, {
+        "rows": len(rows),
+        "raw_tokens": raw_tokens,
+        "tokens": tokens,
+        "saved_tokens": raw_tokens - tokens,
+        "summarized": summarized,
+    }
@@ -0,0 +1,233 @@
+"""
+Verified question → SQL examples, retrieved per question for the SQL agent's prompt.
+
+Examples live in a user-editable CSV (sql_examples.csv next to this file, or
+SQL_EXAMPLES_PATH): question, sql. Instead of pasting every example into every prompt,
+only the few most similar to the question are sent (src/llm/prompts.py), which keeps the
+prompt short and the examples relevant.
+
+Similarity is TF-IDF cosine over n-grams of the normalized question: words and word pairs
+(stopwords dropped from single words, numbers reduced to one placeholder) plus character
+trigrams of each word, so "grocery" still finds "groceries". The index is a small SQLite
+file (SQL_EXAMPLES_INDEX_PATH) of term → (example, weight) postings, rebuilt when the CSV
+changes; a lookup reads only the postings of the question's own terms.
+
+Run from project root:
+  uv run python src/llm/examples.py search "How much did I spend on gas?" [-k 3]
+  uv run python src/llm/examples.py add "question" "SELECT ..."   (runs the SQL first)
+  uv run python src/llm/examples.py verify                         (runs every example)
+"""
+
+import argparse
+import csv
+import math
+import os
+import re
+import sqlite3
+import sys
+import threading
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import NamedTuple
+
+_root = Path(__file__).resolve().parent.parent.parent
+if str(_root) not in sys.path:
+    sys.path.insert(0, str(_root))
+
+from src.database.guard import check_query
+from src.llm.sql_cache import normalize_question
+
+SQL_EXAMPLES_PATH = Path(os.environ.get("SQL_EXAMPLES_PATH", Path(__file__).resolve().parent / "sql_examples.csv"))
+SQL_EXAMPLES_INDEX_PATH = Path(os.environ.get("SQL_EXAMPLES_INDEX_PATH", _root / ".cache" / "sql_examples.sqlite3"))
+
+_PARAMETER = re.compile(r"\{n\d+\}")
+# Words too common in questions to tell examples apart (they still count inside word pairs).
+_STOPWORDS = frozenset(
+    "a an and at by did do does for from how i in is it me much my of on or show the to was were what "
+    "which with".split()
+)
+# Character trigrams only back up the word terms.
+_TRIGRAM_WEIGHT = 0.3
+
+CREATE_INDEX_SQL = """
+CREATE TABLE IF NOT EXISTS examples (id INTEGER PRIMARY KEY, question TEXT NOT NULL, sql TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS postings (term TEXT NOT NULL, example_id INTEGER NOT NULL, weight REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS postings_term ON postings (term);
+CREATE TABLE IF NOT EXISTS terms (term TEXT PRIMARY KEY, idf REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+
+class Example(NamedTuple):
+    question: str
+    sql: str
+    score: float = 0.0
+
+
+def question_terms(question: str) -> Counter:
+    """Weighted n-gram terms of a question: words, word pairs and character trigrams.
+
+    Numbers become {n}; stopwords are dropped as words but kept in word pairs.
+    Trigrams ('#cos', ...) are left out of the example below.
+
+    >>> sorted(t for t in question_terms("Spent $50 at Costco?") if not t.startswith("#"))
+    ['at costco', 'costco', 'spent', 'spent {n}', '{n}', '{n} at']
+    """
+    template, _ = normalize_question(question)
+    words = _PARAMETER.sub("{n}", template).split()
+    terms: Counter = Counter()
+    for word in words:
+        if word not in _STOPWORDS:
+            terms[word] += 1
+            for i in range(len(word) - 2):
+                if word[i:i + 3] != "{n}":
+                    terms["#" + word[i:i + 3]] += _TRIGRAM_WEIGHT
+    for first, second in zip(words, words[1:]):
+        terms[f"{first} {second}"] += 1
+    return terms
+
+
+def load_examples(path: Path | str = SQL_EXAMPLES_PATH) -> list[Example]:
+    """Read examples from a CSV with question, sql columns ('#' lines are comments)."""
+    with open(path, newline="") as f:
+        lines = (line for line in f if not line.lstrip().startswith("#"))
+        return [
+            Example(row["question"].strip(), row["sql"].strip())
+            for row in csv.DictReader(lines)
+            if (row.get("question") or "").strip() and (row.get("sql") or "").strip()
+        ]
+
+
+class ExampleStore:
+    """TF-IDF n-gram index over the example CSV, kept in a SQLite file."""
+
+    def __init__(self, path: Path | str = SQL_EXAMPLES_PATH, index_path: Path | str = SQL_EXAMPLES_INDEX_PATH):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        index_path = Path(index_path)
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(index_path, check_same_thread=False)
+        self._db.executescript(CREATE_INDEX_SQL)
+        self.refresh()
+
+    def _source_key(self) -> str:
+        stat = os.stat(self.path)
+        return f"{self.path.resolve()}:{stat.st_mtime_ns}:{stat.st_size}"
+
+    def refresh(self) -> bool:
+        """Rebuild the index if the CSV changed since it was built; True if it was rebuilt."""
+        key = self._source_key()
+        with self._lock:
+            row = self._db.execute("SELECT value FROM meta WHERE key = 'source'").fetchone()
+            if row and row[0] == key:
+                return False
+            examples = load_examples(self.path)
+            documents = [question_terms(e.question) for e in examples]
+            document_frequency = Counter(term for terms in documents for term in terms)
+            idf = {term: math.log((1 + len(documents)) / (1 + df)) + 1 for term, df in document_frequency.items()}
+            with self._db:
+                for table in ("examples", "postings", "terms"):
+                    self._db.execute(f"DELETE FROM {table}")
+                self._db.executemany(
+                    "INSERT INTO examples (id, question, sql) VALUES (?, ?, ?)",
+                    [(i, e.question, e.sql) for i, e in enumerate(examples)],
+                )
+                self._db.executemany("INSERT INTO terms (term, idf) VALUES (?, ?)", idf.items())
+                for i, terms in enumerate(documents):
+                    weights = {term: tf * idf[term] for term, tf in terms.items()}
+                    norm = math.sqrt(sum(w * w for w in weights.values())) or 1.0
+                    self._db.executemany(
+                        "INSERT INTO postings (term, example_id, weight) VALUES (?, ?, ?)",
+                        [(term, i, w / norm) for term, w in weights.items()],
+                    )
+                self._db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('source', ?)", (key,))
+        return True
+
+    def search(self, question: str, k: int = 3) -> list[Example]:
+        """Return up to k examples most similar to the question, best first."""
+        terms = question_terms(question)
+        if not terms or k <= 0:
+            return []
+        placeholders = ",".join("?" * len(terms))
+        with self._lock:
+            idf = dict(self._db.execute(f"SELECT term, idf FROM terms WHERE term IN ({placeholders})", list(terms)))
+            query = {term: tf * idf[term] for term, tf in terms.items() if term in idf}
+            norm = math.sqrt(sum(w * w for w in query.values())) or 1.0
+            scores: dict[int, float] = defaultdict(float)
+            for term, example_id, weight in self._db.execute(
+                f"SELECT term, example_id, weight FROM postings WHERE term IN ({placeholders})", list(terms)
+            ):
+                scores[example_id] += query.get(term, 0.0) / norm * weight
+            best = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:k]
+            found = []
+            for example_id, score in best:
+                question_text, sql = self._db.execute(
+                    "SELECT question, sql FROM examples WHERE id = ?", (example_id,)
+                ).fetchone()
+                found.append(Example(question_text, sql, score))
+        return found
+
+    def add(self, question: str, sql: str) -> None:
+        """Append a verified example to the CSV; the index picks it up on the next refresh."""
+        sql = check_query(sql)
+        with open(self.path, "a", newline="") as f:
+            csv.writer(f).writerow([question.strip(), sql + ";"])
+        self.refresh()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM examples").fetchone()[0]
+
+
+_store: ExampleStore | None = None
+
+
+def get_example_store() -> ExampleStore:
+    """Return the process-wide example store, re-indexing it when the CSV changes."""
+    global _store
+    if _store is None:
+        _store = ExampleStore()
+    else:
+        _store.refresh()
+    return _store
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Search, add and verify the SQL agent's few-shot examples.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    search = sub.add_parser("search", help="show the examples retrieved for a question")
+    search.add_argument("question")
+    search.add_argument("-k", type=int, default=3)
+    add = sub.add_parser("add", help="run a question's SQL, then add the pair to the examples")
+    add.add_argument("question")
+    add.add_argument("sql")
+    sub.add_parser("verify", help="run every example's SQL against the query backend")
+    args = parser.parse_args()
+
+    store = get_example_store()
+    if args.command == "search":
+        for example in store.search(args.question, args.k):
+            print(f"{example.score:.3f}  {example.question}\n       {example.sql}")
+        return
+
+    from src.database.execute import execute
+
+    if args.command == "add":
+        rows = execute(args.sql)
+        print(f"Query returned {len(rows)} rows: {rows[:3]}")
+        store.add(args.question, args.sql)
+        print(f"Added; {len(store)} examples.")
+        return
+    failed = 0
+    for example in load_examples(store.path):
+        try:
+            rows = execute(example.sql, use_cache=False)
+            print(f"ok    {len(rows):>5} rows  {example.question}")
+        except Exception as exc:
+            failed += 1
+            print(f"FAIL  {example.question}: {exc}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,26 @@
-postgres_system_prompt = """### Role
-You are an expert SQL Developer specializing in PostgreSQL. Your task is to convert natural language questions into accurate, executable SQL queries for a financial transaction database.
+import sys
+from pathlib import Path
+
+_root = Path(__file__).resolve().parent.parent.parent
+if str(_root) not in sys.path:
+    sys.path.insert(0, str(_root))
+
+from src.etl.categorize import load_rules, normalize_description
+from src.llm.encode import estimate_tokens
+from src.utils.constants import QUERY_BACKEND, SQL_FEW_SHOT_K, SQL_PROMPT
+from src.utils.tracing import span
+
+# Merchant and category names the loader assigns (src/etl/merchant_rules.csv), so the
+# model can filter with equality on the indexed columns instead of wildcard scans.
+_rules = load_rules()
+KNOWN_MERCHANTS = ", ".join(f"'{m}'" for m in sorted({r.merchant.replace("'", "''") for r in _rules}))
+KNOWN_CATEGORIES = ", ".join(f"'{c}'" for c in sorted({r.category for r in _rules if r.category}))
+
+
+def _sql_system_prompt(dialect: str) -> str:
+    """System prompt for the SQL agent, for a database dialect ('PostgreSQL' or 'DuckDB')."""
+    return f"""### Role
+You are an expert SQL Developer specializing in {dialect}. Your task is to convert natural language questions into accurate, executable SQL queries for a financial transaction database.
 
 ### Database Schema
 The table `transactions` contains the following columns:
@@ -9,29 +30,117 @@ The table `transactions` contains the following columns:
 - # **account_number**: (VARCHAR) Masked identifier (e.g., '5268********0761'). # Commented out because it is not in the dataset.
 - **name**: (VARCHAR) may contain null in dataset.
 - **date**: (DATE) Transaction date.
-- **category**: (VARCHAR) may contain null in dataset; logic should rely on 'description'.
-- **description**: (TEXT) Merchant details and location (e.g., 'NOFRILLS JOHN''S #3457 MILTON, ON').
+- **category**: (VARCHAR) Spending category (e.g., 'Groceries'); null when unknown.
+- **merchant**: (VARCHAR) Normalized merchant name (e.g., 'No Frills' for 'NOFRILLS JOHN''S #3457 MILTON, ON').
+- **description**: (TEXT) Raw merchant details and location (e.g., 'NOFRILLS JOHN''S #3457 MILTON, ON').
 - **debit_amount**: (DECIMAL) Amount spent (outgoing).
 - **credit_amount**: (DECIMAL) Amount received or refunded (incoming).
 - **created_at**: (TIMESTAMPTZ) Record entry timestamp.
 
+### Summary Tables (pre-aggregated, much faster than scanning `transactions`)
+`monthly_merchant_totals` and `monthly_category_totals` hold one row per month, bank, account_type and merchant (or category):
+- **month**: (DATE) First day of the month, e.g. '2024-03-01'.
+- **bank**, **account_type**: (VARCHAR) Same values as in `transactions`; '' when unknown.
+- **merchant**: (TEXT, `monthly_merchant_totals` only) The transaction `merchant` (its `description` if it has none); '' when unknown.
+- **category**: (TEXT, `monthly_category_totals` only) The transaction `category`; '' when unknown.
+- **debit_total**, **credit_total**: (DECIMAL) Sums of `debit_amount` / `credit_amount` for the group (never null).
+- **txn_count**: (INTEGER) Number of transactions in the group.
+
 ### Critical Rules & Logic
-1. **Merchant Identification**: Since 'category' is null, use the `description` column with `ILIKE` and wildcards to identify merchants.
-   - Example: For "Costco", use `description ILIKE '%COSTCO%'`.
+1. **Merchant and Category Identification**: Filter with equality on `merchant` or `category` using the exact names below. Use `description ILIKE '%...%'` only for merchants not listed.
+   - Example: For "Costco", use `merchant = 'Costco'`; for "groceries", use `category = 'Groceries'`.
+   - Known merchants: {KNOWN_MERCHANTS}.
+   - Known categories: {KNOWN_CATEGORIES}.
 2. **Location Filtering**: Many transactions occur in 'MILTON' or 'BURLINGTON'. If the user asks about local spending, filter `description` for these cities.
 3. **Handling Nulls**: Use `COALESCE(debit_amount, 0)` or `WHERE debit_amount IS NOT NULL` to ensure mathematical operations don't fail, as some records have nulls in one of the amount columns.
 4. **Output Format**: Return ONLY the raw SQL code. No markdown, no explanations.
 5. **Security**: Only allow `SELECT` statements.
+6. **Use Summary Tables for Totals**: For totals, counts or averages per month, merchant or category, query `monthly_merchant_totals` or `monthly_category_totals` instead of `transactions`. Use `transactions` only when individual transactions are needed.
+7. **Date Ranges**: Filter dates with a range, e.g. `date >= '2024-01-01' AND date < '2025-01-01'`, not `EXTRACT(YEAR FROM date) = 2024`; `transactions` is partitioned by month and only a range limits the months scanned.
 
 ### Data-Specific Examples
 - **User**: "How much did I spend at No Frills in Milton?"
-  **SQL**: SELECT SUM(debit_amount) FROM transactions WHERE description ILIKE '%NOFRILLS%' AND description ILIKE '%MILTON%';
+  **SQL**: SELECT SUM(debit_amount) FROM transactions WHERE merchant = 'No Frills' AND description ILIKE '%MILTON%';
+
+- **User**: "How much did I spend at Costco in March 2024?"
+  **SQL**: SELECT SUM(debit_total) FROM monthly_merchant_totals WHERE merchant = 'Costco' AND month = '2024-03-01';
+
+- **User**: "How much did I spend per category each month?"
+  **SQL**: SELECT month, category, SUM(debit_total) AS spent FROM monthly_category_totals GROUP BY month, category ORDER BY month, spent DESC;
 
 - **User**: "Show my latest credit card transactions over $100."
   **SQL**: SELECT * FROM transactions WHERE account_type = 'Credit Card' AND debit_amount > 100 ORDER BY date DESC;
 You just need to return the SQL query, no other text. Only return the SQL query, no other text."""
 
 
+postgres_system_prompt = _sql_system_prompt("PostgreSQL")
+# Same tables and columns in the embedded columnar store (src/database/columnar.py).
+duckdb_system_prompt = _sql_system_prompt("DuckDB")
+# The prompt for the backend execute() targets.
+sql_system_prompt = duckdb_system_prompt if QUERY_BACKEND == "duckdb" else postgres_system_prompt
+_dialect = "DuckDB" if QUERY_BACKEND == "duckdb" else "PostgreSQL"
+
+
+def _compact_sql_prompt(dialect: str, merchants: list[str], examples: list) -> str:
+    """Short SQL prompt: one-line table schemas, only the merchants named in the question
+    and the given (question, sql) examples."""
+    merchant_rule = ""
+    if merchants:
+        names = ", ".join("'" + m.replace("'", "''") + "'" for m in merchants)
+        merchant_rule = f"\n- Merchants in this question: {names}."
+    shots = "\n\n".join(f"Question: {e.question}\nSQL: {e.sql}" for e in examples)
+    return f"""### Role
+You are an expert SQL Developer specializing in {dialect}. Convert the question into one executable SQL query over a personal finance database.
+
+### Tables
+transactions(id, bank, account_type, name, date DATE, category, merchant, description TEXT, debit_amount DECIMAL, credit_amount DECIMAL)
+- merchant: normalized name (e.g. 'No Frills'); description: raw text with location (e.g. 'NOFRILLS #3457 MILTON, ON').
+- debit_amount: spent; credit_amount: received or refunded; either may be null.
+monthly_merchant_totals(month DATE, bank, account_type, merchant, debit_total, credit_total, txn_count)
+monthly_category_totals(month DATE, bank, account_type, category, debit_total, credit_total, txn_count)
+- One row per month (its first day, e.g. '2024-03-01'); much faster than `transactions` for totals, counts or averages by month, merchant or category.
+
+### Rules
+- Filter with `merchant = '...'` or `category = '...'`. Categories: {KNOWN_CATEGORIES}.{merchant_rule}
+- Use `description ILIKE '%...%'` for other merchants and places; local spending is 'MILTON' or 'BURLINGTON'.
+- Filter dates with ranges (`date >= '2024-01-01' AND date < '2025-01-01'`), not EXTRACT.
+- Return ONLY the raw SQL: one SELECT statement, no markdown, no explanations.
+
+### Examples
+{shots}"""
+
+
+def mentioned_merchants(question: str) -> list[str]:
+    """Known merchants whose rule pattern appears in the question, e.g. ['Costco'] for "costco's"."""
+    text = f" {normalize_description(question)} "
+    return sorted({r.merchant for r in _rules if f" {r.pattern} " in text})
+
+
+# What the SQL cache is keyed on: the full prompt, or the dynamic prompt's fixed part.
+sql_base_prompt = sql_system_prompt if SQL_PROMPT == "full" else _compact_sql_prompt(_dialect, [], [])
+
+
+def sql_prompt_for(question: str, k: int = SQL_FEW_SHOT_K, mode: str = SQL_PROMPT, store=None) -> str:
+    """System prompt for one question.
+
+    mode "dynamic" retrieves the k verified examples most similar to the question from
+    store (default: the example CSV, see src/llm/examples.py) and lists only the merchants
+    the question names; "full" is sql_system_prompt.
+    """
+    with span("sql_prompt", mode=mode) as s:
+        if mode == "full":
+            prompt = sql_system_prompt
+        else:
+            # Imported here: the example store builds on sql_cache, which imports this module.
+            from src.llm.examples import get_example_store
+
+            examples = (store or get_example_store()).search(question, k)
+            prompt = _compact_sql_prompt(_dialect, mentioned_merchants(question), examples)
+            s.set(examples=len(examples))
+        s.set(estimated_tokens=estimate_tokens(prompt))
+    return prompt
+
+
 analyze_system_prompt = """You are an expert analyst specializing in financial data. Your task is to analyze the provided financial data 
 and provide a detailed analysis of the data. You are given a question and you need to analyze the data and provide a detailed analysis of 
 the data."""
\ No newline at end of file
@@ -0,0 +1,148 @@
+"""
+Deterministic offline stand-in for the chat models.
+
+ReplayChatModel is a LangChain chat model that answers from recorded responses instead
+of calling Ollama or OpenAI, so the agent chains can be run, timed and checked on a
+machine with no models and no network. Responses come from a JSONL file, one question
+per line:
+
+  {"question": "...", "sql": "SELECT ...", "repair_sql": "SELECT ...", "analysis": "..."}
+
+The SQL model replays "sql", or "repair_sql" (if recorded) when it is asked to fix a
+failed query; the analysis model replays "analysis". Questions are matched on their words,
+ignoring case and punctuation. Each call waits a configurable latency before the first
+token plus a per-token delay, scaled by seeded jitter, and reports estimated token usage,
+so timing and token metrics behave like a real model's.
+
+With LLM_REPLAY_PATH set, src/llm/sequential_chain.py and src/agent.py use it in place of
+their model clients (see benchmarks/bench_agent.py).
+"""
+
+import asyncio
+import json
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from collections.abc import AsyncIterator, Iterator
+from pathlib import Path
+from typing import Any
+
+_root = Path(__file__).resolve().parent.parent.parent
+if str(_root) not in sys.path:
+    sys.path.insert(0, str(_root))
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+from src.llm.encode import estimate_tokens
+from src.utils.constants import LLM_REPLAY_JITTER, LLM_REPLAY_LATENCY_S, LLM_REPLAY_PATH, LLM_REPLAY_TOKEN_S
+
+_NON_WORD = re.compile(r"\W+")
+_QUESTION_PREFIX = re.compile(r"^\s*question:\s*", re.IGNORECASE)
+_TOKEN = re.compile(r"\S+\s*|\s+")
+
+
+def question_key(text: str) -> str:
+    """Match key for a question: its words, lowercased."""
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+def _asked_question(messages: list[BaseMessage]) -> str:
+    """The question in a prompt: the first human message, up to any attached data."""
+    human = next((m.content for m in messages if isinstance(m, HumanMessage)), "")
+    return _QUESTION_PREFIX.sub("", str(human)).split("\n\n", 1)[0]
+
+
+class ReplayChatModel(BaseChatModel):
+    """Chat model that replays recorded responses, with simulated latency."""
+
+    responses: dict[str, str]
+    """Question key (see question_key) → response."""
+    repair_responses: dict[str, str] = {}
+    """Responses when the prompt holds an earlier answer to fix (an AI message)."""
+    default: str | None = None
+    """Response for unrecorded questions; None raises KeyError."""
+    latency_s: float = 0.0
+    token_s: float = 0.0
+    jitter: float = 0.0
+
+    _calls: Counter = PrivateAttr(default_factory=Counter)
+    _lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "replay"
+
+    def _respond(self, messages: list[BaseMessage]) -> tuple[str, float, float, dict]:
+        """Response text, delay before the first token, delay per token, usage."""
+        key = question_key(_asked_question(messages))
+        repairing = any(isinstance(m, AIMessage) for m in messages)
+        text = (self.repair_responses.get(key) if repairing else None) or self.responses.get(key, self.default)
+        if text is None:
+            raise KeyError(f"No recorded response for question: {_asked_question(messages)!r}")
+        with self._lock:
+            self._calls[key] += 1
+            call = self._calls[key]
+        # Same question, same call number, same delay: runs are repeatable.
+        scale = random.Random(f"{key}:{call}").lognormvariate(0, self.jitter) if self.jitter else 1.0
+        prompt_tokens = sum(estimate_tokens(str(m.content)) for m in messages)
+        completion_tokens = estimate_tokens(text)
+        usage = {"input_tokens": prompt_tokens, "output_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+        return text, self.latency_s * scale, self.token_s * scale, usage
+
+    def _generate(self, messages: list[BaseMessage], stop: list[str] | None = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        text, latency, per_token, usage = self._respond(messages)
+        time.sleep(latency + per_token * len(_TOKEN.findall(text)))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text, usage_metadata=usage))])
+
+    async def _agenerate(self, messages: list[BaseMessage], stop: list[str] | None = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        text, latency, per_token, usage = self._respond(messages)
+        await asyncio.sleep(latency + per_token * len(_TOKEN.findall(text)))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=text, usage_metadata=usage))])
+
+    def _stream(self, messages: list[BaseMessage], stop: list[str] | None = None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        text, latency, per_token, usage = self._respond(messages)
+        time.sleep(latency)
+        tokens = _TOKEN.findall(text)
+        for i, token in enumerate(tokens):
+            time.sleep(per_token)
+            if run_manager:
+                run_manager.on_llm_new_token(token)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token, usage_metadata=usage if i == len(tokens) - 1 else None))
+
+    async def _astream(self, messages: list[BaseMessage], stop: list[str] | None = None, run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        text, latency, per_token, usage = self._respond(messages)
+        await asyncio.sleep(latency)
+        tokens = _TOKEN.findall(text)
+        for i, token in enumerate(tokens):
+            await asyncio.sleep(per_token)
+            if run_manager:
+                await run_manager.on_llm_new_token(token)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token, usage_metadata=usage if i == len(tokens) - 1 else None))
+
+
+def load_replay(path: Path | str = LLM_REPLAY_PATH) -> list[dict]:
+    """Read recorded responses: one JSON object per line ('#' lines and blank lines skipped)."""
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+def replay_model(role: str, path: Path | str = LLM_REPLAY_PATH) -> ReplayChatModel:
+    """Replay model for the "sql" or "analysis" role, with the LLM_REPLAY_* delays."""
+    records = load_replay(path)
+    responses = {question_key(r["question"]): r[role] for r in records if r.get(role)}
+    repair = {question_key(r["question"]): r["repair_sql"] for r in records if role == "sql" and r.get("repair_sql")}
+    return ReplayChatModel(
+        responses=responses,
+        repair_responses=repair,
+        # Any question gets some analysis; unrecorded SQL is an error, as a wrong query would be.
+        default="No recorded analysis for this question." if role == "analysis" else None,
+        latency_s=LLM_REPLAY_LATENCY_S,
+        token_s=LLM_REPLAY_TOKEN_S,
+        jitter=LLM_REPLAY_JITTER,
+    )
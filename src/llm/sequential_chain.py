@@ -3,11 +3,26 @@ Sequential LangChain: data passed from one agent to another.
 
   User question → Agent 1 (SQL) → SQL string → DB execute → Agent 2 (Analyze) → analysis
 
-Run from project root: uv run python src/llm/sequential_chain.py
+The chain also runs on asyncio (async LLM calls, async DB pool): arun_sequential for one
+question, run_batch / arun_batch for many questions concurrently under a concurrency limit,
+so a batch takes about as long as its slowest question rather than the sum.
+
+SQL is requested as SQL_CANDIDATES concurrent candidates; the first that passes EXPLAIN
+runs, and if none does the model gets one try to repair its query from the database
+error (src/llm/candidates.py).
+
+stream_sequential / astream_sequential yield the analysis token by token as the model
+produces it, recording time-to-first-token and total latency.
+
+Run from project root: uv run python src/llm/sequential_chain.py ["question" ...] [--file questions.txt] [--stream]
 """
 
+import argparse
+import asyncio
+import functools
 import os
 import sys
+import time
 from pathlib import Path
 
 _root = Path(__file__).resolve().parent.parent.parent
@@ -18,17 +33,41 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnablePassthrough, RunnableLambda
 from langchain_ollama import ChatOllama
 
-from src.llm.prompts import postgres_system_prompt, analyze_system_prompt
-from src.utils.constants import SQL_LLM_MODEL
-from src.database.execute import execute
+from src.llm.candidates import agenerate_valid_sql, candidate_temperatures, generate_valid_sql
+from src.llm.prompts import analyze_system_prompt, sql_prompt_for
+from src.llm.replay import replay_model
+from src.utils.constants import BATCH_CONCURRENCY, LLM_REPLAY_PATH, OLLAMA_KEEP_ALIVE, SQL_CANDIDATES, SQL_LLM_MODEL
+from src.database.connection import close_async_pool
+from src.database.execute import aexecute, execute
+from src.llm.encode import encode_result
+from src.llm.sql_cache import get_sql_cache
+from src.llm.streaming import TimedStream
+from src.utils.tracing import span
 
 # --- Agent 1: question → SQL ---
+# The system prompt is built per question: a trimmed schema plus the most similar
+# verified examples (SQL_PROMPT, src/llm/prompts.py).
 sql_prompt = ChatPromptTemplate.from_messages([
-    ("system", postgres_system_prompt),
+    ("system", "{system}"),
     ("human", "{question}"),
 ])
-sql_llm = ChatOllama(model=SQL_LLM_MODEL, temperature=0)
-sql_chain = sql_prompt | sql_llm
+# One client per candidate, each at its own temperature; the first is deterministic.
+# With LLM_REPLAY_PATH set, recorded responses stand in for the models (src/llm/replay.py).
+sql_llms = [
+    replay_model("sql") if LLM_REPLAY_PATH else ChatOllama(model=SQL_LLM_MODEL, temperature=t, keep_alive=OLLAMA_KEEP_ALIVE)
+    for t in candidate_temperatures(SQL_CANDIDATES)
+]
+sql_llm = sql_llms[0]
+sql_candidate_chains = [sql_prompt | llm for llm in sql_llms]
+
+# Shown a failed query and the database's error, the model corrects it.
+repair_prompt = ChatPromptTemplate.from_messages([
+    ("system", "{system}"),
+    ("human", "{question}"),
+    ("ai", "{sql}"),
+    ("human", "That query failed with this database error:\n{error}\n\nReturn only the corrected SQL query."),
+])
+repair_chain = repair_prompt | sql_llm
 
 # --- Agent 2: question + data → analysis ---
 analyze_prompt = ChatPromptTemplate.from_messages([
@@ -36,38 +75,223 @@ analyze_prompt = ChatPromptTemplate.from_messages([
     ("human", "Question: {question}\n\nData:\n{financial_data}"),
 ])
 # Use same or different LLM
-analyze_llm = ChatOllama(model=SQL_LLM_MODEL, temperature=0)
+analyze_llm = replay_model("analysis") if LLM_REPLAY_PATH else ChatOllama(model=SQL_LLM_MODEL, temperature=0, keep_alive=OLLAMA_KEEP_ALIVE)
 analyze_chain = analyze_prompt | analyze_llm
 
 
+def warm_up() -> None:
+    """Load both models into Ollama now (and keep them loaded), so no question pays for it."""
+    if LLM_REPLAY_PATH:
+        return
+    import ollama
+
+    for llm in {(sql_llm.base_url, sql_llm.model): sql_llm, (analyze_llm.base_url, analyze_llm.model): analyze_llm}.values():
+        # A generate request without a prompt only loads the model.
+        ollama.Client(host=llm.base_url).generate(model=llm.model, keep_alive=llm.keep_alive)
+
+
+def _invoke_sql(chain, inputs: dict, stage: str = "sql_llm") -> str:
+    with span(stage) as s:
+        out = chain.invoke(inputs)
+        s.record_usage(out)
+    return out.content if hasattr(out, "content") else str(out)
+
+
+def generate_sql(question: str) -> str:
+    """Ask the SQL model for a query that passes EXPLAIN, bypassing the cache.
+
+    Raises QueryRejected if neither the candidates nor the repair produce one.
+    """
+    inputs = {"system": sql_prompt_for(question), "question": question}
+    return generate_valid_sql(
+        [functools.partial(_invoke_sql, chain, inputs) for chain in sql_candidate_chains],
+        lambda sql, error: _invoke_sql(repair_chain, {**inputs, "sql": sql, "error": error}, "sql_repair_llm"),
+    )
+
+
+def _encode(rows: list[dict]) -> tuple[str, dict]:
+    with span("encode", rows=len(rows)) as s:
+        financial_data, encoding = encode_result(rows)
+        s.set(tokens=encoding["tokens"], saved_tokens=encoding["saved_tokens"])
+    return financial_data, encoding
+
+
 def get_sql_content(x: dict) -> dict:
-    """Run SQL agent and add sql_query + sql_result to state."""
-    out = sql_chain.invoke(x)
-    sql_query = out.content if hasattr(out, "content") else str(out)
+    """Run SQL agent (or reuse cached SQL) and add sql_query + financial_data to state.
+
+    Rows are encoded compactly within RESULT_TOKEN_BUDGET (see src/llm/encode.py); the
+    encoding report, including tokens saved, is kept under "encoding".
+    """
+    with span("sql_generation") as s:
+        generated = False
+
+        def generate(question: str) -> str:
+            nonlocal generated
+            generated = True
+            return generate_sql(question)
+
+        sql_query = get_sql_cache().get_or_generate(x["question"], generate)
+        s.set(cache_hit=not generated)
     rows = execute(sql_query) if sql_query else []
-    return {**x, "sql_query": sql_query, "financial_data": str(rows)}
+    financial_data, encoding = _encode(rows)
+    return {**x, "sql_query": sql_query, "financial_data": financial_data, "encoding": encoding}
 
 
 def run_analyzer(x: dict) -> str:
     """Run analyze agent on question + financial_data."""
-    out = analyze_chain.invoke({"question": x["question"], "financial_data": x["financial_data"]})
+    with span("analysis") as s:
+        out = analyze_chain.invoke({"question": x["question"], "financial_data": x["financial_data"]})
+        s.record_usage(out)
+    return out.content if hasattr(out, "content") else str(out)
+
+
+async def _ainvoke_sql(chain, inputs: dict, stage: str = "sql_llm") -> str:
+    with span(stage) as s:
+        out = await chain.ainvoke(inputs)
+        s.record_usage(out)
+    return out.content if hasattr(out, "content") else str(out)
+
+
+async def agenerate_sql(question: str) -> str:
+    """Async counterpart of generate_sql."""
+    inputs = {"system": sql_prompt_for(question), "question": question}
+    return await agenerate_valid_sql(
+        [functools.partial(_ainvoke_sql, chain, inputs) for chain in sql_candidate_chains],
+        lambda sql, error: _ainvoke_sql(repair_chain, {**inputs, "sql": sql, "error": error}, "sql_repair_llm"),
+    )
+
+
+async def aget_sql_content(x: dict) -> dict:
+    """Async counterpart of get_sql_content."""
+    with span("sql_generation") as s:
+        generated = False
+
+        async def agenerate(question: str) -> str:
+            nonlocal generated
+            generated = True
+            return await agenerate_sql(question)
+
+        sql_query = await get_sql_cache().aget_or_generate(x["question"], agenerate)
+        s.set(cache_hit=not generated)
+    rows = await aexecute(sql_query) if sql_query else []
+    financial_data, encoding = _encode(rows)
+    return {**x, "sql_query": sql_query, "financial_data": financial_data, "encoding": encoding}
+
+
+async def arun_analyzer(x: dict) -> str:
+    """Async counterpart of run_analyzer."""
+    with span("analysis") as s:
+        out = await analyze_chain.ainvoke({"question": x["question"], "financial_data": x["financial_data"]})
+        s.record_usage(out)
     return out.content if hasattr(out, "content") else str(out)
 
 
 # Sequential pipeline: question → {question, sql_query, financial_data} → analysis
+# invoke() uses the sync functions, ainvoke()/abatch() the async ones.
 sequential_chain = (
     RunnablePassthrough()
-    | RunnableLambda(get_sql_content)
-    | RunnableLambda(run_analyzer)
+    | RunnableLambda(get_sql_content, afunc=aget_sql_content)
+    | RunnableLambda(run_analyzer, afunc=arun_analyzer)
 )
 
 
 def run_sequential(question: str) -> str:
     """Run both agents in sequence; return final analysis."""
-    return sequential_chain.invoke({"question": question})
+    with span("question"):
+        return sequential_chain.invoke({"question": question})
+
+
+async def arun_sequential(question: str) -> str:
+    """Async counterpart of run_sequential."""
+    with span("question"):
+        return await sequential_chain.ainvoke({"question": question})
+
+
+async def _aanswer(x: dict) -> str:
+    return await arun_sequential(x["question"])
+
+
+# The sequential chain with each question traced under its own "question" span.
+question_chain = RunnableLambda(lambda x: run_sequential(x["question"]), afunc=_aanswer)
+
+
+async def arun_batch(questions: list[str], concurrency: int = BATCH_CONCURRENCY) -> list[str | Exception]:
+    """Answer many questions concurrently, at most `concurrency` in flight at once.
+
+    Results are in question order. A question that fails yields its exception instead of
+    an analysis, so one bad question does not sink the rest of the batch.
+    """
+    return await question_chain.abatch(
+        [{"question": q} for q in questions],
+        config={"max_concurrency": concurrency},
+        return_exceptions=True,
+    )
+
+
+def run_batch(questions: list[str], concurrency: int = BATCH_CONCURRENCY) -> list[str | Exception]:
+    """Blocking entry point for arun_batch."""
+    async def batch() -> list[str | Exception]:
+        try:
+            return await arun_batch(questions, concurrency)
+        finally:
+            await close_async_pool()  # the pool belongs to this loop, which ends here
+
+    return asyncio.run(batch())
+
+
+def stream_sequential(question: str) -> TimedStream:
+    """Run the SQL stage, then stream the analysis as the model produces it.
+
+    Iterate the returned TimedStream for text chunks; its stats() then hold
+    time-to-first-token and total latency, both measured from this call.
+    """
+    started = time.perf_counter()
+
+    def chunks():
+        x = get_sql_content({"question": question})
+        yield from analyze_chain.stream({"question": x["question"], "financial_data": x["financial_data"]})
+
+    return TimedStream(chunks(), started, name="analysis_stream")
+
+
+def astream_sequential(question: str) -> TimedStream:
+    """Async counterpart of stream_sequential; iterate it with `async for`."""
+    started = time.perf_counter()
+
+    async def chunks():
+        x = await aget_sql_content({"question": question})
+        async for chunk in analyze_chain.astream({"question": x["question"], "financial_data": x["financial_data"]}):
+            yield chunk
+
+    return TimedStream(chunks(), started, name="analysis_stream")
 
 
 if __name__ == "__main__":
-    q = "How much did I spend at No Frills in Milton?"
-    print("Question:", q)
-    print("\nAnalysis:\n", run_sequential(q))
+    parser = argparse.ArgumentParser(description="Answer questions with the SQL + analyze agents.")
+    parser.add_argument("questions", nargs="*", default=None)
+    parser.add_argument("--file", type=Path, default=None, help="read questions from a file, one per line")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONCURRENCY, help="questions in flight at once")
+    parser.add_argument("--stream", action="store_true", help="print the analysis as it is generated")
+    args = parser.parse_args()
+    questions = list(args.questions)
+    if args.file:
+        questions += [line.strip() for line in args.file.read_text().splitlines() if line.strip()]
+    if args.stream:
+        for q in questions or ["How much did I spend at No Frills in Milton?"]:
+            print("Question:", q)
+            print("\nAnalysis:")
+            stream = stream_sequential(q)
+            for text in stream:
+                print(text, end="", flush=True)
+            print()
+            stream.print_stats()
+    elif len(questions) <= 1:
+        q = questions[0] if questions else "How much did I spend at No Frills in Milton?"
+        print("Question:", q)
+        print("\nAnalysis:\n", run_sequential(q))
+    else:
+        start = time.perf_counter()
+        for q, answer in zip(questions, run_batch(questions, args.concurrency)):
+            print("Question:", q)
+            print("\nAnalysis:\n", answer if not isinstance(answer, Exception) else f"failed: {answer!r}", "\n")
+        print(f"Answered {len(questions)} questions in {time.perf_counter() - start:.2f}s")
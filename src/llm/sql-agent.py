@@ -1,3 +1,4 @@
+import functools
 import os
 import sys
 from pathlib import Path
@@ -9,21 +10,33 @@ if str(_root) not in sys.path:
 
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_ollama import ChatOllama
-from src.llm.prompts import postgres_system_prompt
-from src.utils.constants import SQL_LLM_MODEL
+from src.llm.prompts import sql_prompt_for
+from src.utils.constants import OLLAMA_KEEP_ALIVE, SQL_LLM_MODEL
 from src.database.execute import execute
+from src.llm.sql_cache import get_sql_cache
 
 ollama_api_key=os.getenv("OLLAMA_API_KEY")
 
 def generate_sql(question: str) -> str:
-    """Generate a SQL query from a natural language prompt using local Ollama."""
-    llm = ChatOllama(model=SQL_LLM_MODEL, api_key=ollama_api_key, temperature=0)
+    """Generate a SQL query from a natural language prompt using local Ollama.
+
+    Repeat questions are answered from the question → SQL cache without a model call.
+    """
+    return get_sql_cache().get_or_generate(question, _generate_sql)
+
+@functools.cache
+def _sql_chain():
+    """Prompt template and client, built once per process; the model stays loaded for OLLAMA_KEEP_ALIVE."""
     prompt = ChatPromptTemplate.from_messages([
-        ("system", postgres_system_prompt),
+        ("system", "{system}"),
         ("human", "{question}"),
     ])
-    chain = prompt | llm
-    response = chain.invoke({"question": question})
+    llm = ChatOllama(model=SQL_LLM_MODEL, api_key=ollama_api_key, temperature=0, keep_alive=OLLAMA_KEEP_ALIVE)
+    return prompt | llm
+
+def _generate_sql(question: str) -> str:
+    """Call the SQL model, bypassing the cache."""
+    response = _sql_chain().invoke({"system": sql_prompt_for(question), "question": question})
     return response.content if hasattr(response, "content") else str(response)
 
 def execute_sql(query: str) -> list[dict]:
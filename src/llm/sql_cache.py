@@ -0,0 +1,207 @@
+"""
+Persistent question → SQL cache for the text-to-SQL agents.
+
+Questions are normalized (case, whitespace, punctuation) and their number literals are
+turned into parameters, so "Spent over $100 at Costco?" and "spent over 250 at costco"
+share one cached SQL template. Entries live in a small SQLite file, are evicted least
+recently used beyond a size limit, expire after a TTL, and are dropped when the SQL model
+or the system prompt changes.
+"""
+
+import hashlib
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections.abc import Awaitable, Callable
+from pathlib import Path
+
+_root = Path(__file__).resolve().parent.parent.parent
+if str(_root) not in sys.path:
+    sys.path.insert(0, str(_root))
+
+from src.llm.prompts import sql_base_prompt
+from src.utils.constants import SQL_CACHE_MAX_ENTRIES, SQL_CACHE_PATH, SQL_CACHE_TTL_SECONDS, SQL_LLM_MODEL
+
+_NUMBER = re.compile(r"(?<![\w.])\$?(\d{1,3}(?:,\d{3})+(?:\.\d+)?|\d+(?:\.\d+)?)(?![\w])")
+_PUNCTUATION = re.compile(r"[^\w\s{}]")
+_WHITESPACE = re.compile(r"\s+")
+_PLACEHOLDER = re.compile(r"\{n(\d+)\}")
+# SQL text ending in a comparison operator, i.e. the next literal is compared against.
+_COMPARISON_END = re.compile(r"(?:[<>=]|\bBETWEEN|\bAND)\s*$", re.IGNORECASE)
+
+CREATE_CACHE_SQL = """
+CREATE TABLE IF NOT EXISTS sql_cache (
+    scope TEXT NOT NULL,
+    question TEXT NOT NULL,
+    sql TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (scope, question)
+)
+"""
+
+
+def normalize_question(question: str) -> tuple[str, list[str]]:
+    """Normalize a question into a cache template and its number parameters.
+
+    >>> normalize_question("How much did I spend over $1,000.50 at Costco?")
+    ('how much did i spend over {n0} at costco', ['1000.50'])
+    """
+    params: list[str] = []
+
+    def to_param(match: re.Match) -> str:
+        params.append(match.group(1).replace(",", ""))
+        return f" {{n{len(params) - 1}}} "
+
+    text = _NUMBER.sub(to_param, question.lower())
+    text = _PUNCTUATION.sub(" ", text)
+    return _WHITESPACE.sub(" ", text).strip(), params
+
+
+def _parameterize_sql(sql: str, params: list[str]) -> str | None:
+    """Replace each parameter's literal in sql with its placeholder.
+
+    A parameter is only replaced where it is unambiguous: its literal appears exactly
+    once, as the right-hand side of a comparison (not in a LIMIT, a string or a date).
+    Otherwise None is returned and the SQL is cached for these exact numbers only, since
+    rebinding it could change unrelated literals or leave related ones stale.
+
+    >>> _parameterize_sql("SELECT * FROM transactions WHERE debit_amount > 100", ["100"])
+    'SELECT * FROM transactions WHERE debit_amount > {n0}'
+    >>> _parameterize_sql("SELECT * FROM transactions WHERE debit_amount > 1 LIMIT 1", ["1"]) is None
+    True
+    >>> _parameterize_sql("SELECT date FROM transactions ORDER BY debit_amount DESC LIMIT 10", ["10"]) is None
+    True
+    >>> _parameterize_sql("SELECT SUM(debit_total) FROM monthly_category_totals WHERE month >= '2023-01-01'", ["2023"]) is None
+    True
+    """
+    if len(set(params)) != len(params):
+        return None  # "5 ... 5": no way to tell which literal is which
+    for i, value in enumerate(params):
+        pattern = re.compile(rf"(?<![\w.]){re.escape(value)}(?![\w]|\.\d)")
+        matches = list(pattern.finditer(sql))
+        if len(matches) != 1 or not _COMPARISON_END.search(sql[:matches[0].start()]):
+            return None
+        sql = sql[:matches[0].start()] + f"{{n{i}}}" + sql[matches[0].end():]
+    return sql
+
+
+def _bind_sql(template: str, params: list[str]) -> str:
+    """Fill a cached SQL template's placeholders with this question's parameters."""
+    return _PLACEHOLDER.sub(lambda m: params[int(m.group(1))], template)
+
+
+def cache_scope(model: str = SQL_LLM_MODEL, system_prompt: str = sql_base_prompt) -> str:
+    """Identify the model + prompt pair; entries from any other pair are invalid."""
+    return hashlib.sha256(f"{model}\0{system_prompt}".encode()).hexdigest()[:16]
+
+
+class SqlCache:
+    """SQLite-backed question → SQL cache with LRU eviction and TTL."""
+
+    def __init__(
+        self,
+        path: Path | str = SQL_CACHE_PATH,
+        max_entries: int = SQL_CACHE_MAX_ENTRIES,
+        ttl_seconds: float = SQL_CACHE_TTL_SECONDS,
+        scope: str | None = None,
+    ):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.scope = scope or cache_scope()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        with self._db:
+            self._db.execute(CREATE_CACHE_SQL)
+            # A new model or system prompt invalidates everything generated by the old one.
+            self._db.execute("DELETE FROM sql_cache WHERE scope != ?", (self.scope,))
+
+    def get(self, question: str) -> str | None:
+        """Return cached SQL for the question, or None on a miss."""
+        template, params = normalize_question(question)
+        now = time.time()
+        with self._lock, self._db:
+            # Parameterized entry first, then one stored for these exact numbers.
+            for key, bind in ((template, True), (_bind_sql(template, params), False)):
+                row = self._db.execute(
+                    "SELECT sql, created_at FROM sql_cache WHERE scope = ? AND question = ?",
+                    (self.scope, key),
+                ).fetchone()
+                if row is None:
+                    continue
+                sql, created_at = row
+                if now - created_at > self.ttl_seconds:
+                    self._db.execute("DELETE FROM sql_cache WHERE scope = ? AND question = ?", (self.scope, key))
+                    continue
+                self._db.execute(
+                    "UPDATE sql_cache SET last_used = ? WHERE scope = ? AND question = ?",
+                    (now, self.scope, key),
+                )
+                self.hits += 1
+                return _bind_sql(sql, params) if bind else sql
+            self.misses += 1
+        return None
+
+    def put(self, question: str, sql: str) -> None:
+        """Store generated SQL for the question, evicting least recently used entries."""
+        if not sql:
+            return
+        template, params = normalize_question(question)
+        sql_template = _parameterize_sql(sql, params)
+        if sql_template is None:
+            template, sql_template = _bind_sql(template, params), sql
+        now = time.time()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sql_cache (scope, question, sql, created_at, last_used) VALUES (?, ?, ?, ?, ?)",
+                (self.scope, template, sql_template, now, now),
+            )
+            self._db.execute(
+                "DELETE FROM sql_cache WHERE rowid IN ("
+                " SELECT rowid FROM sql_cache ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def get_or_generate(self, question: str, generate: Callable[[str], str]) -> str:
+        """Return cached SQL for the question, calling generate(question) on a miss."""
+        sql = self.get(question)
+        if sql is None:
+            sql = generate(question)
+            self.put(question, sql)
+        return sql
+
+    async def aget_or_generate(self, question: str, agenerate: Callable[[str], Awaitable[str]]) -> str:
+        """Async counterpart of get_or_generate; the SQLite lookup itself is sub-millisecond."""
+        sql = self.get(question)
+        if sql is None:
+            sql = await agenerate(question)
+            self.put(question, sql)
+        return sql
+
+    def clear(self) -> None:
+        """Remove every cached entry."""
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM sql_cache")
+
+    def stats(self) -> dict[str, int]:
+        """Return hit/miss counters for this process and the number of stored entries."""
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM sql_cache").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+
+_cache: SqlCache | None = None
+
+
+def get_sql_cache() -> SqlCache:
+    """Return the process-wide SQL cache, opening it on first use."""
+    global _cache
+    if _cache is None:
+        _cache = SqlCache()
+    return _cache
@@ -0,0 +1,72 @@
+"""
+Timing wrapper for streamed model output.
+
+TimedStream passes text chunks through as they arrive and records time-to-first-token and
+total latency, measured from when the request started (so time spent generating and
+running the SQL before the analysis counts towards the first token). A named stream is
+recorded as a tracing span when it finishes.
+"""
+
+import sys
+import time
+from collections.abc import AsyncIterable, AsyncIterator, Iterable, Iterator
+from pathlib import Path
+
+_root = Path(__file__).resolve().parent.parent.parent
+if str(_root) not in sys.path:
+    sys.path.insert(0, str(_root))
+
+from src.utils.tracing import record_span
+
+
+def chunk_text(chunk) -> str:
+    """Text of a streamed message chunk (or a plain string)."""
+    return chunk.content if hasattr(chunk, "content") else str(chunk)
+
+
+class TimedStream:
+    """Iterate (or async-iterate) over streamed text, recording latency as it goes."""
+
+    def __init__(self, chunks: Iterable | AsyncIterable, started: float | None = None, name: str | None = None):
+        self._chunks = chunks
+        self.name = name
+        self.started = time.perf_counter() if started is None else started
+        self.first_token_s: float | None = None
+        self.total_s: float | None = None
+        self.chunks = 0
+        self.chars = 0
+
+    def _record(self, text: str) -> None:
+        if self.first_token_s is None and text:
+            self.first_token_s = time.perf_counter() - self.started
+        self.chunks += 1
+        self.chars += len(text)
+
+    def _finish(self) -> None:
+        self.total_s = time.perf_counter() - self.started
+        if self.name:
+            record_span(self.name, self.total_s, **self.stats())
+
+    def __iter__(self) -> Iterator[str]:
+        for chunk in self._chunks:
+            text = chunk_text(chunk)
+            self._record(text)
+            yield text
+        self._finish()
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        async for chunk in self._chunks:
+            text = chunk_text(chunk)
+            self._record(text)
+            yield text
+        self._finish()
+
+    def stats(self) -> dict[str, float | int | None]:
+        """Time-to-first-token and total latency in seconds, plus chunk and character counts."""
+        return {"first_token_s": self.first_token_s, "total_s": self.total_s, "chunks": self.chunks, "chars": self.chars}
+
+    def print_stats(self, file=sys.stderr) -> None:
+        """Print a one-line latency summary (to stderr, so it stays out of piped output)."""
+        ttft = f"{self.first_token_s:.2f}s" if self.first_token_s is not None else "n/a"
+        total = f"{self.total_s:.2f}s" if self.total_s is not None else "n/a"
+        print(f"[time to first token {ttft}, total {total}, {self.chunks} chunks]", file=file)
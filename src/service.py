@@ -0,0 +1,190 @@
+"""
+Long-running agent service.
+
+Imports the chain once and, with it, the model clients, prompt templates, SQL cache and
+database pool. It then loads the models into Ollama (kept resident with OLLAMA_KEEP_ALIVE)
+and answers questions over HTTP, so each question pays only for inference and its query.
+main.py is the thin command-line client.
+
+Endpoints (JSON in and out):
+  GET  /health    readiness, uptime and questions answered
+  POST /ask       {"question": "...", "stream": false}
+                  -> {"question", "sql_query", "analysis", "encoding", "seconds"}; with
+                  stream, the analysis is sent as plain text chunks as it is generated
+  POST /batch     {"questions": [...], "concurrency": 8} -> [{"question", "analysis" or "error"}]
+  GET  /metrics   Prometheus text (src/utils/tracing.py)
+
+Run from project root: uv run python main.py serve
+"""
+
+import asyncio
+import itertools
+import json
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+_root = Path(__file__).resolve().parent.parent
+if str(_root) not in sys.path:
+    sys.path.insert(0, str(_root))
+
+from src.database.guard import QueryRejected
+from src.llm import sequential_chain as chain
+from src.llm.streaming import TimedStream
+from src.utils.constants import BATCH_CONCURRENCY, QUERY_BACKEND, SERVICE_HOST, SERVICE_PORT
+from src.utils.tracing import metrics, span
+
+
+class AgentService:
+    """Shared state for all requests: warm clients, one event loop for batches, counters."""
+
+    def __init__(self):
+        self.started = time.time()
+        self.answered = 0
+        self._lock = threading.Lock()
+        # Async batches all run on this loop, so they share one async connection pool.
+        self.loop = asyncio.new_event_loop()
+        threading.Thread(target=self.loop.run_forever, name="agent-loop", daemon=True).start()
+
+    def warm_up(self) -> None:
+        """Open the database connection (pool or columnar store) and load the models."""
+        if QUERY_BACKEND == "duckdb":
+            from src.database.columnar import get_store
+
+            get_store()
+        else:
+            from src.database.connection import get_pool
+
+            get_pool()
+        try:
+            chain.warm_up()
+        except Exception as exc:  # Ollama not running yet: the first question loads the model
+            print(f"Could not preload models: {exc}", file=sys.stderr)
+
+    def _count(self, n: int = 1) -> None:
+        with self._lock:
+            self.answered += n
+
+    def ask(self, question: str) -> dict:
+        """Answer one question; returns the SQL, analysis and encoding report."""
+        start = time.perf_counter()
+        with span("question"):
+            x = chain.get_sql_content({"question": question})
+            analysis = chain.run_analyzer(x)
+        self._count()
+        return {
+            "question": question,
+            "sql_query": x["sql_query"],
+            "analysis": analysis,
+            "encoding": x["encoding"],
+            "seconds": time.perf_counter() - start,
+        }
+
+    def ask_stream(self, question: str) -> TimedStream:
+        """Answer one question, streaming the analysis as it is generated."""
+        stream = chain.stream_sequential(question)
+        self._count()
+        return stream
+
+    def batch(self, questions: list[str], concurrency: int = BATCH_CONCURRENCY) -> list[dict]:
+        """Answer many questions concurrently on the service's event loop."""
+        answers = asyncio.run_coroutine_threadsafe(chain.arun_batch(questions, concurrency), self.loop).result()
+        self._count(len(questions))
+        return [
+            {"question": q, "error": repr(a)} if isinstance(a, Exception) else {"question": q, "analysis": a}
+            for q, a in zip(questions, answers)
+        ]
+
+    def health(self) -> dict:
+        return {"status": "ok", "backend": QUERY_BACKEND, "uptime_s": time.time() - self.started, "answered": self.answered}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    service: AgentService
+    protocol_version = "HTTP/1.1"
+
+    def _send(self, status: int, body: str | bytes, content_type: str = "application/json") -> None:
+        payload = body.encode() if isinstance(body, str) else body
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _json(self, status: int, obj) -> None:
+        self._send(status, json.dumps(obj, default=str))
+
+    def _chunk(self, text: str) -> None:
+        data = text.encode()
+        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        self.wfile.flush()
+
+    def do_GET(self) -> None:
+        if self.path == "/health":
+            self._json(200, self.service.health())
+        elif self.path == "/metrics":
+            self._send(200, metrics.prometheus_text(), "text/plain; version=0.0.4")
+        else:
+            self._json(404, {"error": f"No such endpoint: {self.path}"})
+
+    def do_POST(self) -> None:
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        except ValueError:
+            self._json(400, {"error": "Request body must be JSON"})
+            return
+        try:
+            if self.path == "/ask" and body.get("question"):
+                if body.get("stream"):
+                    self._stream(body["question"])
+                else:
+                    self._json(200, self.service.ask(body["question"]))
+            elif self.path == "/batch" and body.get("questions"):
+                self._json(200, self.service.batch(body["questions"], int(body.get("concurrency", BATCH_CONCURRENCY))))
+            else:
+                self._json(400, {"error": "POST /ask {\"question\": ...} or /batch {\"questions\": [...]}"})
+        except QueryRejected as exc:
+            self._json(422, {"error": str(exc)})
+        except Exception as exc:
+            self._json(500, {"error": repr(exc)})
+
+    def _stream(self, question: str) -> None:
+        chunks = iter(self.service.ask_stream(question))
+        first = next(chunks, "")  # SQL stage errors surface here, before the headers are sent
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; charset=utf-8")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        try:
+            for text in itertools.chain([first], chunks):
+                if text:
+                    self._chunk(text)
+        except Exception as exc:  # headers are out: report in the stream, then end it
+            self._chunk(f"\n[error: {exc!r}]\n")
+        self.wfile.write(b"0\r\n\r\n")
+
+    def log_message(self, format, *args) -> None:
+        print(f"{self.address_string()} {format % args}", file=sys.stderr)
+
+
+def serve(host: str = SERVICE_HOST, port: int = SERVICE_PORT) -> None:
+    """Warm everything up, then serve until interrupted."""
+    service = AgentService()
+    service.warm_up()
+    handler = type("Handler", (_Handler,), {"service": service})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    print(f"Agent service ready on http://{host}:{port} ({QUERY_BACKEND} backend)", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        metrics.write()
+
+
+if __name__ == "__main__":
+    serve()
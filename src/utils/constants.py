@@ -1,5 +1,53 @@
+import os
+from pathlib import Path
+
 # Ollama model name (e.g. from `ollama pull prem1b-sql` or your local model)
 SQL_LLM_MODEL = "anindya/prem1b-sql-ollama-fp116"
 # SQL_LLM_MODEL = "prem1b-sql"
 # SQL_LLM_MODEL = "deepseek-v3.1:671b-cloud"
-ANALYZE_LLM_MODEL = "gpt-4o-mini"
\ No newline at end of file
+ANALYZE_LLM_MODEL = "gpt-4o-mini"
+
+# Question → SQL cache (src/llm/sql_cache.py)
+SQL_CACHE_PATH = Path(os.environ.get("SQL_CACHE_PATH", Path(__file__).resolve().parent.parent.parent / ".cache" / "sql_cache.sqlite3"))
+SQL_CACHE_MAX_ENTRIES = int(os.environ.get("SQL_CACHE_MAX_ENTRIES", "1000"))
+SQL_CACHE_TTL_SECONDS = float(os.environ.get("SQL_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+# Questions in flight at once in sequential_chain.run_batch
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "8"))
+
+# Query results sent to the analysis model (src/llm/encode.py)
+RESULT_TOKEN_BUDGET = int(os.environ.get("RESULT_TOKEN_BUDGET", "2000"))
+RESULT_TOP_N = int(os.environ.get("RESULT_TOP_N", "10"))
+
+# Where agent queries run: "postgres", or "duckdb" for the embedded columnar store
+# (src/database/columnar.py), which needs no server.
+QUERY_BACKEND = os.environ.get("QUERY_BACKEND", "postgres")
+
+# How long Ollama keeps a model loaded after a request: seconds (-1: until the server stops)
+# or a duration like "30m". Keeps per-question latency down to inference alone.
+_keep_alive = os.environ.get("OLLAMA_KEEP_ALIVE", "-1")
+OLLAMA_KEEP_ALIVE: int | str = int(_keep_alive) if _keep_alive.lstrip("-").isdigit() else _keep_alive
+
+# Long-running agent service (src/service.py) and its CLI client (main.py)
+SERVICE_HOST = os.environ.get("SERVICE_HOST", "127.0.0.1")
+SERVICE_PORT = int(os.environ.get("SERVICE_PORT", "8765"))
+
+# SQL agent system prompt (src/llm/prompts.py): "dynamic" sends a trimmed schema and the
+# SQL_FEW_SHOT_K examples most similar to the question (src/llm/examples.py); "full" sends
+# the whole schema, every known merchant and the fixed examples.
+SQL_PROMPT = os.environ.get("SQL_PROMPT", "dynamic")
+SQL_FEW_SHOT_K = int(os.environ.get("SQL_FEW_SHOT_K", "3"))
+
+# SQL candidates requested at once per question (src/llm/candidates.py); the first that
+# passes EXPLAIN runs. If none does, up to SQL_REPAIR_ROUNDS retries show the model the error.
+SQL_CANDIDATES = int(os.environ.get("SQL_CANDIDATES", "3"))
+SQL_REPAIR_ROUNDS = int(os.environ.get("SQL_REPAIR_ROUNDS", "1"))
+
+# Offline stand-in for the chat models (src/llm/replay.py): a JSONL file of recorded
+# responses per question. When set, the chains replay it instead of calling Ollama/OpenAI,
+# waiting LATENCY_S before the first token and TOKEN_S per token (times a lognormal
+# factor with sigma JITTER, seeded per question, so runs are repeatable).
+LLM_REPLAY_PATH = os.environ.get("LLM_REPLAY_PATH", "")
+LLM_REPLAY_LATENCY_S = float(os.environ.get("LLM_REPLAY_LATENCY_S", "0"))
+LLM_REPLAY_TOKEN_S = float(os.environ.get("LLM_REPLAY_TOKEN_S", "0"))
+LLM_REPLAY_JITTER = float(os.environ.get("LLM_REPLAY_JITTER", "0"))
@@ -0,0 +1,230 @@
+"""
+Lightweight tracing and metrics for the ETL and agent pipelines.
+
+Each stage runs inside a span (`with span("query") as s: ... s.set(rows=n)`). Spans nest
+through a context variable, so they follow the code across threads started with the
+context and asyncio tasks. A finished span is appended to TRACE_JSONL_PATH as one JSON
+line (trace/span/parent ids, name, start, duration, status and attributes) and folded into
+in-process metrics: a duration histogram per stage, error counts, and the totals of the
+well-known attributes (rows, prompt_tokens, completion_tokens, cache_hit). The metrics are
+written in Prometheus text format to METRICS_PATH whenever a root span ends and at exit,
+ready for the node-exporter textfile collector. Each entry point (extract.py, a chain
+script, ...) writes its own file, labelled with its name, so short-lived runs do not
+overwrite each other's metrics.
+
+The trace file is rotated by size so a long-running service does not fill the disk: once
+it would grow past TRACE_JSONL_MAX_BYTES it is renamed to traces.jsonl.1 (shifting older
+files up to TRACE_JSONL_BACKUPS, the oldest is deleted) and a new one is started. Set
+TRACE_JSONL_MAX_BYTES to 0 to let it grow without limit.
+
+Set either path to an empty string to turn that export off.
+"""
+
+import atexit
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+_cache_dir = Path(__file__).resolve().parent.parent.parent / ".cache"
+TRACE_JSONL_PATH = os.environ.get("TRACE_JSONL_PATH", str(_cache_dir / "traces.jsonl"))
+TRACE_JSONL_MAX_BYTES = int(os.environ.get("TRACE_JSONL_MAX_BYTES", str(50 * 1024 * 1024)))
+TRACE_JSONL_BACKUPS = int(os.environ.get("TRACE_JSONL_BACKUPS", "3"))  # rotated files kept
+# Entry point name: labels the metrics and names their file.
+PROCESS_NAME = Path(sys.argv[0]).stem if sys.argv and sys.argv[0] not in ("", "-", "-c") else "python"
+METRICS_PATH = os.environ.get("METRICS_PATH", str(_cache_dir / "metrics" / f"{PROCESS_NAME}.prom"))
+
+METRIC_PREFIX = "budget"
+# Histogram bucket upper bounds, seconds.
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# Span attributes summed into counters: attribute → (metric, label set on it).
+_COUNTED = {
+    "rows": ("rows_total", {}),
+    "prompt_tokens": ("llm_tokens_total", {"kind": "prompt"}),
+    "completion_tokens": ("llm_tokens_total", {"kind": "completion"}),
+}
+_HELP = {
+    "stage_duration_seconds": ("histogram", "Time spent per pipeline stage."),
+    "stage_errors_total": ("counter", "Stage runs that raised."),
+    "rows_total": ("counter", "Rows read, transformed, loaded or returned per stage."),
+    "llm_tokens_total": ("counter", "LLM prompt and completion tokens per stage."),
+    "cache_requests_total": ("counter", "Cache lookups per stage, by hit or miss."),
+}
+
+_current: ContextVar["Span | None"] = ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed stage. Attributes set on it are exported with it."""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start", "duration_s", "status", "attributes")
+
+    def __init__(self, name: str, parent: "Span | None", attributes: dict):
+        self.name = name
+        self.trace_id = parent.trace_id if parent else secrets.token_hex(8)
+        self.span_id = secrets.token_hex(4)
+        self.parent_id = parent.span_id if parent else None
+        self.start = time.time()
+        self.duration_s = 0.0
+        self.status = "ok"
+        self.attributes = dict(attributes)
+
+    def set(self, **attributes) -> None:
+        """Add or overwrite attributes (e.g. rows=..., cache_hit=True)."""
+        self.attributes.update(attributes)
+
+    def record_usage(self, message) -> None:
+        """Copy prompt/completion token counts from a LangChain message's usage_metadata."""
+        usage = getattr(message, "usage_metadata", None) or {}
+        if usage:
+            self.set(prompt_tokens=usage.get("input_tokens", 0), completion_tokens=usage.get("output_tokens", 0))
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": self.start,
+            "duration_s": self.duration_s,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class Metrics:
+    """In-process counters and duration histograms fed by finished spans."""
+
+    def __init__(self, buckets: tuple[float, ...] = DURATION_BUCKETS):
+        self.buckets = buckets
+        self._lock = threading.Lock()
+        self._counters: dict[tuple[str, tuple], float] = defaultdict(float)
+        self._histograms: dict[str, list] = {}
+
+    def observe(self, span: Span) -> None:
+        """Fold one finished span into the metrics."""
+        stage = span.name
+        with self._lock:
+            counts = self._histograms.setdefault(stage, [[0] * len(self.buckets), 0.0, 0])
+            for i, bound in enumerate(self.buckets):
+                if span.duration_s <= bound:
+                    counts[0][i] += 1
+            counts[1] += span.duration_s
+            counts[2] += 1
+            if span.status != "ok":
+                self._counters[("stage_errors_total", (("stage", stage),))] += 1
+            for attribute, (metric, labels) in _COUNTED.items():
+                value = span.attributes.get(attribute)
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    self._counters[(metric, (("stage", stage), *labels.items()))] += value
+            hit = span.attributes.get("cache_hit")
+            if isinstance(hit, bool):
+                self._counters[("cache_requests_total", (("stage", stage), ("result", "hit" if hit else "miss")))] += 1
+
+    def prometheus_text(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        def labels(pairs) -> str:
+            return "{" + ",".join(f'{k}="{v}"' for k, v in (("process", PROCESS_NAME), *pairs)) + "}"
+
+        lines = []
+        with self._lock:
+            name = f"{METRIC_PREFIX}_stage_duration_seconds"
+            kind, help_text = _HELP["stage_duration_seconds"]
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+            for stage, (buckets, total, count) in sorted(self._histograms.items()):
+                for bound, n in zip(self.buckets, buckets):
+                    lines.append(f"{name}_bucket{labels([('stage', stage), ('le', bound)])} {n}")
+                lines.append(f"{name}_bucket{labels([('stage', stage), ('le', '+Inf')])} {count}")
+                lines.append(f"{name}_sum{labels([('stage', stage)])} {total:.6f}")
+                lines.append(f"{name}_count{labels([('stage', stage)])} {count}")
+            for metric in sorted({metric for metric, _ in self._counters}):
+                name = f"{METRIC_PREFIX}_{metric}"
+                kind, help_text = _HELP[metric]
+                lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+                for (m, pairs), value in sorted(self._counters.items()):
+                    if m == metric:
+                        lines.append(f"{name}{labels(pairs)} {value:g}")
+        return "\n".join(lines) + "\n"
+
+    def write(self, path: Path | str = METRICS_PATH) -> None:
+        """Write the metrics file atomically (a scraper never sees a partial file)."""
+        if not path:
+            return
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(self.prometheus_text())
+        os.replace(tmp, path)
+
+
+metrics = Metrics()
+_trace_lock = threading.Lock()
+
+
+def _rotate(path: Path, backups: int = TRACE_JSONL_BACKUPS) -> None:
+    """Shift path to path.1, path.1 to path.2, ..., dropping what falls past backups."""
+    if backups <= 0:
+        path.unlink(missing_ok=True)
+        return
+    for i in range(backups - 1, 0, -1):
+        older = path.with_name(f"{path.name}.{i}")
+        if older.exists():
+            os.replace(older, path.with_name(f"{path.name}.{i + 1}"))
+    os.replace(path, path.with_name(f"{path.name}.1"))
+
+
+def _export(span: Span) -> None:
+    metrics.observe(span)
+    if TRACE_JSONL_PATH:
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        path = Path(TRACE_JSONL_PATH)
+        with _trace_lock:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            size = path.stat().st_size if path.exists() else 0
+            if TRACE_JSONL_MAX_BYTES > 0 and size and size + len(line) > TRACE_JSONL_MAX_BYTES:
+                _rotate(path)
+            with open(path, "a") as f:
+                f.write(line)
+    if span.parent_id is None:
+        metrics.write()
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Span]:
+    """Time a stage as a child of the current span (or as a new trace's root)."""
+    current = Span(name, _current.get(), attributes)
+    token = _current.set(current)
+    started = time.perf_counter()
+    try:
+        yield current
+    except BaseException as exc:
+        current.status = "error"
+        current.set(error=type(exc).__name__)
+        raise
+    finally:
+        current.duration_s = time.perf_counter() - started
+        _current.reset(token)
+        _export(current)
+
+
+def record_span(name: str, duration_s: float, **attributes) -> Span:
+    """Record a stage timed elsewhere (e.g. in a worker process) as a child of the current span."""
+    recorded = Span(name, _current.get(), attributes)
+    recorded.start -= duration_s
+    recorded.duration_s = duration_s
+    _export(recorded)
+    return recorded
+
+
+@atexit.register
+def _write_at_exit() -> None:
+    # Worker processes that recorded nothing must not overwrite their parent's file.
+    if metrics._histograms:
+        metrics.write()